@@ -0,0 +1,280 @@
+"""
+Search-as-you-type completions over course titles, tags, instructors and categories.
+
+Every suggestion is a phrase: a course title, or a distinct category, tag or
+instructor weighted by the combined popularity of its courses. A phrase is
+found by a prefix of any of its words. The words are kept in a sorted
+vocabulary, which forms an implicit prefix trie: each node (prefix) caches
+its top-k phrases, merged from its children's top-k lists, so a keystroke
+is a dict lookup once the node is warm. Adding or removing a course only
+invalidates the nodes along the prefixes of the words it touched.
+"""
+import math
+from bisect import bisect_left
+from heapq import nlargest
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from .search_index import normalize, tokenize
+
+TOP_K = 10
+# Nodes spanning up to this many words merge the words' own lists and aren't cached
+LEAF_SPAN = 32
+# Sorts after every character, so `prefix + LAST_CHAR` bounds the words starting with prefix
+LAST_CHAR = "\U0010ffff"
+
+
+def popularity(course: Dict) -> float:
+    """Ranking weight of a course: enrolment on a log scale, scaled by rating.
+
+    Missing, negative or NaN values count as 0, so a weight is always finite.
+    """
+    students = course.get('students') or 0
+    rating = course.get('rating') or 0
+    students = students if students > 0 else 0
+    rating = rating if math.isfinite(rating) else 0
+    return (1 + math.log1p(students)) * (1 + rating)
+
+
+class CompletionIndex:
+    """Incrementally maintained prefix index of weighted phrases"""
+
+    def __init__(self, k: int = TOP_K):
+        self.k = k
+        self.phrase_ids: Dict[Tuple[str, str], int] = {}
+        self.key: List[Optional[Tuple[str, str]]] = []
+        self.text: List[Optional[str]] = []
+        self.kind: List[Optional[str]] = []
+        self.course_id: List[Optional[int]] = []
+        self.phrase_words: List[Tuple[str, ...]] = []
+        self.weight: List[float] = []
+        self.members: List[int] = []
+        self._free: List[int] = []
+        self.words: Dict[str, Set[int]] = {}
+        # Sorted words; additions and removals are merged in before the next lookup
+        self.vocabulary: List[str] = []
+        self._added_words: List[str] = []
+        self._removed_words = False
+        # Phrases each course contributed to and its weight, so it can be removed cleanly
+        self._documents: Dict[int, Tuple[List[int], float]] = {}
+        self._word_top: Dict[str, Tuple[int, ...]] = {}
+        self._node_top: Dict[str, Tuple[int, ...]] = {}
+
+    def __len__(self):
+        return len(self.phrase_ids)
+
+    @classmethod
+    def from_catalog(cls, catalog) -> "CompletionIndex":
+        """Index every row of a CourseCatalog"""
+        index = cls()
+        categories = catalog.dictionaries['category']
+        columns = {name: catalog.column(name).tolist() for name in ('id', 'category')}
+        # NULLs are stored as NaN ratings and MISSING_INT students; normalized as RecommendationEngine.build does
+        columns['students'] = np.maximum(catalog.column('students'), 0).tolist()
+        columns['rating'] = np.nan_to_num(catalog.column('rating')).tolist()
+        for row in range(catalog.size):
+            index.add({
+                'id': columns['id'][row],
+                'title': catalog.text['title'][row],
+                'instructor': catalog.text['instructor'][row],
+                'category': categories.decode(columns['category'][row]),
+                'tags': catalog.tag_names(row),
+                'students': columns['students'][row],
+                'rating': columns['rating'][row],
+            })
+        return index
+
+    def add(self, course: Dict):
+        """Index a course's phrases, replacing any previous version with the same id"""
+        course_id = course['id']
+        self.remove(course_id)
+
+        phrases = []
+        if course.get('title'):
+            phrases.append(self._phrase('course', str(course_id), course['title'], course_id))
+        for kind, value in (('category', course.get('category')), ('instructor', course.get('instructor'))):
+            if value:
+                phrases.append(self._phrase(kind, normalize(value), value))
+        for tag in course.get('tags') or []:
+            if tag:
+                phrases.append(self._phrase('tag', normalize(tag), tag))
+        phrases = list(dict.fromkeys(phrases))
+
+        weight = popularity(course)
+        for phrase_id in phrases:
+            self.weight[phrase_id] += weight
+            self.members[phrase_id] += 1
+            self._touch(phrase_id)
+        self._documents[course_id] = (phrases, weight)
+
+    def add_many(self, courses: Iterable[Dict]):
+        for course in courses:
+            self.add(course)
+
+    def remove(self, course_id: int):
+        """Take a course's weight off its phrases, dropping those no course supports any more"""
+        document = self._documents.pop(course_id, None)
+        if document is None:
+            return
+        phrases, weight = document
+        for phrase_id in phrases:
+            self.members[phrase_id] -= 1
+            if self.members[phrase_id] == 0:
+                self._release(phrase_id)
+            else:
+                self.weight[phrase_id] -= weight
+                self._touch(phrase_id)
+
+    def _phrase(self, kind: str, key: str, text: str, course_id: Optional[int] = None) -> int:
+        phrase_id = self.phrase_ids.get((kind, key))
+        if phrase_id is not None:
+            return phrase_id
+        words = tuple(dict.fromkeys(tokenize(text)))
+        if self._free:
+            phrase_id = self._free.pop()
+            self.key[phrase_id] = (kind, key)
+            self.text[phrase_id], self.kind[phrase_id], self.course_id[phrase_id] = text, kind, course_id
+            self.phrase_words[phrase_id], self.weight[phrase_id], self.members[phrase_id] = words, 0.0, 0
+        else:
+            phrase_id = len(self.text)
+            self.key.append((kind, key))
+            self.text.append(text)
+            self.kind.append(kind)
+            self.course_id.append(course_id)
+            self.phrase_words.append(words)
+            self.weight.append(0.0)
+            self.members.append(0)
+        self.phrase_ids[(kind, key)] = phrase_id
+        for word in words:
+            postings = self.words.get(word)
+            if postings is None:
+                postings = self.words[word] = set()
+                self._added_words.append(word)
+            postings.add(phrase_id)
+        return phrase_id
+
+    def _release(self, phrase_id: int):
+        self._touch(phrase_id)
+        for word in self.phrase_words[phrase_id]:
+            postings = self.words[word]
+            postings.discard(phrase_id)
+            if not postings:
+                del self.words[word]
+                self._removed_words = True
+        del self.phrase_ids[self.key[phrase_id]]
+        self.key[phrase_id] = self.text[phrase_id] = self.kind[phrase_id] = self.course_id[phrase_id] = None
+        self.phrase_words[phrase_id] = ()
+        self.weight[phrase_id] = 0.0
+        self._free.append(phrase_id)
+
+    def _sync_vocabulary(self):
+        if self._removed_words:
+            self.vocabulary = [word for word in self.vocabulary if word in self.words]
+            self._removed_words = False
+        if self._added_words:
+            vocabulary = self.vocabulary
+            added = [
+                word for word in set(self._added_words)
+                if word in self.words and not self._in_vocabulary(word)
+            ]
+            # Two sorted runs, which the sort merges in linear time
+            vocabulary.extend(sorted(added))
+            vocabulary.sort()
+            self._added_words = []
+
+    def _in_vocabulary(self, word: str) -> bool:
+        position = bisect_left(self.vocabulary, word)
+        return position < len(self.vocabulary) and self.vocabulary[position] == word
+
+    def _touch(self, phrase_id: int):
+        """Invalidate the cached lists of every node on the paths to the phrase's words"""
+        if not self._word_top and not self._node_top:
+            return
+        for word in self.phrase_words[phrase_id]:
+            self._word_top.pop(word, None)
+            for length in range(1, len(word) + 1):
+                self._node_top.pop(word[:length], None)
+
+    def _rank(self, phrase_ids: Iterable[int], limit: int) -> Tuple[int, ...]:
+        weight = self.weight
+        return tuple(nlargest(limit, phrase_ids, key=lambda phrase_id: (weight[phrase_id], -phrase_id)))
+
+    def _word_ranked(self, word: str) -> Tuple[int, ...]:
+        top = self._word_top.get(word)
+        if top is None:
+            top = self._word_top[word] = self._rank(self.words[word], self.k)
+        return top
+
+    def _top(self, prefix: str) -> Tuple[int, ...]:
+        """Top-k phrases with a word starting with the prefix"""
+        top = self._node_top.get(prefix)
+        if top is not None:
+            return top
+        vocabulary = self.vocabulary
+        start = bisect_left(vocabulary, prefix)
+        end = bisect_left(vocabulary, prefix + LAST_CHAR, start)
+        if end - start <= LEAF_SPAN:
+            return self._rank({phrase_id for word in vocabulary[start:end] for phrase_id in self._word_ranked(word)},
+                              self.k)
+
+        # Merge the children's lists: a phrase in the node's top-k is in the top-k of every child it appears in
+        candidates = set()
+        depth = len(prefix)
+        position = start
+        while position < end:
+            word = vocabulary[position]
+            if len(word) == depth:
+                candidates.update(self._word_ranked(word))
+                position += 1
+                continue
+            child = word[:depth + 1]
+            candidates.update(self._top(child))
+            position = bisect_left(vocabulary, child + LAST_CHAR, position, end)
+        top = self._node_top[prefix] = self._rank(candidates, self.k)
+        return top
+
+    def _matching_all(self, tokens: List[str]) -> Set[int]:
+        """Phrases with a word starting with each token, intersecting the most selective tokens first"""
+        matches = []
+        for token in tokens:
+            start = bisect_left(self.vocabulary, token)
+            end = bisect_left(self.vocabulary, token + LAST_CHAR, start)
+            words = self.vocabulary[start:end]
+            matches.append((sum(len(self.words[word]) for word in words), token, words))
+        matches.sort()
+
+        candidates = None
+        for size, token, words in matches:
+            if candidates is not None and size > 8 * len(candidates):
+                # Cheaper to check the few candidates left than to collect a broad prefix's postings
+                candidates = {
+                    phrase_id for phrase_id in candidates
+                    if any(word.startswith(token) for word in self.phrase_words[phrase_id])
+                }
+            else:
+                postings = set().union(*(self.words[word] for word in words))
+                candidates = postings if candidates is None else candidates & postings
+            if not candidates:
+                break
+        return candidates
+
+    def complete(self, text: str, limit: int = TOP_K) -> List[Dict]:
+        """Suggestions for partly typed text, most popular first.
+
+        Every typed word must begin some word of the phrase, in any order,
+        so "intro pyth" completes to "Introduction to Python".
+        """
+        tokens = list(dict.fromkeys(tokenize(text)))
+        if not tokens:
+            return []
+        self._sync_vocabulary()
+        limit = min(limit, self.k)
+        if len(tokens) == 1:
+            ranked = self._top(tokens[0])[:limit]
+        else:
+            ranked = self._rank(self._matching_all(tokens), limit)
+        return [self._suggestion(phrase_id) for phrase_id in ranked]
+
+    def _suggestion(self, phrase_id: int) -> Dict:
+        return {"text": self.text[phrase_id], "type": self.kind[phrase_id], "course_id": self.course_id[phrase_id]}
@@ -0,0 +1,307 @@
+import asyncio
+from datetime import datetime
+from typing import Dict, Iterable, List, Set, Tuple
+
+from sqlalchemy import func, insert, inspect, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from .models import Badge, Course, QuizResult, UserBadge, UserProgress, UserStats
+from .platform_stats import increment_stats
+
+PROGRESS_EVENT = "progress"
+QUIZ_EVENT = "quiz"
+
+# Per-user aggregates a criterion can test, and the event that changes each one
+METRIC_EVENTS = {
+    "courses_completed": PROGRESS_EVENT,
+    "minutes_spent": PROGRESS_EVENT,
+    "categories_covered": PROGRESS_EVENT,
+    "quizzes_completed": QUIZ_EVENT,
+}
+
+# Seeded when the badges table is empty; criteria are {"metric", "min"} or {"all": [...]}
+DEFAULT_BADGES = [
+    {"name": "First Course", "description": "Completed your first course", "icon": "award",
+     "criteria": {"metric": "courses_completed", "min": 1}},
+    {"name": "Quick Learner", "description": "Completed 3 courses", "icon": "zap",
+     "criteria": {"metric": "courses_completed", "min": 3}},
+    {"name": "Dedicated Student", "description": "Completed 10 courses", "icon": "book-open",
+     "criteria": {"metric": "courses_completed", "min": 10}},
+    {"name": "Time Master", "description": "Spent 50+ hours learning", "icon": "clock",
+     "criteria": {"metric": "minutes_spent", "min": 3000}},
+    {"name": "Explorer", "description": "Tried 3 different categories", "icon": "compass",
+     "criteria": {"metric": "categories_covered", "min": 3}},
+    {"name": "Self Aware", "description": "Completed the learning preferences quiz", "icon": "target",
+     "criteria": {"metric": "quizzes_completed", "min": 1}},
+]
+
+
+# INSERTs that can skip rows violating a unique index (one award, one stats row per user)
+CONFLICT_INSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+def compile_criteria(criteria: Dict) -> List[Tuple[str, int]]:
+    """(metric, minimum) pairs that must all hold; raises ValueError on unknown metrics"""
+    if not criteria:
+        raise ValueError("Badge has no criteria")
+    conditions = []
+    for condition in criteria.get("all", [criteria]):
+        metric = condition.get("metric")
+        if metric not in METRIC_EVENTS:
+            raise ValueError(f"Unknown badge metric: {metric}")
+        conditions.append((metric, int(condition.get("min", 1))))
+    return conditions
+
+
+class BadgeRule:
+    """A compiled badge: its conditions and the event types that can satisfy them"""
+
+    def __init__(self, badge_id: int, name: str, conditions: List[Tuple[str, int]]):
+        self.badge_id = badge_id
+        self.name = name
+        self.conditions = conditions
+        self.events = {METRIC_EVENTS[metric] for metric, _ in conditions}
+
+    def matches(self, aggregates: "UserAggregates") -> bool:
+        return all(aggregates.value(metric) >= minimum for metric, minimum in self.conditions)
+
+
+class UserAggregates:
+    """Running totals for one user, as the badge criteria see them"""
+
+    def __init__(self, completed: int = 0, minutes: int = 0, categories: Iterable[str] = (), quizzes: int = 0):
+        self.completed = completed
+        self.minutes = minutes
+        self.categories: Set[str] = set(categories)
+        self.quizzes = quizzes
+        self.earned: Set[int] = set()
+
+    def value(self, metric: str) -> int:
+        if metric == "courses_completed":
+            return self.completed
+        if metric == "minutes_spent":
+            return self.minutes
+        if metric == "categories_covered":
+            return len(self.categories)
+        return self.quizzes
+
+    def add(self, delta: "UserAggregates"):
+        self.completed += delta.completed
+        self.minutes += delta.minutes
+        self.categories |= delta.categories
+        self.quizzes += delta.quizzes
+
+    def row(self, user_id: str) -> Dict:
+        return {
+            "user_id": user_id,
+            "courses_completed": self.completed,
+            "minutes_spent": self.minutes,
+            "categories": sorted(self.categories),
+            "quizzes_completed": self.quizzes,
+            "updated_at": datetime.utcnow(),
+        }
+
+
+class BadgeEngine:
+    """Awards badges incrementally as progress and quiz events arrive.
+
+    Badge criteria are compiled once into rules indexed by the event type
+    they depend on. Each user's aggregates are stored in `user_stats` and
+    updated by the batch's deltas in the caller's transaction, with the rows
+    locked so concurrent workers don't lose each other's updates; a user
+    without a row gets one counted from their history once. Only the
+    not-yet-earned rules for the batch's event types are checked. Awards are
+    inserted in the same transaction, skipping any another process inserted
+    first. Callers in one process hold `lock` around that transaction so
+    their batches don't interleave.
+    """
+
+    def __init__(self):
+        self.rules: List[BadgeRule] = []
+        self.rules_by_event: Dict[str, List[BadgeRule]] = {}
+        self.loaded = False
+        self.lock = asyncio.Lock()
+
+    def load_rules(self, db):
+        """Compile every badge's criteria, seeding the defaults into an empty table.
+
+        Does nothing on a database `init_db()` hasn't created the tables in;
+        the rules are loaded on first use instead.
+        """
+        if not inspect(db.connection()).has_table(Badge.__tablename__):
+            return
+        if db.execute(select(func.count()).select_from(Badge)).scalar() == 0:
+            db.execute(insert(Badge), [{**badge, "created_at": datetime.utcnow()} for badge in DEFAULT_BADGES])
+        rules = []
+        for badge in db.execute(select(Badge.id, Badge.name, Badge.criteria)):
+            try:
+                rules.append(BadgeRule(badge.id, badge.name, compile_criteria(badge.criteria)))
+            except (ValueError, TypeError, AttributeError) as e:
+                print(f"Skipping badge {badge.name}: {e}")
+        self.rules = rules
+        self.rules_by_event = {}
+        for rule in rules:
+            for event_type in rule.events:
+                self.rules_by_event.setdefault(event_type, []).append(rule)
+        self.loaded = True
+
+    def process(self, db, events: Iterable[Dict]) -> List[Dict]:
+        """Apply events (already written in `db`'s transaction) to their users' aggregates and award newly earned badges"""
+        if not self.loaded:
+            self.load_rules(db)
+        event_types: Dict[str, Set[str]] = {}
+        deltas: Dict[str, UserAggregates] = {}
+        started: Dict[str, Set[int]] = {}
+        for event in events:
+            user_id = event["user_id"]
+            event_types.setdefault(user_id, set()).add(event["type"])
+            delta = deltas.setdefault(user_id, UserAggregates())
+            if event["type"] == PROGRESS_EVENT:
+                delta.completed += event["completed"]
+                delta.minutes += event["minutes"]
+                if event["started"] or event["completed"]:
+                    started.setdefault(user_id, set()).add(event["course_id"])
+            else:
+                delta.quizzes += 1
+        if not event_types:
+            return []
+
+        if started:
+            categories = course_categories(db, set().union(*started.values()))
+            for user_id, course_ids in started.items():
+                deltas[user_id].categories.update(categories[c] for c in course_ids if categories.get(c))
+
+        users = apply_deltas(db, deltas)
+        earned = db.execute(
+            select(UserBadge.user_id, UserBadge.badge_id).where(UserBadge.user_id.in_(list(event_types)))
+        )
+        for user_id, badge_id in earned:
+            users[user_id].earned.add(badge_id)
+
+        now = datetime.utcnow()
+        awards = []
+        for user_id, types in event_types.items():
+            aggregates = users[user_id]
+            candidates = {
+                rule.badge_id: rule
+                for event_type in types
+                for rule in self.rules_by_event.get(event_type, ())
+            }
+            for rule in candidates.values():
+                if rule.badge_id not in aggregates.earned and rule.matches(aggregates):
+                    awards.append({"user_id": user_id, "badge_id": rule.badge_id, "earned_at": now})
+
+        awarded = insert_awards(db, awards)
+        if awarded:
+            increment_stats(db, badges_awarded=len(awarded))
+        return awarded
+
+
+def course_categories(db, course_ids: Iterable[int]) -> Dict[int, str]:
+    return dict(db.execute(select(Course.id, Course.category).where(Course.id.in_(list(course_ids)))).all())
+
+
+def apply_deltas(db, deltas: Dict[str, UserAggregates]) -> Dict[str, UserAggregates]:
+    """Add each user's delta to their stored aggregates; returns the updated totals.
+
+    Users without a stored row get one counted from their full history,
+    which already includes the delta's events.
+    """
+    users = load_aggregates(db, list(deltas))
+    missing = [user_id for user_id in deltas if user_id not in users]
+    created = set()
+    if missing:
+        counted = count_aggregates(db, missing)
+        created = insert_aggregates(db, [counted[user_id].row(user_id) for user_id in missing])
+        users.update({user_id: counted[user_id] for user_id in created})
+        # Rows another transaction created meanwhile don't include this batch yet
+        users.update(load_aggregates(db, [user_id for user_id in missing if user_id not in created]))
+
+    changed = [user_id for user_id in deltas if user_id not in created]
+    for user_id in changed:
+        users[user_id].add(deltas[user_id])
+    if changed:
+        db.execute(update(UserStats), [users[user_id].row(user_id) for user_id in changed])
+    return users
+
+
+def load_aggregates(db, user_ids: List[str]) -> Dict[str, UserAggregates]:
+    """Stored aggregates of the given users, locked until the transaction ends; users without a row are left out"""
+    rows = db.execute(
+        select(UserStats.user_id, UserStats.courses_completed, UserStats.minutes_spent,
+               UserStats.categories, UserStats.quizzes_completed)
+        .where(UserStats.user_id.in_(user_ids))
+        .with_for_update()
+    )
+    return {
+        row.user_id: UserAggregates(row.courses_completed, row.minutes_spent, row.categories or (), row.quizzes_completed)
+        for row in rows
+    }
+
+
+def count_aggregates(db, user_ids: List[str]) -> Dict[str, UserAggregates]:
+    """Aggregates of the given users counted from their progress and quiz history"""
+    users = {user_id: UserAggregates() for user_id in user_ids}
+    progress = db.execute(
+        select(UserProgress.user_id, UserProgress.status, UserProgress.completed_at,
+               UserProgress.time_spent, Course.category)
+        .outerjoin(Course, Course.id == UserProgress.course_id)
+        .where(UserProgress.user_id.in_(user_ids))
+    )
+    for row in progress:
+        aggregates = users[row.user_id]
+        aggregates.minutes += row.time_spent or 0
+        if row.completed_at is not None:
+            aggregates.completed += 1
+        if row.category and (row.status != "not_started" or row.completed_at is not None):
+            aggregates.categories.add(row.category)
+    quizzes = db.execute(
+        select(QuizResult.user_id, func.count())
+        .where(QuizResult.user_id.in_(user_ids))
+        .group_by(QuizResult.user_id)
+    )
+    for user_id, count in quizzes:
+        users[user_id].quizzes = count
+    return users
+
+
+def insert_aggregates(db, rows: List[Dict]) -> Set[str]:
+    """Insert `user_stats` rows, skipping users a concurrent transaction inserted first; returns those inserted"""
+    dialect = db.get_bind().dialect.name
+    if dialect not in CONFLICT_INSERTS:
+        db.execute(insert(UserStats), rows)
+        return {row["user_id"] for row in rows}
+    statement = (
+        CONFLICT_INSERTS[dialect](UserStats).values(rows)
+        .on_conflict_do_nothing(index_elements=[UserStats.user_id])
+        .returning(UserStats.user_id)
+    )
+    return set(db.execute(statement).scalars())
+
+
+def insert_awards(db, awards: List[Dict]) -> List[Dict]:
+    """Insert awards, skipping badges a concurrent transaction awarded first; returns those inserted"""
+    if not awards:
+        return []
+    dialect = db.get_bind().dialect.name
+    if dialect not in CONFLICT_INSERTS:
+        db.execute(insert(UserBadge), awards)
+        return awards
+    statement = (
+        CONFLICT_INSERTS[dialect](UserBadge).values(awards)
+        .on_conflict_do_nothing(index_elements=[UserBadge.user_id, UserBadge.badge_id])
+        .returning(UserBadge.user_id, UserBadge.badge_id)
+    )
+    inserted = set(db.execute(statement).tuples())
+    return [award for award in awards if (award["user_id"], award["badge_id"]) in inserted]
+
+
+def load_user_badges(db, user_id: str) -> List[Dict]:
+    """Badges a user has earned, most recent first"""
+    rows = db.execute(
+        select(Badge.id, Badge.name, Badge.description, Badge.icon, UserBadge.earned_at)
+        .join(UserBadge, UserBadge.badge_id == Badge.id)
+        .where(UserBadge.user_id == user_id)
+        .order_by(UserBadge.earned_at.desc(), Badge.id)
+    ).mappings()
+    return [dict(row) for row in rows]
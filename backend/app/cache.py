@@ -0,0 +1,218 @@
+import itertools
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Sequence
+
+import orjson
+
+# Sentinel so a cached None/empty result still counts as a hit
+MISSING = object()
+
+
+# Version every cached response depends on; ResponseCache.invalidate() bumps it after a refresh
+DATA_VERSION = "data"
+
+
+def user_version(user_id: str) -> str:
+    """Version of the cached responses derived from one user's progress and quiz data"""
+    return f"user:{user_id}"
+
+
+class MemoryCacheBackend:
+    """In-process LRU cache with per-entry expiry, bounded by entry count.
+
+    Named versions other than DATA_VERSION are kept for the `max_versions`
+    most recently changed names. They are drawn from one increasing clock,
+    and a name without a recorded version reports the highest one evicted
+    so far, so an evicted name never returns to a version it had before a
+    later change.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_versions: int = 10000):
+        self.max_entries = max_entries
+        self.max_versions = max_versions
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._data_version = 0
+        self._versions: "OrderedDict[str, int]" = OrderedDict()
+        self._version_clock = itertools.count(1)
+        self._evicted_version = 0
+        self._lock = threading.Lock()
+
+    async def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISSING
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return MISSING
+            self._entries.move_to_end(key)
+            return value
+
+    async def set(self, key: str, value, ttl: float):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def get_versions(self, names: Sequence[str]) -> List[int]:
+        with self._lock:
+            return [self._data_version if name == DATA_VERSION else self._versions.get(name, self._evicted_version)
+                    for name in names]
+
+    async def bump_version(self, name: str = DATA_VERSION) -> int:
+        with self._lock:
+            version = next(self._version_clock)
+            if name == DATA_VERSION:
+                self._data_version = version
+                # Entries of older data versions can never be hit again
+                self._entries.clear()
+                return version
+            self._versions[name] = version
+            self._versions.move_to_end(name)
+            while len(self._versions) > self.max_versions:
+                _, evicted = self._versions.popitem(last=False)
+                self._evicted_version = max(self._evicted_version, evicted)
+            return version
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisCacheBackend:
+    """Cache shared by every worker through Redis (or anything speaking its protocol).
+
+    Values are stored as JSON with a TTL, never pickled: a shared Redis is
+    a trust boundary, and unpickling a value planted there would run
+    arbitrary code. Cached values are the same dicts, lists and scalars the
+    routes encode as JSON anyway, so tuples come back as lists and datetimes
+    as ISO strings, which encode to the same response. Versions live in
+    Redis counters, so a
+    refresh or a user's progress in one worker invalidates cached responses
+    in all of them. Eviction is left to Redis' own maxmemory/LRU policy.
+    The asyncio client keeps round trips off the event loop.
+    """
+
+    def __init__(self, url: str, prefix: str = "freecoursehub:cache"):
+        import redis.asyncio
+
+        self.client = redis.asyncio.Redis.from_url(url)
+        self.prefix = prefix
+
+    async def get(self, key: str):
+        payload = await self.client.get(f"{self.prefix}:{key}")
+        return MISSING if payload is None else orjson.loads(payload)
+
+    async def set(self, key: str, value, ttl: float):
+        await self.client.set(f"{self.prefix}:{key}", orjson.dumps(value), px=int(ttl * 1000))
+
+    async def get_versions(self, names: Sequence[str]) -> List[int]:
+        values = await self.client.mget([f"{self.prefix}:version:{name}" for name in names])
+        return [int(value or 0) for value in values]
+
+    async def bump_version(self, name: str = DATA_VERSION) -> int:
+        return int(await self.client.incr(f"{self.prefix}:version:{name}"))
+
+
+class CacheEntry:
+    """A lookup's key under the versions read for it, and the value found there (or MISSING)"""
+
+    __slots__ = ("route", "key", "versions", "value")
+
+    def __init__(self, route: str, key: str, versions: Dict[str, int], value):
+        self.route = route
+        self.key = key
+        self.versions = versions
+        self.value = value
+
+
+class ResponseCache:
+    """Route-level result cache keyed on normalized query parameters.
+
+    Every key embeds the current data version, plus any other versions the
+    route depends on (e.g. `user_version(user_id)`), so `invalidate()` makes
+    all earlier entries of that version unreachable at once. The versions
+    are read in one round trip per lookup, and `set()` stores under the key
+    the lookup computed. TTLs are set per route.
+    """
+
+    def __init__(self, backend=None, ttls: Dict[str, float] = None, default_ttl: float = 60,
+                 enabled: bool = True):
+        self.backend = backend or MemoryCacheBackend()
+        self.ttls = ttls or {}
+        self.default_ttl = default_ttl
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(route: str, params: Dict[str, Any] = None) -> str:
+        """Canonical key: empty params dropped, keys sorted, list values sorted"""
+        normalized = {}
+        for name, value in (params or {}).items():
+            if value is None or value == "" or value == [] or value == ():
+                continue
+            if isinstance(value, (list, tuple, set)):
+                value = sorted(str(item) for item in value)
+            normalized[name] = value
+        return f"{route}:{json.dumps(normalized, sort_keys=True, default=str)}"
+
+    async def get(self, route: str, params: Dict[str, Any] = None, versions: Sequence[str] = (),
+                  current: Dict[str, int] = None) -> CacheEntry:
+        """Look up the route and params under the current `versions` (and data version).
+
+        `current` reuses the versions an earlier lookup of the same request
+        read. The entry's `versions` hold the values used even when caching
+        is disabled, for callers that key their own state on them.
+        """
+        names = (DATA_VERSION, *versions)
+        if current is None or any(name not in current for name in names):
+            current = dict(zip(names, await self.backend.get_versions(names)))
+        prefix = ":".join(f"v{current[name]}" for name in names)
+        entry = CacheEntry(route, f"{prefix}:{self.make_key(route, params)}", current, MISSING)
+        if not self.enabled:
+            return entry
+        entry.value = await self.backend.get(entry.key)
+        if entry.value is MISSING:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    async def set(self, entry: CacheEntry, value):
+        """Store the value a lookup missed"""
+        if not self.enabled:
+            return
+        await self.backend.set(entry.key, value, self.ttls.get(entry.route, self.default_ttl))
+
+    async def invalidate(self, version: str = DATA_VERSION) -> int:
+        """Bump a version so no earlier entry depending on it is served again; returns the new version"""
+        return await self.backend.bump_version(version)
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+def create_response_cache(ttls: Dict[str, float] = None) -> ResponseCache:
+    """Build the cache from RESPONSE_CACHE_* settings; redis:// URLs select the shared backend"""
+    url = os.getenv("RESPONSE_CACHE_URL", "memory://")
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        backend = RedisCacheBackend(url)
+    else:
+        backend = MemoryCacheBackend(
+            max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 1024)),
+            max_versions=int(os.getenv("RESPONSE_CACHE_MAX_VERSIONS", 10000)),
+        )
+    return ResponseCache(
+        backend,
+        ttls=ttls,
+        default_ttl=float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", 60)),
+        enabled=os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true",
+    )
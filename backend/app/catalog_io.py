@@ -0,0 +1,137 @@
+"""
+Bulk catalog import and export as streaming NDJSON.
+
+Imports read NDJSON, a JSON array of course objects, or concatenated objects
+a chunk at a time, so memory stays bounded by the largest record rather than
+the file. Records are mapped onto the `Course` schema (including the older
+seed field names), deduplicated by canonical URL and written through
+`upsert_courses` in batches, one transaction per batch. Exports page through
+active courses with a server-side cursor.
+
+    python -m app.catalog_io import data/seed_courses.json more.ndjson
+    python -m app.catalog_io export catalog.ndjson
+"""
+import asyncio
+import json
+import sys
+from collections import Counter
+from itertools import islice
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, TextIO
+
+import orjson
+from sqlalchemy import select
+
+from .database import SessionLocal, engine, init_db
+from .ingestion import COURSE_FIELDS, upsert_courses
+from .models import Course
+from .platform_stats import reconcile_stats
+
+# Field names of the hand-written seed records and what they are in the Course schema
+FIELD_ALIASES = {"platform": "source", "topic": "category", "duration_minutes": "duration"}
+
+# Exported columns: the ingested fields plus what the database manages
+EXPORT_COLUMNS = [Course.id] + [getattr(Course, field) for field in COURSE_FIELDS] + [
+    Course.last_updated, Course.created_at,
+]
+
+# Skipped between records: whitespace, NDJSON newlines, array brackets and commas
+SEPARATORS = frozenset(" \t\r\n,[]")
+
+
+def iter_records(stream: TextIO, chunk_size: int = 1 << 16) -> Iterator[Dict]:
+    """JSON objects of an NDJSON file, a JSON array or concatenated objects, parsed incrementally"""
+    decoder = json.JSONDecoder()
+    buffer, position, done = "", 0, False
+    while True:
+        while position < len(buffer) and buffer[position] in SEPARATORS:
+            position += 1
+        if position < len(buffer):
+            try:
+                record, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # Most likely a record cut off at the end of the chunk read so far
+                if done:
+                    raise
+            else:
+                if not isinstance(record, dict):
+                    raise ValueError(f"Expected a course object, got {type(record).__name__}")
+                yield record
+                position = end
+                continue
+        elif done:
+            return
+        chunk = stream.read(chunk_size)
+        buffer = buffer[position:] + chunk
+        position = 0
+        done = not chunk
+
+
+def map_course(record: Dict) -> Dict:
+    """A record's Course fields, with the seed aliases renamed; unknown fields are dropped"""
+    course = {target: record[alias] for alias, target in FIELD_ALIASES.items() if alias in record}
+    course.update((field, record[field]) for field in COURSE_FIELDS if field in record)
+    return course
+
+
+def batches(items: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+async def import_courses(records: Iterable[Dict], batch_size: int = 500) -> Dict[str, int]:
+    """Upsert course records a batch per transaction; returns how many were read, inserted, updated and merged"""
+    counts = Counter()
+    for batch in batches(map(map_course, records), batch_size):
+        async with SessionLocal() as db, db.begin():
+            written, inserted, merged = await db.run_sync(upsert_courses, batch)
+        counts["read"] += len(batch)
+        counts["inserted"] += sum(inserted.values())
+        counts["updated"] += len(written) - sum(inserted.values())
+        counts["merged"] += sum(merged.values())
+    async with SessionLocal() as db, db.begin():
+        await db.run_sync(reconcile_stats)
+    return {name: counts[name] for name in ("read", "inserted", "updated", "merged")}
+
+
+async def export_courses(batch_size: int = 1000) -> AsyncIterator[bytes]:
+    """Active courses in id order as NDJSON, a batch of lines per chunk, from a server-side cursor"""
+    async with SessionLocal() as db:
+        result = await db.stream(
+            select(*EXPORT_COLUMNS)
+            .where(Course.is_active.is_(True))
+            .order_by(Course.id)
+            .execution_options(yield_per=batch_size)
+        )
+        async for rows in result.mappings().partitions():
+            yield b"".join(orjson.dumps(dict(row)) + b"\n" for row in rows)
+
+
+async def import_files(paths: List[str]):
+    try:
+        await init_db()
+        for path in paths:
+            with (sys.stdin if path == "-" else open(path, encoding="utf-8")) as stream:
+                counts = await import_courses(iter_records(stream))
+            print(f"{path}: {counts['read']} read, {counts['inserted']} inserted, "
+                  f"{counts['updated']} updated, {counts['merged']} merged as duplicates")
+    finally:
+        await engine.dispose()
+
+
+async def export_file(path: str):
+    try:
+        with (sys.stdout.buffer if path == "-" else open(path, "wb")) as stream:
+            async for chunk in export_courses():
+                stream.write(chunk)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 3 and sys.argv[1] == "import":
+        asyncio.run(import_files(sys.argv[2:]))
+    elif len(sys.argv) == 3 and sys.argv[1] == "export":
+        asyncio.run(export_file(sys.argv[2]))
+    else:
+        sys.exit("usage: python -m app.catalog_io import PATH... | export PATH  (- for stdin/stdout)")
@@ -0,0 +1,629 @@
+"""
+Read-only catalog snapshots shared between worker processes.
+
+The catalog columns and string dictionaries, the search index postings and
+vocabulary, the autocomplete phrases and the recommender's TF-IDF matrix
+are written once into a single snapshot file of flat arrays plus a small
+JSON footer locating them. Terms are stored sorted and looked up by
+bisection, so workers memory-map the file read-only and wrap the arrays
+without copying or building per-process dicts, and N workers share one
+copy of the pages through the OS page cache. Snapshots are built in a separate process
+(`python -m app.catalog_snapshot build PATH`) and published by renaming
+over the previous file: mapped readers keep the old inode until they
+switch, and every reader sees either the old or the new snapshot.
+"""
+import asyncio
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+from bisect import bisect_left
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, single-process serving only
+    fcntl = None
+
+from .autocomplete import CompletionIndex
+from .catalog_store import CourseCatalog, StringDictionary
+from .recommendations import RecommendationEngine
+from .search_index import CourseIndex
+
+MAGIC = b"FCHSNAP2"
+ALIGNMENT = 64
+FOOTER = struct.Struct("<QQ")
+
+
+def snapshot_identity(path: str) -> Optional[Tuple[int, int]]:
+    """(inode, mtime) of the published snapshot, which changes whenever a new one is renamed in"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns
+
+
+def _encode_strings(values: List[Optional[str]]) -> Dict[str, np.ndarray]:
+    encoded = [value.encode("utf-8") if value is not None else b"" for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    return {
+        "offsets": offsets,
+        "blob": np.frombuffer(b"".join(encoded), dtype=np.uint8),
+        "null": np.fromiter((value is None for value in values), dtype=bool, count=len(values)),
+    }
+
+
+def _prefixed(prefix: str, parts: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    return {f"{prefix}.{part}": array for part, array in parts.items()}
+
+
+def _encode_terms(terms: List[str]) -> Dict[str, np.ndarray]:
+    """Sorted strings; UTF-8 preserves code point order, so the encoded terms sort the same"""
+    parts = _encode_strings(terms)
+    del parts["null"]
+    return parts
+
+
+def _encode_postings(postings: Dict[str, Iterable[int]]) -> Dict[str, np.ndarray]:
+    terms = sorted(postings)
+    lengths = [len(postings[term]) for term in terms]
+    offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    ids = np.fromiter((course_id for term in terms for course_id in sorted(postings[term])),
+                      dtype=np.int64, count=int(offsets[-1]))
+    return {**_prefixed("terms", _encode_terms(terms)), "offsets": offsets, "ids": ids}
+
+
+def _encode_dictionary(dictionary: StringDictionary) -> Dict[str, np.ndarray]:
+    return {**_prefixed("values", _encode_strings(dictionary.values)),
+            **_prefixed("folded", _encode_postings(dictionary._folded))}
+
+
+def _encode_completions(completions: CompletionIndex) -> Dict[str, np.ndarray]:
+    """Phrases by id, and the word postings, sorted vocabulary and per-phrase words over it"""
+    arrays = {**_prefixed("text", _encode_strings(completions.text)), **_prefixed("kind", _encode_strings(completions.kind))}
+    arrays["course_id"] = np.fromiter((-1 if course_id is None else course_id for course_id in completions.course_id),
+                                      dtype=np.int64, count=len(completions.course_id))
+    arrays["weight"] = np.asarray(completions.weight, dtype=np.float64)
+    arrays.update(_prefixed("words", _encode_postings(completions.words)))
+    position = {word: position for position, word in enumerate(sorted(completions.words))}
+    lengths = np.fromiter((len(words) for words in completions.phrase_words), dtype=np.int64,
+                          count=len(completions.phrase_words))
+    arrays["phrase_words.offsets"] = np.concatenate(([0], np.cumsum(lengths))).astype(np.int64)
+    arrays["phrase_words.positions"] = np.fromiter(
+        (position[word] for words in completions.phrase_words for word in words),
+        dtype=np.int64, count=int(lengths.sum()))
+    return arrays
+
+
+def write_snapshot(path: str, catalog: CourseCatalog, index: CourseIndex, recommender: RecommendationEngine,
+                   completions: CompletionIndex):
+    """Serialize a built catalog, index, recommender and completions, then atomically replace `path`"""
+    size = catalog.size
+    arrays: Dict[str, np.ndarray] = {}
+    meta = {"created_at": datetime.utcnow().isoformat(), "size": size}
+
+    for name, column in catalog.columns.items():
+        arrays[f"column.{name}"] = column[:size]
+    for name, dictionary in catalog.dictionaries.items():
+        arrays.update(_prefixed(f"dictionary.{name}", _encode_dictionary(dictionary)))
+    arrays.update(_prefixed("tag_dictionary", _encode_dictionary(catalog.tag_dictionary)))
+    lengths = np.fromiter((len(tags) for tags in catalog.tags), dtype=np.int64, count=size)
+    arrays["tags.offsets"] = np.concatenate(([0], np.cumsum(lengths))).astype(np.int64)
+    arrays["tags.ids"] = np.fromiter((tag for tags in catalog.tags for tag in tags), dtype=np.int64,
+                                     count=int(lengths.sum()))
+    arrays["tags.rows"] = np.repeat(np.arange(size, dtype=np.int64), lengths)
+    for name, values in catalog.text.items():
+        for part, array in _encode_strings(values).items():
+            arrays[f"text.{name}.{part}"] = array
+    ids = catalog.column('id')
+    order = np.argsort(ids, kind='stable')
+    arrays["row_of.ids"] = ids[order]
+    arrays["row_of.rows"] = order.astype(np.int64)
+
+    for kind, fields in (("postings", index.postings), ("facets", index.facets)):
+        for field, postings in fields.items():
+            arrays.update(_prefixed(f"index.{kind}.{field}", _encode_postings(postings)))
+    arrays.update(_prefixed("index.vocabulary", _encode_terms(index.vocabulary)))
+    arrays["index.all_ids"] = np.sort(np.fromiter(index.all_ids, dtype=np.int64, count=len(index.all_ids)))
+
+    matrix = recommender.matrix
+    arrays["recommender.data"] = matrix.data
+    arrays["recommender.indices"] = matrix.indices
+    arrays["recommender.indptr"] = matrix.indptr
+    arrays["recommender.idf"] = recommender.idf
+    arrays["recommender.popular"] = np.asarray(recommender.popular, dtype=np.int64)
+    terms = sorted(recommender.vocabulary)
+    arrays.update(_prefixed("recommender.vocabulary", _encode_terms(terms)))
+    arrays["recommender.vocabulary.columns"] = np.fromiter(
+        (recommender.vocabulary[term] for term in terms), dtype=np.int64, count=len(terms))
+    meta["recommender"] = {"shape": list(matrix.shape)}
+
+    arrays.update(_prefixed("completions", _encode_completions(completions)))
+    meta["completions"] = {"phrases": len(completions)}
+
+    temporary = f"{path}.tmp-{os.getpid()}"
+    meta["arrays"] = {}
+    with open(temporary, "wb") as output:
+        output.write(MAGIC)
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            output.write(b"\0" * (-output.tell() % ALIGNMENT))
+            meta["arrays"][name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": output.tell()}
+            output.write(array.tobytes())
+        footer_offset = output.tell()
+        footer = json.dumps(meta).encode("utf-8")
+        output.write(footer)
+        output.write(FOOTER.pack(footer_offset, len(footer)))
+        output.flush()
+        os.fsync(output.fileno())
+    os.replace(temporary, path)
+
+
+class MappedStrings:
+    """Read-only list of optional strings over an offsets array and a UTF-8 blob"""
+
+    def __init__(self, offsets: np.ndarray, blob: np.ndarray, null: np.ndarray):
+        self.offsets = offsets
+        self.blob = blob
+        self.null = null
+
+    def __len__(self):
+        return len(self.null)
+
+    def __getitem__(self, row) -> Optional[str]:
+        if self.null[row]:
+            return None
+        return self.blob[self.offsets[row]:self.offsets[row + 1]].tobytes().decode("utf-8")
+
+    def __iter__(self):
+        return (self[row] for row in range(len(self)))
+
+
+class MappedTerms:
+    """Read-only sorted list of strings over an offsets array and a UTF-8 blob, searched by bisection"""
+
+    def __init__(self, offsets: np.ndarray, blob: np.ndarray):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[index] for index in range(*position.indices(len(self)))]
+        return self.blob[self.offsets[position]:self.offsets[position + 1]].tobytes().decode("utf-8")
+
+    def __iter__(self):
+        return (self[position] for position in range(len(self)))
+
+    def position(self, term) -> int:
+        """Index of the term, or -1 if it is not in the list"""
+        position = bisect_left(self, term)
+        return position if position < len(self) and self[position] == term else -1
+
+
+class MappedTags:
+    """Read-only per-row tuples of tag ids"""
+
+    def __init__(self, offsets: np.ndarray, ids: np.ndarray):
+        self.offsets = offsets
+        self.ids = ids
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row) -> tuple:
+        return tuple(self.ids[self.offsets[row]:self.offsets[row + 1]].tolist())
+
+    def __iter__(self):
+        return (self[row] for row in range(len(self)))
+
+
+class RowLookup:
+    """Course id -> row mapping answered by binary search over the sorted ids"""
+
+    def __init__(self, ids: np.ndarray, rows: np.ndarray):
+        self.ids = ids
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return iter(self.ids.tolist())
+
+    def _position(self, course_id) -> int:
+        position = int(np.searchsorted(self.ids, course_id))
+        if position < len(self.ids) and self.ids[position] == course_id:
+            return position
+        return -1
+
+    def __contains__(self, course_id) -> bool:
+        return self._position(course_id) >= 0
+
+    def __getitem__(self, course_id) -> int:
+        position = self._position(course_id)
+        if position < 0:
+            raise KeyError(course_id)
+        return int(self.rows[position])
+
+    def get(self, course_id, default=None):
+        position = self._position(course_id)
+        return default if position < 0 else int(self.rows[position])
+
+    def rows_for(self, course_ids: np.ndarray) -> np.ndarray:
+        """Rows of the ids that exist, vectorized"""
+        positions = np.minimum(np.searchsorted(self.ids, course_ids), max(len(self.ids) - 1, 0))
+        found = self.ids[positions] == course_ids if len(self.ids) else np.zeros(len(course_ids), dtype=bool)
+        return self.rows[positions[found]]
+
+
+class MappedPostings:
+    """Read-only term -> ids mapping over CSR arrays; lookups return fresh sets"""
+
+    def __init__(self, terms: MappedTerms, offsets: np.ndarray, ids: np.ndarray):
+        self.terms = terms
+        self.offsets = offsets
+        self.ids = ids
+
+    def __len__(self):
+        return len(self.terms)
+
+    def __iter__(self):
+        return iter(self.terms)
+
+    def __contains__(self, term) -> bool:
+        return self.terms.position(term) >= 0
+
+    def get(self, term, default=None):
+        position = self.terms.position(term)
+        if position < 0:
+            return default
+        return set(self.ids[self.offsets[position]:self.offsets[position + 1]].tolist())
+
+    def __getitem__(self, term):
+        ids = self.get(term)
+        if ids is None:
+            raise KeyError(term)
+        return ids
+
+    def count(self, term) -> int:
+        position = self.terms.position(term)
+        if position < 0:
+            return 0
+        return int(self.offsets[position + 1] - self.offsets[position])
+
+
+class MappedVocabulary:
+    """Read-only term -> matrix column mapping"""
+
+    def __init__(self, terms: MappedTerms, columns: np.ndarray):
+        self.terms = terms
+        self.columns = columns
+
+    def __len__(self):
+        return len(self.terms)
+
+    def get(self, term, default=None):
+        position = self.terms.position(term)
+        return default if position < 0 else int(self.columns[position])
+
+
+class MappedPhraseWords:
+    """Read-only per-phrase tuples of words, stored as positions in the sorted vocabulary"""
+
+    def __init__(self, offsets: np.ndarray, positions: np.ndarray, vocabulary: MappedTerms):
+        self.offsets = offsets
+        self.positions = positions
+        self.vocabulary = vocabulary
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, phrase_id) -> tuple:
+        start, end = self.offsets[phrase_id], self.offsets[phrase_id + 1]
+        return tuple(self.vocabulary[position] for position in self.positions[start:end].tolist())
+
+
+class MappedIdSet:
+    """Read-only set of course ids over a sorted array"""
+
+    def __init__(self, ids: np.ndarray):
+        self.ids = ids
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return iter(self.ids.tolist())
+
+    def __contains__(self, course_id) -> bool:
+        position = int(np.searchsorted(self.ids, course_id))
+        return position < len(self.ids) and self.ids[position] == course_id
+
+
+class MappedCourseCatalog(CourseCatalog):
+    """CourseCatalog whose columns, text and tags live in a mapped snapshot"""
+
+    def __init__(self, snapshot: "CatalogSnapshot"):
+        super().__init__(capacity=0)
+        arrays = snapshot.arrays
+        self.size = snapshot.meta["size"]
+        self.columns = {name: arrays[f"column.{name}"] for name in self.columns}
+        for name in self.dictionaries:
+            self.dictionaries[name] = MappedStringDictionary(arrays, f"dictionary.{name}")
+        self.tag_dictionary = MappedStringDictionary(arrays, "tag_dictionary")
+        self.tags = MappedTags(arrays["tags.offsets"], arrays["tags.ids"])
+        self._tag_pairs = (arrays["tags.rows"], arrays["tags.ids"])
+        self.text = {name: _strings(arrays, f"text.{name}") for name in self.TEXT_COLUMNS}
+        self.row_of = RowLookup(arrays["row_of.ids"], arrays["row_of.rows"])
+
+    def upsert(self, course: Dict) -> int:
+        raise TypeError("A mapped catalog snapshot is read-only")
+
+    def rows_for_ids(self, course_ids: Iterable[int]) -> np.ndarray:
+        course_ids = np.fromiter(course_ids, dtype=np.int64)
+        return np.sort(self.row_of.rows_for(course_ids))
+
+
+class MappedCourseIndex(CourseIndex):
+    """CourseIndex whose posting lists live in a mapped snapshot"""
+
+    def __init__(self, snapshot: "CatalogSnapshot"):
+        super().__init__()
+        arrays = snapshot.arrays
+        for kind, fields in (("postings", self.postings), ("facets", self.facets)):
+            for field in fields:
+                fields[field] = _postings(arrays, f"index.{kind}.{field}")
+        self._vocabulary = _terms(arrays, "index.vocabulary")
+        self.all_ids = MappedIdSet(arrays["index.all_ids"])
+
+    def add(self, course: Dict):
+        raise TypeError("A mapped index snapshot is read-only")
+
+    def remove(self, course_id: int):
+        raise TypeError("A mapped index snapshot is read-only")
+
+    def term_count(self, term: str, fields=CourseIndex.TEXT_FIELDS) -> int:
+        return sum(self.postings[field].count(term) for field in fields)
+
+
+class MappedStringDictionary(StringDictionary):
+    """StringDictionary whose values and case-folded lookup live in a mapped snapshot"""
+
+    def __init__(self, arrays: Dict[str, np.ndarray], prefix: str):
+        super().__init__()
+        self.values = _strings(arrays, f"{prefix}.values")
+        self._folded = _postings(arrays, f"{prefix}.folded")
+
+    def encode(self, value: Optional[str]) -> int:
+        raise TypeError("A mapped dictionary snapshot is read-only")
+
+
+class MappedCompletionIndex(CompletionIndex):
+    """CompletionIndex whose phrases, words and vocabulary live in a mapped snapshot.
+
+    Only the top-k lists of the prefixes looked up are kept per process.
+    """
+
+    def __init__(self, snapshot: "CatalogSnapshot"):
+        super().__init__()
+        arrays = snapshot.arrays
+        self.phrase_count = snapshot.meta["completions"]["phrases"]
+        self.text = _strings(arrays, "completions.text")
+        self.kind = _strings(arrays, "completions.kind")
+        self.course_id = arrays["completions.course_id"]
+        self.weight = arrays["completions.weight"]
+        self.words = _postings(arrays, "completions.words")
+        self.vocabulary = self.words.terms
+        self.phrase_words = MappedPhraseWords(
+            arrays["completions.phrase_words.offsets"], arrays["completions.phrase_words.positions"], self.vocabulary
+        )
+
+    def __len__(self):
+        return self.phrase_count
+
+    def add(self, course: Dict):
+        raise TypeError("A mapped completion snapshot is read-only")
+
+    def remove(self, course_id: int):
+        raise TypeError("A mapped completion snapshot is read-only")
+
+    def _suggestion(self, phrase_id: int) -> Dict:
+        course_id = int(self.course_id[phrase_id])
+        return {"text": self.text[phrase_id], "type": self.kind[phrase_id],
+                "course_id": course_id if course_id >= 0 else None}
+
+
+def _strings(arrays: Dict[str, np.ndarray], prefix: str) -> MappedStrings:
+    return MappedStrings(arrays[f"{prefix}.offsets"], arrays[f"{prefix}.blob"], arrays[f"{prefix}.null"])
+
+
+def _terms(arrays: Dict[str, np.ndarray], prefix: str) -> MappedTerms:
+    return MappedTerms(arrays[f"{prefix}.offsets"], arrays[f"{prefix}.blob"])
+
+
+def _postings(arrays: Dict[str, np.ndarray], prefix: str) -> MappedPostings:
+    return MappedPostings(_terms(arrays, f"{prefix}.terms"), arrays[f"{prefix}.offsets"], arrays[f"{prefix}.ids"])
+
+
+class SnapshotFormatError(ValueError):
+    """The file is not a snapshot, or one written by another version of the format"""
+
+
+class CatalogSnapshot:
+    """A mapped snapshot file; its arrays stay valid for as long as anything references them"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as snapshot:
+            stat = os.fstat(snapshot.fileno())
+            self.identity = (stat.st_ino, stat.st_mtime_ns)
+            self._map = mmap.mmap(snapshot.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            raise SnapshotFormatError(f"{path} is not a catalog snapshot of this version")
+        footer_offset, footer_length = FOOTER.unpack(self._map[-FOOTER.size:])
+        self.meta = json.loads(self._map[footer_offset:footer_offset + footer_length])
+        self.arrays = {
+            name: np.frombuffer(
+                self._map, dtype=np.dtype(spec["dtype"]), count=int(np.prod(spec["shape"])), offset=spec["offset"]
+            ).reshape(spec["shape"])
+            for name, spec in self.meta["arrays"].items()
+        }
+
+    def catalog(self) -> MappedCourseCatalog:
+        return MappedCourseCatalog(self)
+
+    def index(self) -> MappedCourseIndex:
+        return MappedCourseIndex(self)
+
+    def completions(self) -> MappedCompletionIndex:
+        return MappedCompletionIndex(self)
+
+    def adopt_recommendations(self, recommender: RecommendationEngine, catalog: CourseCatalog):
+        arrays = self.arrays
+        meta = self.meta["recommender"]
+        matrix = sparse.csr_matrix(
+            (arrays["recommender.data"], arrays["recommender.indices"], arrays["recommender.indptr"]),
+            shape=tuple(meta["shape"]), copy=False
+        )
+        vocabulary = MappedVocabulary(_terms(arrays, "recommender.vocabulary"), arrays["recommender.vocabulary.columns"])
+        recommender.adopt(catalog, matrix, vocabulary, arrays["recommender.idf"], arrays["recommender.popular"])
+
+
+class SnapshotLock:
+    """Exclusive advisory lock on `<path>.<suffix>`, blocking or not"""
+
+    def __init__(self, path: str, suffix: str):
+        self.path = f"{path}.{suffix}"
+        self._file = None
+
+    def acquire(self, blocking: bool = True) -> bool:
+        if self._file is not None:
+            return True
+        handle = open(self.path, "a")
+        if fcntl is not None:
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except BlockingIOError:
+                handle.close()
+                return False
+        self._file = handle
+        return True
+
+    def release(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+async def build_snapshot(path: str) -> bool:
+    """Build a snapshot from the stored catalog; False (and nothing written) if there are no courses"""
+    from .database import SessionLocal, engine
+    from .ingestion import load_stored_courses
+
+    try:
+        # Concurrent builders would each write a complete snapshot; serializing them keeps the newest last
+        with SnapshotLock(path, "lock"):
+            started = time.perf_counter()
+            async with SessionLocal() as db:
+                courses = await db.run_sync(load_stored_courses)
+            if not courses:
+                return False
+            catalog = CourseCatalog()
+            index = CourseIndex()
+            for course in courses:
+                catalog.upsert(course)
+                index.add(course)
+            del courses
+            recommender = RecommendationEngine()
+            recommender.build(catalog)
+            write_snapshot(path, catalog, index, recommender, CompletionIndex.from_catalog(catalog))
+            print(f"Wrote catalog snapshot of {catalog.size} courses to {path} "
+                  f"in {time.perf_counter() - started:.1f}s")
+            return True
+    finally:
+        await engine.dispose()
+
+
+async def build_in_subprocess(path: str) -> bool:
+    """Run the builder in its own process so the serving process neither blocks nor grows"""
+    process = await asyncio.create_subprocess_exec(sys.executable, "-m", "app.catalog_snapshot", "build", path)
+    if await process.wait() != 0:
+        raise RuntimeError(f"Catalog snapshot build exited with status {process.returncode}")
+    return os.path.exists(path)
+
+
+class SnapshotWatcher:
+    """Polls for a newly published snapshot every `interval` seconds and has the aggregator switch to it.
+
+    Started with `lead`, it also tries for the `leader` lock at startup and
+    on every poll until it gets it, then calls `on_leader`; so if the
+    leading worker exits, another one takes over within a poll.
+    """
+
+    def __init__(self, aggregator, interval: float = None, leader: SnapshotLock = None,
+                 on_leader: Callable[[], None] = None):
+        self.aggregator = aggregator
+        self.interval = interval or float(os.getenv("CATALOG_SNAPSHOT_POLL_SECONDS", 5))
+        self.leader = leader
+        self.on_leader = on_leader
+        self.lead = False
+        self.leading = False
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, lead: bool = False):
+        self.lead = lead and self.leader is not None
+        self._try_lead()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self.leading:
+            self.leader.release()
+            self.leading = False
+
+    def _try_lead(self):
+        if self.lead and not self.leading and self.leader.acquire(blocking=False):
+            self.leading = True
+            if self.on_leader is not None:
+                self.on_leader()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self._try_lead()
+            except Exception as e:
+                print(f"Taking the refresh leader lock failed: {e}")
+            try:
+                await self.aggregator.reload_snapshot()
+            except Exception as e:
+                print(f"Reloading the catalog snapshot failed: {e}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] != "build":
+        sys.exit("usage: python -m app.catalog_snapshot build PATH")
+    asyncio.run(build_snapshot(sys.argv[2]))
@@ -0,0 +1,241 @@
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from .search_index import normalize
+
+
+class StringDictionary:
+    """Interns repeated strings (category, level, source, tags) as integer codes"""
+
+    def __init__(self):
+        self.values: List[Optional[str]] = []
+        self._codes: Dict[Optional[str], int] = {}
+        self._folded: Dict[str, Set[int]] = {}
+
+    def __len__(self):
+        return len(self.values)
+
+    def encode(self, value: Optional[str]) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.values.append(value)
+            self._codes[value] = code
+            self._folded.setdefault(normalize(value), set()).add(code)
+        return code
+
+    def decode(self, code: int) -> Optional[str]:
+        return self.values[code]
+
+    def codes_for(self, value) -> List[int]:
+        """All codes whose value matches case-insensitively"""
+        return list(self._folded.get(normalize(value), ()))
+
+
+class CourseCatalog:
+    """Columnar, array-backed store for the course catalog.
+
+    Numeric fields live in NumPy columns, low-cardinality strings are
+    dictionary-encoded and tags are stored as tuples of integer ids.
+    Filters evaluate to boolean masks over the columns and only the rows
+    that are actually returned get turned back into course dicts.
+    """
+
+    NUMERIC_COLUMNS = {
+        'id': np.int64,
+        'rating': np.float32,
+        'duration': np.int32,
+        'students': np.int64,
+        'lessons': np.int32,
+        'last_updated': np.float64,
+        'created_at': np.float64,
+        'is_active': np.bool_,
+    }
+    ENCODED_COLUMNS = ('category', 'level', 'source')
+    TEXT_COLUMNS = ('title', 'description', 'instructor', 'url', 'thumbnail')
+    MISSING_INT = -1
+
+    def __init__(self, capacity: int = 1024):
+        self.size = 0
+        self._capacity = capacity
+        self.columns: Dict[str, np.ndarray] = {
+            name: np.zeros(capacity, dtype=dtype) for name, dtype in self.NUMERIC_COLUMNS.items()
+        }
+        self.columns.update({
+            name: np.zeros(capacity, dtype=np.int32) for name in self.ENCODED_COLUMNS
+        })
+        self.dictionaries: Dict[str, StringDictionary] = {
+            name: StringDictionary() for name in self.ENCODED_COLUMNS
+        }
+        self.tag_dictionary = StringDictionary()
+        self.tags: List[tuple] = []
+        self.text: Dict[str, List[Optional[str]]] = {name: [] for name in self.TEXT_COLUMNS}
+        self.row_of: Dict[int, int] = {}
+        # (row, tag id) pairs flattened into two arrays for facet counting; rebuilt after writes
+        self._tag_pairs: Optional[Tuple[np.ndarray, np.ndarray]] = None
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, course_id):
+        return course_id in self.row_of
+
+    def _grow(self):
+        self._capacity *= 2
+        for name, column in self.columns.items():
+            grown = np.zeros(self._capacity, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            self.columns[name] = grown
+
+    @staticmethod
+    def _timestamp(value) -> float:
+        if value is None:
+            return np.nan
+        if isinstance(value, str):
+            value = datetime.fromisoformat(value)
+        return value.timestamp()
+
+    def upsert(self, course: Dict) -> int:
+        """Insert a course or overwrite the row holding the same id"""
+        row = self.row_of.get(course['id'])
+        if row is None:
+            if self.size == self._capacity:
+                self._grow()
+            row = self.size
+            self.size += 1
+            self.row_of[course['id']] = row
+            self.tags.append(())
+            for values in self.text.values():
+                values.append(None)
+
+        columns = self.columns
+        columns['id'][row] = course['id']
+        rating = course.get('rating')
+        columns['rating'][row] = np.nan if rating is None else rating
+        for name in ('duration', 'students', 'lessons'):
+            value = course.get(name)
+            columns[name][row] = self.MISSING_INT if value is None else value
+        columns['last_updated'][row] = self._timestamp(course.get('last_updated'))
+        columns['created_at'][row] = self._timestamp(course.get('created_at'))
+        columns['is_active'][row] = course.get('is_active', True)
+        for name in self.ENCODED_COLUMNS:
+            columns[name][row] = self.dictionaries[name].encode(course.get(name))
+        self.tags[row] = tuple(self.tag_dictionary.encode(tag) for tag in course.get('tags') or [])
+        self._tag_pairs = None
+        for name, values in self.text.items():
+            values[row] = course.get(name)
+        return row
+
+    def extend(self, courses: Iterable[Dict]):
+        for course in courses:
+            self.upsert(course)
+
+    def column(self, name: str) -> np.ndarray:
+        """View of a column trimmed to the populated rows"""
+        return self.columns[name][:self.size]
+
+    def mask(self, min_rating=None, max_duration=None, level=None, category=None,
+             source=None, active_only=False) -> np.ndarray:
+        """Boolean mask of rows matching every given filter"""
+        mask = np.ones(self.size, dtype=bool)
+        if min_rating:
+            mask &= self.column('rating') >= min_rating
+        if max_duration:
+            duration = self.column('duration')
+            mask &= (duration != self.MISSING_INT) & (duration <= max_duration)
+        for name, value in (('level', level), ('category', category), ('source', source)):
+            if value:
+                mask &= np.isin(self.column(name), self.dictionaries[name].codes_for(value))
+        if active_only:
+            mask &= self.column('is_active')
+        return mask
+
+    def sort_ratings(self) -> np.ndarray:
+        """Ratings as the list is ordered by, a missing one counting as 0 (as in the database)"""
+        return np.nan_to_num(self.column('rating'), nan=0.0)
+
+    def keyset_mask(self, rating: float, course_id: int) -> np.ndarray:
+        """Rows strictly after (rating, id) in rating-desc, id-desc order"""
+        ratings = self.sort_ratings()
+        ids = self.column('id')
+        return (ratings < rating) | ((ratings == rating) & (ids < course_id))
+
+    def order_by_rating(self, rows: np.ndarray) -> np.ndarray:
+        """Sort rows by rating then id, both descending"""
+        return rows[np.lexsort((-self.column('id')[rows], -self.sort_ratings()[rows]))]
+
+    def rows_for_ids(self, course_ids: Iterable[int]) -> np.ndarray:
+        """Row positions for the given ids, in catalog order"""
+        rows = [self.row_of[course_id] for course_id in course_ids if course_id in self.row_of]
+        return np.sort(np.fromiter(rows, dtype=np.int64, count=len(rows)))
+
+    def ids_mask(self, course_ids: Iterable[int]) -> np.ndarray:
+        mask = np.zeros(self.size, dtype=bool)
+        mask[self.rows_for_ids(course_ids)] = True
+        return mask
+
+    def tag_names(self, row: int) -> List[str]:
+        return [self.tag_dictionary.decode(tag_id) for tag_id in self.tags[row]]
+
+    def materialize(self, row: int) -> Dict:
+        """Build the course dict for a single row"""
+        columns = self.columns
+        course = {name: values[row] for name, values in self.text.items()}
+        course['id'] = int(columns['id'][row])
+        rating = columns['rating'][row]
+        course['rating'] = None if np.isnan(rating) else round(float(rating), 2)
+        for name in ('duration', 'students', 'lessons'):
+            value = int(columns[name][row])
+            course[name] = None if value == self.MISSING_INT else value
+        for name in ('last_updated', 'created_at'):
+            value = columns[name][row]
+            course[name] = None if np.isnan(value) else datetime.fromtimestamp(value)
+        course['is_active'] = bool(columns['is_active'][row])
+        for name in self.ENCODED_COLUMNS:
+            course[name] = self.dictionaries[name].decode(columns[name][row])
+        course['tags'] = self.tag_names(row)
+        return course
+
+    def materialize_many(self, rows: Iterable[int]) -> List[Dict]:
+        return [self.materialize(int(row)) for row in rows]
+
+    def get(self, course_id: int) -> Optional[Dict]:
+        row = self.row_of.get(course_id)
+        return None if row is None else self.materialize(row)
+
+    def value_counts(self, name: str, mask: np.ndarray) -> Dict[str, int]:
+        """Matching rows per value of a dictionary-encoded column, most common first"""
+        counts = np.bincount(self.column(name)[mask], minlength=len(self.dictionaries[name]))
+        result: Dict[str, int] = {}
+        for code in np.flatnonzero(counts):
+            value = self.dictionaries[name].decode(int(code))
+            if value is not None:
+                result[value] = result.get(value, 0) + int(counts[code])
+        return dict(sorted(result.items(), key=lambda item: -item[1]))
+
+    def tag_counts(self, mask: np.ndarray, limit: int = None) -> Dict[str, int]:
+        """Matching rows per tag, most common first"""
+        if self._tag_pairs is None:
+            lengths = np.fromiter((len(tags) for tags in self.tags), dtype=np.int64, count=self.size)
+            tag_ids = np.fromiter((tag for tags in self.tags for tag in tags), dtype=np.int64, count=int(lengths.sum()))
+            self._tag_pairs = (np.repeat(np.arange(self.size), lengths), tag_ids)
+        rows, tag_ids = self._tag_pairs
+        counts = np.bincount(tag_ids[mask[rows]], minlength=len(self.tag_dictionary))
+        order = np.argsort(-counts, kind='stable')[:limit]
+        return {self.tag_dictionary.decode(int(tag)): int(counts[tag]) for tag in order if counts[tag]}
+
+    def histogram(self, name: str, mask: np.ndarray, bounds: Sequence[float]) -> List[Dict]:
+        """Matching rows per bucket of a numeric column; `bounds` are ascending lower bounds, the last one open-ended"""
+        values = self.column(name)[mask]
+        if name == 'rating':
+            values = values[~np.isnan(values)]
+        else:
+            values = values[values != self.MISSING_INT]
+        buckets = np.searchsorted(np.asarray(bounds, dtype=np.float64), values, side='right') - 1
+        counts = np.bincount(buckets[buckets >= 0], minlength=len(bounds))
+        return [
+            {"min": low, "max": high, "count": int(count)}
+            for low, high, count in zip(bounds, list(bounds[1:]) + [None], counts)
+        ]
@@ -1,26 +1,212 @@
 import asyncio
-import aiohttp
-import feedparser
-import requests
-from bs4 import BeautifulSoup
-from typing import List, Dict, Optional
+from typing import Awaitable, Callable, List, Dict, Optional, Tuple
 from datetime import datetime
+import inspect
 import json
+import os
 import re
+import time
+import numpy as np
 
+from .autocomplete import CompletionIndex
+from .catalog_snapshot import CatalogSnapshot, SnapshotFormatError, build_in_subprocess, snapshot_identity
+from .catalog_store import CourseCatalog
+from .course_queries import OPTIONAL_COLUMNS, decode_cursor, encode_cursor, query_courses
+from .database import DATABASE_URL, SessionLocal
+from .fulltext import get_fulltext_backend, matching_course_ids, ranked_course_ids
+from .ingestion import (
+    IngestionPipeline, load_stored_courses, load_sync_state, record_source_sync,
+    save_sync_state, upsert_courses,
+)
+from .metrics import traced
+from .platform_stats import increment_stats
 from .schemas import CourseResponse
+from .recommendations import RecommendationEngine, load_user_profile
+from .resilience import CircuitOpenError, HostRateLimits, SourceGuard
+from .search_index import CourseIndex
+
+# Fields left out of list pages unless requested
+LIST_EXTRAS = tuple(OPTIONAL_COLUMNS)
+
+# Facet histogram lower bounds (rating in stars, duration in minutes) and how many tags to count
+RATING_BUCKETS = (0.0, 3.0, 3.5, 4.0, 4.5)
+DURATION_BUCKETS = (0, 30, 60, 180, 600)
+FACET_TAG_LIMIT = 20
+# Courses per page of a full-text advanced search
+SEARCH_PAGE_SIZE = 50
+
+# Keys of CourseAggregator.sources and what /api/sources lists, known without loading the aggregators
+SOURCE_INFO = {
+    'youtube': {"name": "YouTube", "type": "video"},
+    'opencourseware': {"name": "OpenCourseWare", "type": "academic"},
+    'telegram': {"name": "Telegram", "type": "community"},
+    'saylor': {"name": "Saylor", "type": "academic"},
+    'swayam': {"name": "SWAYAM", "type": "academic"},
+}
+SOURCE_NAMES = tuple(SOURCE_INFO)
 
 class CourseAggregator:
+    source_names = SOURCE_NAMES
+    
     def __init__(self):
-        self.sources = {
-            'youtube': YouTubeAggregator(),
-            'opencourseware': OpenCourseWareAggregator(),
-            'telegram': TelegramAggregator(),
-            'saylor': SaylorAggregator(),
-            'swayam': SwayamAggregator()
-        }
-        self.mock_courses = self._load_mock_courses()
+        self._sources: Optional[Dict] = None
+        self.catalog = CourseCatalog()
+        self.index = CourseIndex()
+        self.completions = CompletionIndex()
+        self.pipeline: Optional[IngestionPipeline] = None
+        # Rate limits per upstream host, and retries and a circuit breaker per source, around every fetch
+        self.rate_limits = HostRateLimits()
+        self.guards = {name: SourceGuard(info["name"], self.rate_limits) for name, info in SOURCE_INFO.items()}
+        # Called with no arguments whenever a refresh changes the catalog; coroutine functions are awaited
+        self.change_listeners: List[Callable[[], Optional[Awaitable]]] = []
+        # Called with the courses each refresh wrote
+        self.ingest_listeners: List[Callable[[List[Dict]], None]] = []
+        self.recommender = RecommendationEngine()
+        self.change_listeners.append(self._rebuild_recommendations)
+        # FTS5 on SQLite, tsvector on PostgreSQL; None falls back to substring matching
+        self.fulltext = get_fulltext_backend(DATABASE_URL)
+        # With a snapshot path, the catalog, index and recommender vectors are mapped from a
+        # read-only file shared by every worker process instead of being built in each
+        self.snapshot_path = os.getenv("CATALOG_SNAPSHOT_PATH") or None
+        self.snapshot: Optional[CatalogSnapshot] = None
+        self._snapshot_lock = asyncio.Lock()
+        self._snapshot_requests = 0
+        self._snapshot_built = 0
+        # Empty until load_catalog() at startup; development fixtures if there is nothing stored
+        self.using_mock_courses = True
+    
+    @property
+    def sources(self) -> Dict:
+        """Source aggregators, imported with their scraping dependencies on first refresh"""
+        if self._sources is None:
+            from .source_aggregators import create_sources
+            self._sources = create_sources()
+        return self._sources
+
+    def _rebuild_recommendations(self):
+        """Catalog changed: rebuild the recommender's vectors off the event loop, once it is in use"""
+        self.recommender.mark_stale()
+        if self.recommender.matrix is not None:
+            self.recommender.rebuild(self.catalog)
+
+    def add_courses(self, courses: List[Dict]):
+        """Add or replace courses in the catalog and keep the search index in sync"""
+        for course in courses:
+            self.catalog.upsert(course)
+            self.index.add(course)
+            self.completions.add(course)
+
+    def _text_matches(self, row: int, term: str, include_tags: bool = True):
+        text = self.catalog.text
+        return (term in (text['title'][row] or '').lower() or
+                term in (text['description'][row] or '').lower() or
+                (include_tags and any(term in tag.lower() for tag in self.catalog.tag_names(row))))
+
+    def _matching_rows(self, mask, search=None, fields=CourseIndex.TEXT_FIELDS, limit=None, by_rating=False):
+        """Rows passing the mask and the text query, in catalog (or rating) order"""
+        if search:
+            mask &= self.catalog.ids_mask(self.index.search(search, fields=fields))
+        rows = np.flatnonzero(mask)
+        if by_rating:
+            rows = self.catalog.order_by_rating(rows)
+        if not search:
+            return rows if limit is None else rows[:limit]
+
+        # Index hits are candidates; confirm the full phrase on the survivors only
+        term = search.lower()
+        include_tags = 'tags' in fields
+        matched = []
+        for row in rows:
+            if self._text_matches(row, term, include_tags=include_tags):
+                matched.append(row)
+                if limit is not None and len(matched) >= limit:
+                    break
+        return matched
+    
+    @traced
+    async def load_catalog(self) -> bool:
+        """Startup: the snapshot or stored catalog, else the development fixtures; True if real data loaded"""
+        if await self.load_stored_courses():
+            return True
+        if not len(self.catalog):
+            self.add_courses(self._load_mock_courses())
+        return False
     
+    @traced
+    async def load_stored_courses(self) -> bool:
+        """Replace the fixtures with the stored catalog, if the database has any courses"""
+        if self.snapshot_path:
+            return await self.load_snapshot()
+        stored = await self._load_stored_courses()
+        if stored:
+            # Mock ids overlap real ones, so the fixtures can't be mixed in
+            self.using_mock_courses = False
+            self.catalog = CourseCatalog()
+            self.index = CourseIndex()
+            self.completions = CompletionIndex()
+            self.add_courses(stored)
+            await self._notify_change()
+        return bool(stored)
+    
+    @staticmethod
+    async def _load_stored_courses():
+        """Load active courses from the database, if it has been initialized.
+
+        Only a database without the courses table counts as empty; any other
+        error, such as a schema `init_db()` has not upgraded yet, is raised
+        rather than quietly serving the fixtures.
+        """
+        async with SessionLocal() as db:
+            return await db.run_sync(load_stored_courses)
+    
+    async def _notify_change(self):
+        for listener in self.change_listeners:
+            result = listener()
+            if inspect.isawaitable(result):
+                await result
+    
+    async def load_snapshot(self, rebuild: bool = False) -> bool:
+        """Map the shared catalog snapshot, building it first if it is missing or `rebuild` is set"""
+        if rebuild or snapshot_identity(self.snapshot_path) is None:
+            await self._publish_snapshot()
+        try:
+            return await self.reload_snapshot()
+        except SnapshotFormatError:
+            # Written by an older version of the format
+            await self._publish_snapshot()
+            return await self.reload_snapshot()
+    
+    async def reload_snapshot(self) -> bool:
+        """Switch to the published snapshot if it is not the one already mapped"""
+        identity = snapshot_identity(self.snapshot_path)
+        if identity is None:
+            return False
+        if self.snapshot is not None and identity == self.snapshot.identity:
+            return True
+        
+        def open_snapshot():
+            snapshot = CatalogSnapshot(self.snapshot_path)
+            return snapshot, snapshot.catalog(), snapshot.index(), snapshot.completions()
+        
+        snapshot, catalog, index, completions = await asyncio.to_thread(open_snapshot)
+        self.using_mock_courses = False
+        self.snapshot, self.catalog, self.index, self.completions = snapshot, catalog, index, completions
+        await self._notify_change()
+        # After the listeners, which start a recommender rebuild: its vectors come with the snapshot
+        snapshot.adopt_recommendations(self.recommender, catalog)
+        return True
+    
+    async def _publish_snapshot(self):
+        """Rebuild the snapshot from the database in a separate process; concurrent callers share a build"""
+        self._snapshot_requests += 1
+        requested = self._snapshot_requests
+        async with self._snapshot_lock:
+            if self._snapshot_built >= requested:
+                return
+            generation = self._snapshot_requests
+            await build_in_subprocess(self.snapshot_path)
+            self._snapshot_built = generation
+
     def _load_mock_courses(self):
         """Load mock courses for development"""
         return [
@@ -121,139 +307,288 @@ class CourseAggregator:
             }
         ]
     
-    async def get_courses(self, category=None, level=None, source=None, search=None, limit=50):
+    async def get_courses(self, category=None, level=None, source=None, search=None, limit=50,
+                          cursor=None, include=LIST_EXTRAS, db=None):
         """Get courses with optional filtering"""
-        courses = self.mock_courses.copy()
-        
-        # Apply filters
-        if category:
-            courses = [c for c in courses if c['category'].lower() == category.lower()]
+        courses, _ = await self.get_courses_page(
+            category=category, level=level, source=source, search=search,
+            limit=limit, cursor=cursor, include=include, db=db
+        )
+        return courses
+    
+    @traced
+    async def get_courses_page(self, category=None, level=None, source=None, search=None, limit=50,
+                               cursor=None, include=(), db=None):
+        """Get one page of courses, highest rated first, plus the cursor for the next page.
         
-        if level:
-            courses = [c for c in courses if c['level'].lower() == level.lower()]
+        With a database session the page comes from an indexed keyset query;
+        the in-memory catalog serves the development fixtures the same way.
+        """
+        if db is not None and not self.using_mock_courses:
+            return await db.run_sync(
+                query_courses, category=category, level=level, source=source,
+                search=search, limit=limit, cursor=cursor, include=include,
+                fulltext=self.fulltext
+            )
         
-        if source:
-            courses = [c for c in courses if c['source'].lower() == source.lower()]
+        mask = self.catalog.mask(category=category, level=level, source=source)
+        if cursor:
+            mask &= self.catalog.keyset_mask(*decode_cursor(cursor))
+        rows = self._matching_rows(mask, search=search, limit=limit + 1, by_rating=True)
         
-        if search:
-            search_lower = search.lower()
-            courses = [c for c in courses if 
-                      search_lower in c['title'].lower() or
-                      search_lower in c['description'].lower() or
-                      any(search_lower in tag.lower() for tag in c['tags'])]
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = encode_cursor(float(self.catalog.sort_ratings()[last]),
+                                        int(self.catalog.column('id')[last]))
         
-        return courses[:limit]
+        courses = self.catalog.materialize_many(rows)
+        for name in set(LIST_EXTRAS) - set(include):
+            for course in courses:
+                course.pop(name, None)
+        return courses, next_cursor
     
+    @traced
     async def get_course_by_id(self, course_id: int):
         """Get a specific course by ID"""
-        for course in self.mock_courses:
-            if course['id'] == course_id:
-                return course
-        return None
+        return self.catalog.get(course_id)
     
-    async def get_recommendations(self, user_id: str, limit: int = 6):
-        """Get personalized recommendations for a user"""
-        # For now, return popular courses from different categories
-        recommendations = []
-        categories_seen = set()
-        
-        for course in self.mock_courses:
-            if course['category'] not in categories_seen:
-                recommendations.append(course)
-                categories_seen.add(course['category'])
-                if len(recommendations) >= limit:
-                    break
-        
-        return recommendations
+    @traced
+    async def get_courses_by_ids(self, course_ids: List[int]) -> List[Optional[Dict]]:
+        """Courses for many ids in one call, in input order, with None for unknown ids"""
+        return [self.catalog.get(course_id) for course_id in course_ids]
+    
+    @traced
+    async def get_recommendations(self, user_id: str, limit: int = 6, db=None, version: int = 0):
+        """Get personalized recommendations for a user at their current data `version`"""
+        await self.recommender.ensure_built(self.catalog)
+        course_ids = self.recommender.cached(user_id, limit, version)
+        if course_ids is None:
+            course_ids = (await self.refresh_user_recommendations(user_id, db, version))[:limit]
+        return self._existing_courses(course_ids)
     
+    @traced
+    async def refresh_user_recommendations(self, user_id: str, db=None, version: int = 0):
+        """Recompute a user's precomputed recommendations after their data changed to `version`"""
+        await self.recommender.ensure_built(self.catalog)
+        profile = {"interests": [], "level": None, "progress": []}
+        if db is not None:
+            profile = await db.run_sync(load_user_profile, user_id)
+        return self.recommender.precompute(user_id, profile, version)
+    
+    @traced
     async def get_quiz_recommendations(self, quiz_answers: Dict):
         """Generate recommendations based on quiz answers"""
-        interests = quiz_answers.get('interests', [])
-        level = quiz_answers.get('level', 'beginner')
+        await self.recommender.ensure_built(self.catalog)
+        course_ids = self.recommender.recommend_for_answers(
+            quiz_answers.get('interests', []),
+            quiz_answers.get('level', 'beginner')
+        )
+        return self._existing_courses(course_ids)
+
+    def _existing_courses(self, course_ids: List[int]) -> List[Dict]:
+        """Courses for recommended ids; vectors of a replaced catalog may name courses it no longer has"""
+        courses = (self.catalog.get(course_id) for course_id in course_ids)
+        return [course for course in courses if course is not None]
+    
+    @traced
+    async def advanced_search(self, query: Dict, db=None) -> Tuple[List[Dict], Optional[str]]:
+        """Advanced search with multiple criteria; returns the courses and the next page's cursor.
+
+        Text queries through the full-text index are paged, `limit` courses
+        (SEARCH_PAGE_SIZE by default) at a time from `cursor`; other searches
+        return every match.
+        """
+        mask = self.catalog.mask(
+            min_rating=query.get('min_rating'),
+            max_duration=query.get('max_duration')
+        )
+        if query.get('tags'):
+            mask &= self.catalog.ids_mask(self.index.filter(tags=query['tags']))
         
-        recommendations = []
-        for course in self.mock_courses:
-            # Match interests with course category or tags
-            if interests:
-                interest_match = any(
-                    interest.lower() in course['category'].lower() or
-                    any(interest.lower() in tag.lower() for tag in course['tags'])
-                    for interest in interests
-                )
-                if interest_match and course['level'] == level:
-                    recommendations.append(course)
+        if query.get('query') and db is not None and self.fulltext is not None and not self.using_mock_courses:
+            return await self._ranked_search(query['query'], mask, int(query.get('limit') or SEARCH_PAGE_SIZE),
+                                             query.get('cursor'), db)
         
-        return recommendations[:6]
+        rows = self._matching_rows(mask, search=query.get('query'), fields=('title', 'description'))
+        return self.catalog.materialize_many(rows), None
+    
+    async def _ranked_search(self, search: str, mask, limit: int, cursor: Optional[str], db):
+        """Pages of relevance-ranked ids from the full-text index, filtered here until `limit` courses pass"""
+        row_of = self.catalog.row_of
+        rows = []
+        while True:
+            ranked = await db.run_sync(ranked_course_ids, self.fulltext, search, limit, cursor)
+            for course_id, score in ranked:
+                cursor = encode_cursor(score, course_id)
+                row = row_of.get(course_id)
+                if row is not None and mask[row]:
+                    rows.append(row)
+                    if len(rows) == limit:
+                        return self.catalog.materialize_many(rows), cursor
+            if len(ranked) < limit:
+                return self.catalog.materialize_many(rows), None
+    
+    @traced
+    async def autocomplete(self, text: str, limit: int = 10) -> List[Dict]:
+        """Completions for a partly typed search from titles, tags, instructors and categories"""
+        return self.completions.complete(text, limit)
+    
+    @traced
+    async def suggest_query(self, search: str) -> Optional[str]:
+        """"Did you mean" for a search that found nothing: its misspelled words swapped for title and tag terms"""
+        if not search:
+            return None
+        return self.index.suggest(search)
     
-    async def advanced_search(self, query: Dict):
-        """Advanced search with multiple criteria"""
-        courses = self.mock_courses.copy()
+    @traced
+    async def get_facets(self, category=None, level=None, source=None, tags=None, min_rating=None,
+                         max_duration=None, search=None, fields=CourseIndex.TEXT_FIELDS, db=None):
+        """Counts per category, level, source and tag plus rating and duration histograms.
         
-        if query.get('query'):
-            search_term = query['query'].lower()
-            courses = [c for c in courses if 
-                      search_term in c['title'].lower() or
-                      search_term in c['description'].lower()]
+        Computed over the columnar catalog in one pass of mask intersections
+        and bincounts. Each facet is counted with every filter except its
+        own, so the sidebar shows how many courses each alternative value
+        would give; `total` counts the rows matching every filter. With a
+        database the text search comes from its full-text index, matching
+        what the result list uses.
+        """
+        catalog = self.catalog
+        if search and db is not None and self.fulltext is not None and not self.using_mock_courses:
+            matched = catalog.ids_mask(await db.run_sync(matching_course_ids, self.fulltext, search))
+        elif search:
+            matched = np.zeros(len(catalog), dtype=bool)
+            matched[np.asarray(self._matching_rows(catalog.mask(), search=search, fields=fields), dtype=np.int64)] = True
+        else:
+            matched = np.ones(len(catalog), dtype=bool)
         
-        if query.get('min_rating'):
-            courses = [c for c in courses if c['rating'] >= query['min_rating']]
+        filters = {}
+        for name, value in (('category', category), ('level', level), ('source', source)):
+            if value:
+                filters[name] = catalog.mask(**{name: value})
+        if tags:
+            filters['tags'] = catalog.ids_mask(self.index.filter(tags=tags))
+        if min_rating:
+            filters['rating'] = catalog.mask(min_rating=min_rating)
+        if max_duration:
+            filters['duration'] = catalog.mask(max_duration=max_duration)
         
-        if query.get('max_duration'):
-            courses = [c for c in courses if c['duration'] <= query['max_duration']]
+        def without(facet=None):
+            mask = matched.copy()
+            for name, filter_mask in filters.items():
+                if name != facet:
+                    mask &= filter_mask
+            return mask
         
-        if query.get('tags'):
-            courses = [c for c in courses if 
-                      any(tag.lower() in [t.lower() for t in c['tags']] 
-                          for tag in query['tags'])]
+        return {
+            "total": int(without().sum()),
+            "category": catalog.value_counts('category', without('category')),
+            "level": catalog.value_counts('level', without('level')),
+            "source": catalog.value_counts('source', without('source')),
+            "tags": catalog.tag_counts(without('tags'), limit=FACET_TAG_LIMIT),
+            "rating": catalog.histogram('rating', without('rating'), RATING_BUCKETS),
+            "duration": catalog.histogram('duration', without('duration'), DURATION_BUCKETS),
+        }
+    
+    def source_status(self) -> List[Dict]:
+        """Every source with its live circuit breaker state and rate limit counters"""
+        return [
+            {**SOURCE_INFO[name], "active": guard.active, **guard.to_dict()}
+            for name, guard in self.guards.items()
+        ]
+    
+    async def _get_pipeline(self) -> IngestionPipeline:
+        """Long-lived pipeline so every refresh shares one connection pool and worker pool"""
+        if self.pipeline is None:
+            self.pipeline = IngestionPipeline()
+            await self.pipeline.start()
+        return self.pipeline
+    
+    async def close(self):
+        if self.pipeline is not None:
+            await self.pipeline.close()
+            self.pipeline = None
+    
+    @traced
+    async def refresh_source(self, source_name: str, full: bool = False):
+        """Fetch one source and write whatever changed.
         
-        return courses
+        Fetches are conditional on the stored per-page sync state unless
+        `full` is set, so unchanged feeds and pages cost a 304 and no writes.
+        """
+        aggregator = self.sources[source_name]
+        guard = self.guards[source_name]
+        if not guard.active:
+            guard.stats["rejected"] += 1
+            raise CircuitOpenError(aggregator.name, guard.breaker.retry_in())
+        started = time.perf_counter()
+        
+        sync_state = {} if full else await self._load_sync_state(aggregator.name)
+        pipeline = (await self._get_pipeline()).for_source(aggregator.name, sync_state, guard=guard)
+        fetched = await aggregator.fetch_courses(pipeline)
+        
+        written, inserted, merged = await self._store_courses(source_name, fetched, pipeline)
+        if written:
+            for listener in self.ingest_listeners:
+                listener(written)
+        if written and self.snapshot_path:
+            # Publish a new shared snapshot; the other workers pick it up when they next poll
+            await self.load_snapshot(rebuild=True)
+        elif written and self.using_mock_courses:
+            # Swap the fixtures out for the stored catalog, which includes this batch
+            await self.load_stored_courses()
+        elif written:
+            self.add_courses(written)
+            await self._notify_change()
+        
+        return {
+            "source": aggregator.name,
+            "items_fetched": len(fetched),
+            "new_courses": inserted,
+            "updated_courses": len(written) - inserted,
+            "merged_duplicates": merged,
+            "pages_unchanged": pipeline.stats["unchanged"] + pipeline.stats["not_modified"],
+            "bytes_downloaded": pipeline.stats["bytes"],
+            "duration": round(time.perf_counter() - started, 3),
+        }
     
-    async def refresh_all_sources(self):
+    @traced
+    async def refresh_all_sources(self, full: bool = False):
         """Refresh course data from all sources"""
-        tasks = []
-        for source_name, aggregator in self.sources.items():
-            tasks.append(aggregator.fetch_courses())
-        
-        # Run all source fetching in parallel
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        # Run all source fetching in parallel over the shared session
+        results = await asyncio.gather(
+            *(self.refresh_source(source_name, full=full) for source_name in self.source_names),
+            return_exceptions=True
+        )
         
-        # Process results and update database
         total_new_courses = 0
-        for i, result in enumerate(results):
+        for source_name, result in zip(self.source_names, results):
             if isinstance(result, Exception):
-                print(f"Error fetching from {list(self.sources.keys())[i]}: {result}")
+                print(f"Error fetching from {source_name}: {result}")
             else:
-                total_new_courses += len(result)
+                total_new_courses += result["new_courses"]
         
         return {"total_new_courses": total_new_courses}
-
-class YouTubeAggregator:
-    async def fetch_courses(self):
-        """Fetch courses from YouTube API"""
-        # In a real implementation, this would use YouTube Data API
-        # For now, return empty list
-        return []
-
-class OpenCourseWareAggregator:
-    async def fetch_courses(self):
-        """Fetch courses from OpenCourseWare platforms"""
-        # In a real implementation, this would scrape OCW sites
-        return []
-
-class TelegramAggregator:
-    async def fetch_courses(self):
-        """Fetch courses from Telegram channels"""
-        # In a real implementation, this would use Telegram Bot API
-        return []
-
-class SaylorAggregator:
-    async def fetch_courses(self):
-        """Fetch courses from Saylor Academy"""
-        # In a real implementation, this would scrape Saylor.org
-        return []
-
-class SwayamAggregator:
-    async def fetch_courses(self):
-        """Fetch courses from SWAYAM platform"""
-        # In a real implementation, this would use SWAYAM API
-        return []
+    
+    @staticmethod
+    async def _load_sync_state(source: str):
+        async with SessionLocal() as db:
+            return await db.run_sync(load_sync_state, source)
+    
+    @traced
+    async def _store_courses(self, source_name: str, courses: List[Dict], pipeline: IngestionPipeline):
+        """Write changed courses, page sync state and source bookkeeping in one transaction"""
+        aggregator = self.sources[source_name]
+        
+        def store(db):
+            written, inserted, merged = upsert_courses(db, courses)
+            save_sync_state(db, pipeline.updated_state, source=aggregator.name)
+            new_courses = inserted[aggregator.name]
+            previous_total = record_source_sync(db, aggregator, new_courses, datetime.utcnow())
+            increment_stats(db, total_courses=new_courses,
+                            course_platforms=int(previous_total == 0 and new_courses > 0))
+            return written, new_courses, merged[aggregator.name]
+        
+        async with SessionLocal() as db, db.begin():
+            return await db.run_sync(store)
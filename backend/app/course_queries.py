@@ -0,0 +1,109 @@
+import base64
+import json
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, exists, func, literal_column, or_, select
+
+from .models import Course
+
+# Columns loaded for list views; the heavy ones are only loaded when asked for
+LIST_COLUMNS = [
+    column for column in Course.__table__.columns
+    if column.name not in ("description", "tags", "content_hash", "canonical_url", "minhash")
+]
+OPTIONAL_COLUMNS = {
+    "description": Course.description,
+    "tags": Course.tags,
+}
+# The rating as the list is ordered by, a missing one counting as 0; matches the
+# expression in the `courses` keyset indexes, so it must stay a literal
+SORT_RATING = func.coalesce(Course.rating, literal_column("0"))
+# Table-valued functions listing the elements of a JSON array, by dialect
+JSON_ELEMENTS = {"sqlite": "json_each", "postgresql": "json_array_elements_text"}
+
+
+def encode_cursor(value, course_id: int) -> str:
+    """Opaque keyset cursor pointing just past the given (rating or score, id)"""
+    payload = json.dumps([value or 0.0, course_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[float, int]:
+    """Inverse of `encode_cursor`; raises ValueError for malformed cursors"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        value, course_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return float(value), int(course_id)
+    except (TypeError, ValueError, UnicodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def _like_pattern(term: str) -> str:
+    escaped = term.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def _tag_matches(dialect: str, pattern: str):
+    """Whether any of the course's tags contains the pattern; None where the dialect can't tell"""
+    if dialect not in JSON_ELEMENTS:
+        return None
+    tags = getattr(func, JSON_ELEMENTS[dialect])(Course.tags).table_valued("value")
+    return exists().select_from(tags).where(func.lower(tags.c.value).like(pattern, escape="\\"))
+
+
+def query_courses(db, category=None, level=None, source=None, search=None, limit=50,
+                  cursor: Optional[str] = None, include: Iterable[str] = (),
+                  fulltext=None) -> Tuple[List[Dict], Optional[str]]:
+    """One page of active courses ordered by rating then id, highest rated first.
+
+    Filters are case-insensitive and served by the lower() expression
+    indexes on `courses`. With a `fulltext` backend, searches go through the
+    full-text index and are ordered by relevance instead. Paging is keyset
+    based: the returned cursor encodes the last row's (rating or score, id),
+    with a missing rating taken as 0, so deep pages cost the same as the
+    first one. Only list columns are
+    loaded unless `include` names description and/or tags.
+    """
+    columns = LIST_COLUMNS + [OPTIONAL_COLUMNS[name] for name in include if name in OPTIONAL_COLUMNS]
+    query = select(*columns).where(Course.is_active.is_(True))
+    sort_key = SORT_RATING
+
+    if category:
+        query = query.where(func.lower(Course.category) == category.lower())
+    if level:
+        query = query.where(func.lower(Course.level) == level.lower())
+    if source:
+        query = query.where(func.lower(Course.source) == source.lower())
+    if search and fulltext is not None:
+        query, score = fulltext.apply(query, search)
+        if score is not None:
+            sort_key = score
+            query = query.add_columns(score.label("score"))
+    if search and sort_key is SORT_RATING:
+        pattern = _like_pattern(search)
+        matches = [
+            func.lower(Course.title).like(pattern, escape="\\"),
+            func.lower(Course.description).like(pattern, escape="\\"),
+        ]
+        tag_matches = _tag_matches(db.get_bind().dialect.name, pattern)
+        if tag_matches is not None:
+            matches.append(tag_matches)
+        query = query.where(or_(*matches))
+    if cursor:
+        value, course_id = decode_cursor(cursor)
+        query = query.where(or_(
+            sort_key < value,
+            and_(sort_key == value, Course.id < course_id),
+        ))
+
+    query = query.order_by(sort_key.desc(), Course.id.desc()).limit(limit + 1)
+    rows = [dict(row) for row in db.execute(query).mappings()]
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last.get("score", last["rating"]), last["id"])
+    for row in rows:
+        row.pop("score", None)
+    return rows, next_cursor
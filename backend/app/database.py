@@ -1,7 +1,14 @@
-from sqlalchemy import create_engine
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import SAWarning
+from sqlalchemy.schema import CreateIndex
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 import os
+import threading
+import time
+import warnings
+from typing import List
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -9,30 +16,176 @@ load_dotenv()
 # Database URL - using SQLite for development, can be changed to PostgreSQL for production
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./freecourse_hub.db")
 
+# Async drivers for the plain URLs accepted in DATABASE_URL
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgres": "postgresql+asyncpg",
+    "postgresql": "postgresql+asyncpg",
+}
+
+def async_database_url(url: str) -> str:
+    """Rewrite a plain sqlite:// or postgresql:// URL to use its async driver"""
+    scheme, rest = url.split(":", 1)
+    return ASYNC_DRIVERS.get(scheme, scheme) + ":" + rest
+
+
+class PoolMetrics:
+    """Checkout counts and wait times, recorded by MeteredPool"""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self._lock = threading.Lock()
+
+    def record_wait(self, seconds: float):
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait += seconds
+            self.max_wait = max(self.max_wait, seconds)
+
+
+pool_metrics = PoolMetrics()
+
+
+class MeteredPool(AsyncAdaptedQueuePool):
+    """Queue pool that times every checkout, including waits for a free connection"""
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            pool_metrics.record_wait(time.perf_counter() - started)
+
+
+def pool_options(url: str) -> dict:
+    """Pool settings from DB_POOL_* variables; in-memory SQLite keeps its single shared connection"""
+    if url.startswith("sqlite") and (":memory:" in url or url.rstrip("/").endswith(":")):
+        return {}
+    options = {
+        "poolclass": MeteredPool,
+        "pool_size": int(os.getenv("DB_POOL_SIZE", 5)),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", 10)),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", 30)),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", 1800)),
+        "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "true").lower() == "true",
+    }
+    if url.startswith("sqlite"):
+        # SQLite only has file locks to contend on; recycling and pinging buy nothing
+        options.update(pool_recycle=-1, pool_pre_ping=False)
+    return options
+
+
 # Create engine
-if DATABASE_URL.startswith("sqlite"):
-    engine = create_engine(
-        DATABASE_URL, 
-        connect_args={"check_same_thread": False}  # Only needed for SQLite
-    )
-else:
-    engine = create_engine(DATABASE_URL)
+POOL_OPTIONS = pool_options(DATABASE_URL)
+engine = create_async_engine(async_database_url(DATABASE_URL), **POOL_OPTIONS)
 
-# Create SessionLocal class
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Create SessionLocal class; objects stay usable after commit since sessions are short-lived
+SessionLocal = async_sessionmaker(engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
 
 # Create Base class
 Base = declarative_base()
 
 # Dependency to get DB session
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+def pool_status() -> dict:
+    """Connection pool occupancy and checkout wait times, for sizing workers"""
+    pool = engine.pool
+    status = {"pool": type(pool).__name__}
+    if isinstance(pool, AsyncAdaptedQueuePool):
+        status.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=max(pool.overflow(), 0),
+            max_overflow=POOL_OPTIONS["max_overflow"],
+            timeout=pool.timeout(),
+        )
+    checkouts = pool_metrics.checkouts
+    status.update(
+        checkouts=checkouts,
+        avg_wait_ms=round(pool_metrics.total_wait / checkouts * 1000, 3) if checkouts else 0.0,
+        max_wait_ms=round(pool_metrics.max_wait * 1000, 3),
+    )
+    return status
+
+def upgrade_schema(connection, metadata):
+    """Add the columns and indexes that tables created by an older version are missing.
+
+    `create_all` only creates missing tables, so a database from before a
+    column or index was added to the models is brought up to date here. New
+    columns are added nullable and filled in by the code that uses them;
+    duplicate rows are removed before a unique index is built over them
+    (see `remove_duplicates`), and indexes a table lists under `retired_indexes`
+    in its `info` are dropped. Every step checks first, so this is safe to
+    rerun.
+    """
+    inspector = inspect(connection)
+    for table in metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in columns:
+                continue
+            if not column.nullable and column.server_default is None:
+                raise RuntimeError(f"Cannot add required column {table.name}.{column.name} to an existing table")
+            column_type = column.type.compile(dialect=connection.dialect)
+            connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+        with warnings.catch_warnings():
+            # SQLite can't reflect expression indexes, so those are created with IF NOT EXISTS below
+            warnings.simplefilter("ignore", SAWarning)
+            indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            if index.name in indexes:
+                continue
+            if index.unique:
+                removed = remove_duplicates(connection, table, [column.name for column in index.columns])
+                if removed:
+                    print(f"Removed {removed} duplicate rows from {table.name} before creating {index.name}")
+            connection.execute(CreateIndex(index, if_not_exists=True))
+        for name in table.info.get("retired_indexes", ()):
+            connection.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+def remove_duplicates(connection, table, key: List[str]) -> int:
+    """Delete all but the newest row of each duplicated key; returns how many were deleted.
+
+    Rows with a NULL key column are kept, since a unique index allows any
+    number of them. Columns the table lists under `merge_duplicates` in its
+    `info` are first folded into the kept row (e.g. "sum", "min", "max").
+    """
+    not_null = " AND ".join(f"{column} IS NOT NULL" for column in key)
+    columns = ", ".join(key)
+    newest = f"SELECT MAX(id) FROM {table.name} WHERE {not_null} GROUP BY {columns}"
+    merged = table.info.get("merge_duplicates")
+    if merged:
+        same_key = " AND ".join(f"d.{column} = {table.name}.{column}" for column in key)
+        assignments = ", ".join(
+            f"{column} = (SELECT {function.upper()}(d.{column}) FROM {table.name} d WHERE {same_key})"
+            for column, function in merged.items()
+        )
+        connection.execute(text(
+            f"UPDATE {table.name} SET {assignments} WHERE id IN ({newest} HAVING COUNT(*) > 1)"
+        ))
+    result = connection.execute(text(f"DELETE FROM {table.name} WHERE {not_null} AND id NOT IN ({newest})"))
+    return result.rowcount
 
 # Initialize database
-def init_db():
+async def init_db():
     from .models import Base
-    Base.metadata.create_all(bind=engine)
+    from .fulltext import install_fulltext
+    from .ingestion import backfill_canonical_urls
+    # A throwaway engine, since connections are bound to the event loop running this
+    setup_engine = create_async_engine(async_database_url(DATABASE_URL))
+    try:
+        async with setup_engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+            await connection.run_sync(upgrade_schema, Base.metadata)
+            await connection.run_sync(backfill_canonical_urls)
+            await connection.run_sync(install_fulltext, DATABASE_URL)
+    finally:
+        await setup_engine.dispose()
@@ -0,0 +1,144 @@
+import hashlib
+import zlib
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import numpy as np
+from sqlalchemy import select
+
+from .models import Course, CourseSignatureBand
+from .search_index import tokenize
+
+# MinHash signature of NUM_PERM values split into BANDS bands of ROWS rows for LSH.
+# With 16 x 4 a pair at Jaccard 0.8 shares at least one band with probability > 0.999.
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 3
+# Texts with fewer shingles than this are too short to call near-duplicates
+MIN_SHINGLES = 5
+SIMILARITY_THRESHOLD = 0.8
+
+# Universal hashing (a * x + b) mod p over 32-bit shingle hashes; products stay below 2**64
+_PRIME = np.uint64(4294967311)
+_random = np.random.RandomState(20240101)
+_A = _random.randint(1, 2 ** 32 - 1, size=NUM_PERM, dtype=np.uint64)
+_B = _random.randint(0, 2 ** 32 - 1, size=NUM_PERM, dtype=np.uint64)
+
+# Query parameters that never identify content
+TRACKING_PARAMS = {"fbclid", "gclid", "si", "feature", "ref", "igshid", "mc_cid", "mc_eid"}
+HOST_ALIASES = {"youtu.be": "youtube.com", "m.youtube.com": "youtube.com", "telegram.me": "t.me"}
+
+
+def canonicalize_url(url: str) -> str:
+    """Normalize a course URL so mirrors and reposts of the same address compare equal.
+
+    Lower-cases the host, drops "www.", fragments, default ports, tracking
+    parameters and trailing slashes, sorts the query, treats http and https
+    alike and maps short/mobile hosts (youtu.be, m.youtube.com) to their
+    canonical form.
+    """
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    host = HOST_ALIASES.get(host, host)
+    path = parts.path.rstrip("/")
+    query = [
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.startswith("utm_") and key not in TRACKING_PARAMS
+    ]
+    if parts.hostname == "youtu.be" and path:
+        query.append(("v", path.lstrip("/")))
+        path = "/watch"
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+    scheme = "https" if parts.scheme in ("http", "https", "") else parts.scheme
+    return urlunsplit((scheme, host, path, urlencode(sorted(query)), ""))
+
+
+def shingles(text: str) -> set:
+    tokens = tokenize(text)
+    return {" ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(max(len(tokens) - SHINGLE_SIZE + 1, 0))}
+
+
+def minhash(course: Dict) -> Optional[np.ndarray]:
+    """MinHash signature over word shingles of title and description, or None if the text is too short"""
+    grams = shingles(f"{course.get('title') or ''} {course.get('description') or ''}")
+    if len(grams) < MIN_SHINGLES:
+        return None
+    hashes = np.fromiter((zlib.crc32(gram.encode("utf-8")) for gram in grams), dtype=np.uint64, count=len(grams))
+    return ((hashes[:, None] * _A + _B) % _PRIME).min(axis=0).astype(np.uint32)
+
+
+def band_keys(signature: np.ndarray) -> List[int]:
+    """One signed 64-bit bucket key per LSH band"""
+    keys = []
+    for band, rows in enumerate(signature.reshape(BANDS, ROWS)):
+        digest = hashlib.blake2b(bytes([band]) + rows.tobytes(), digest_size=8).digest()
+        keys.append(int.from_bytes(digest, "big", signed=True))
+    return keys
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of two signatures"""
+    return float(np.mean(a == b))
+
+
+def find_duplicates(db, courses: List[Dict]) -> Dict[int, Tuple[str, int, float]]:
+    """Near-duplicates of new courses among stored courses and earlier courses of the batch.
+
+    Each course needs a "signature" (or None). Candidates come from shared
+    LSH buckets: one indexed query against the stored band keys, plus a
+    dict for the batch itself, so nothing is compared pairwise. Candidates
+    are verified on estimated Jaccard similarity, and only courses from a
+    different source are merged. Returns {batch index: ("course", id,
+    similarity) or ("batch", index, similarity)}.
+    """
+    keys = {i: band_keys(course["signature"]) for i, course in enumerate(courses) if course["signature"] is not None}
+    if not keys:
+        return {}
+
+    stored_buckets: Dict[int, List[int]] = {}
+    all_keys = list({key for course_keys in keys.values() for key in course_keys})
+    for start in range(0, len(all_keys), 1000):
+        rows = db.execute(
+            select(CourseSignatureBand.band_key, CourseSignatureBand.course_id)
+            .where(CourseSignatureBand.band_key.in_(all_keys[start:start + 1000]))
+        )
+        for band_key, course_id in rows:
+            stored_buckets.setdefault(band_key, []).append(course_id)
+    candidate_ids = {course_id for ids in stored_buckets.values() for course_id in ids}
+    stored = {
+        row.id: (row.source, np.frombuffer(row.minhash, dtype=np.uint32))
+        for row in db.execute(
+            select(Course.id, Course.source, Course.minhash)
+            .where(Course.id.in_(candidate_ids), Course.minhash.isnot(None))
+        )
+    } if candidate_ids else {}
+
+    matches = {}
+    batch_buckets: Dict[int, List[int]] = {}
+    for i, course_keys in keys.items():
+        course = courses[i]
+        signature = course["signature"]
+        best = None
+        for course_id in {course_id for key in course_keys for course_id in stored_buckets.get(key, ())}:
+            source, other = stored.get(course_id, (None, None))
+            if other is not None and source != course.get("source"):
+                score = similarity(signature, other)
+                if score >= SIMILARITY_THRESHOLD and (best is None or score > best[2]):
+                    best = ("course", course_id, score)
+        if best is None:
+            for j in {j for key in course_keys for j in batch_buckets.get(key, ())}:
+                if courses[j].get("source") != course.get("source"):
+                    score = similarity(signature, courses[j]["signature"])
+                    if score >= SIMILARITY_THRESHOLD and (best is None or score > best[2]):
+                        best = ("batch", j, score)
+        if best is not None:
+            matches[i] = best
+        else:
+            # Only primaries go into the buckets, so aliases always point at a real course
+            for key in course_keys:
+                batch_buckets.setdefault(key, []).append(i)
+    return matches
@@ -0,0 +1,168 @@
+from typing import List, Optional, Tuple
+
+from sqlalchemy import and_, column, func, literal_column, or_, select, table, text
+
+from .course_queries import decode_cursor
+from .models import Course
+from .search_index import tokenize
+
+# Relative weight of each field when ranking matches
+TITLE_WEIGHT = 10.0
+TAGS_WEIGHT = 5.0
+DESCRIPTION_WEIGHT = 1.0
+
+courses_fts = table("courses_fts", column("rowid"))
+
+
+class SQLiteFullTextSearch:
+    """FTS5 external-content index over courses, kept in sync by triggers, ranked by BM25"""
+
+    dialect = "sqlite"
+
+    DDL = [
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS courses_fts USING fts5(
+            title, description, tags,
+            content='courses', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS courses_fts_insert AFTER INSERT ON courses BEGIN
+            INSERT INTO courses_fts(rowid, title, description, tags)
+            VALUES (new.id, new.title, new.description, new.tags);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS courses_fts_delete AFTER DELETE ON courses BEGIN
+            INSERT INTO courses_fts(courses_fts, rowid, title, description, tags)
+            VALUES ('delete', old.id, old.title, old.description, old.tags);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS courses_fts_update AFTER UPDATE OF title, description, tags ON courses BEGIN
+            INSERT INTO courses_fts(courses_fts, rowid, title, description, tags)
+            VALUES ('delete', old.id, old.title, old.description, old.tags);
+            INSERT INTO courses_fts(rowid, title, description, tags)
+            VALUES (new.id, new.title, new.description, new.tags);
+        END
+        """,
+    ]
+
+    def install(self, connection):
+        exists = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'courses_fts'")
+        ).first()
+        for statement in self.DDL:
+            connection.execute(text(statement))
+        if not exists:
+            # Index whatever was already in the table before the FTS index existed
+            connection.execute(text("INSERT INTO courses_fts(courses_fts) VALUES ('rebuild')"))
+
+    @staticmethod
+    def match_expression(search: str) -> Optional[str]:
+        """AND of quoted prefix terms, so user input can't inject FTS5 syntax"""
+        terms = tokenize(search)
+        if not terms:
+            return None
+        return " ".join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+
+    def apply(self, query, search: str) -> Tuple[object, object]:
+        """Restrict a courses query to matches; returns it with a higher-is-better score"""
+        expression = self.match_expression(search)
+        if expression is None:
+            return query, None
+        # bm25() is lower-is-better, so negate it for a uniform score
+        score = -func.bm25(literal_column("courses_fts"), TITLE_WEIGHT, DESCRIPTION_WEIGHT, TAGS_WEIGHT)
+        query = (
+            query.join(courses_fts, courses_fts.c.rowid == Course.id)
+            .where(literal_column("courses_fts").match(expression))
+        )
+        return query, score
+
+
+class PostgresFullTextSearch:
+    """Weighted tsvector column with a GIN index, ranked by ts_rank"""
+
+    dialect = "postgresql"
+
+    # Weights A (title) > B (tags) > D (description) feed ts_rank's boosting
+    DDL = [
+        """
+        ALTER TABLE courses ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(tags::text, '')), 'B') ||
+            setweight(to_tsvector('simple', coalesce(description, '')), 'D')
+        ) STORED
+        """,
+        "CREATE INDEX IF NOT EXISTS ix_courses_search_vector ON courses USING GIN (search_vector)",
+    ]
+
+    def install(self, connection):
+        for statement in self.DDL:
+            connection.execute(text(statement))
+
+    @staticmethod
+    def match_expression(search: str) -> Optional[str]:
+        terms = tokenize(search)
+        if not terms:
+            return None
+        return " & ".join("{}:*".format(term) for term in terms)
+
+    def apply(self, query, search: str) -> Tuple[object, object]:
+        expression = self.match_expression(search)
+        if expression is None:
+            return query, None
+        tsquery = func.to_tsquery("simple", expression)
+        vector = literal_column("courses.search_vector")
+        weights = literal_column("'{%s, 0.0, %s, %s}'::float4[]" % (
+            DESCRIPTION_WEIGHT / TITLE_WEIGHT, TAGS_WEIGHT / TITLE_WEIGHT, 1.0
+        ))
+        query = query.where(vector.op("@@")(tsquery))
+        return query, func.ts_rank(weights, vector, tsquery)
+
+
+BACKENDS = {
+    backend.dialect: backend for backend in (SQLiteFullTextSearch(), PostgresFullTextSearch())
+}
+
+
+def get_fulltext_backend(database_url: str):
+    """Full-text engine for the database behind DATABASE_URL, or None if unsupported"""
+    scheme = database_url.split(":", 1)[0].split("+", 1)[0]
+    if scheme == "postgres":
+        scheme = "postgresql"
+    return BACKENDS.get(scheme)
+
+
+def install_fulltext(connection, database_url: str):
+    backend = get_fulltext_backend(database_url)
+    if backend is not None:
+        backend.install(connection)
+
+
+def ranked_course_ids(db, backend, search: str, limit: int, cursor: Optional[str] = None) -> List[Tuple[int, float]]:
+    """(id, score) of up to `limit` active courses matching the query, best match first.
+
+    Ranked and cut off with LIMIT in the database and keyset paged on
+    (score, id) like `query_courses`: `cursor` is `encode_cursor(score, id)`
+    of the last course already seen.
+    """
+    query, score = backend.apply(select(Course.id).where(Course.is_active.is_(True)), search)
+    if score is None:
+        return []
+    query = query.add_columns(score.label("score"))
+    if cursor:
+        value, course_id = decode_cursor(cursor)
+        query = query.where(or_(score < value, and_(score == value, Course.id < course_id)))
+    query = query.order_by(score.desc(), Course.id.desc()).limit(limit)
+    return [(row.id, row.score) for row in db.execute(query)]
+
+
+def matching_course_ids(db, backend, search: str) -> List[int]:
+    """Ids of every active course matching the query, unranked, for counting facets"""
+    query, score = backend.apply(select(Course.id).where(Course.is_active.is_(True)), search)
+    if score is None:
+        return []
+    return list(db.execute(query).scalars())
@@ -0,0 +1,137 @@
+"""
+Typo-tolerant term lookup.
+
+Comparing a misspelled word against every indexed term is too slow for a
+large vocabulary, so terms are indexed by their character trigrams. A
+lookup counts how many trigrams each term shares with the query word, keeps
+the terms with enough overlap (a single edit changes at most four padded
+trigrams) and a close enough length, and only verifies those survivors
+with a bounded Damerau-Levenshtein distance.
+"""
+from typing import Iterable, List, Set, Tuple
+
+import numpy as np
+
+# Shorter terms have too few trigrams to find anything meaningful within an edit
+MIN_TERM_LENGTH = 4
+# Letters are counted into this many buckets for the bag-distance prefilter
+LETTER_BUCKETS = 32
+
+
+def trigrams(term: str) -> Set[str]:
+    """Character trigrams of the term padded at both ends, so its first and last letters weigh in"""
+    padded = f"$${term}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def trigram_key(gram: str) -> int:
+    """A trigram packed into one integer (code points fit in 21 bits)"""
+    return (ord(gram[0]) << 42) | (ord(gram[1]) << 21) | ord(gram[2])
+
+
+def _code_points(text: str) -> np.ndarray:
+    return np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32).astype(np.int64)
+
+
+def max_edits(term: str) -> int:
+    """Edits tolerated for a word of this length: none below 4 letters, two from 8"""
+    if len(term) < MIN_TERM_LENGTH:
+        return 0
+    return 1 if len(term) < 8 else 2
+
+
+def letter_counts(term: str) -> np.ndarray:
+    return np.bincount(_code_points(term) % LETTER_BUCKETS, minlength=LETTER_BUCKETS)
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance (Levenshtein plus adjacent transpositions).
+
+    Gives up as soon as every alignment costs more than `limit` and returns
+    `limit + 1`, so verifying a poor candidate is cheap.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    before_previous = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, before_previous[j - 2] + 1)
+            current[j] = value
+        if min(current) > limit:
+            return limit + 1
+        before_previous, previous = previous, current
+    return min(previous[-1], limit + 1)
+
+
+class TrigramIndex:
+    """Trigram -> term postings over a fixed vocabulary; rebuild it when the vocabulary changes.
+
+    Built with array operations rather than per-term loops: trigrams are
+    packed into integer keys, and postings are stored as one array of term
+    positions grouped by sorted key.
+    """
+
+    def __init__(self, terms: Iterable[str]):
+        # Numbers and identifiers aren't misspelled words
+        self.terms: List[str] = [term for term in terms if len(term) >= MIN_TERM_LENGTH and term.isalpha()]
+        count = len(self.terms)
+        self.lengths = np.fromiter((len(term) for term in self.terms), dtype=np.int64, count=count)
+
+        rows = np.repeat(np.arange(count), self.lengths)
+        buckets = rows * LETTER_BUCKETS + _code_points("".join(self.terms)) % LETTER_BUCKETS
+        self.letters = np.bincount(buckets, minlength=count * LETTER_BUCKETS).reshape(count, LETTER_BUCKETS).astype(np.int16)
+
+        padded = _code_points("".join(f"$${term}$" for term in self.terms))
+        gram_counts = self.lengths + 1
+        term_starts = np.cumsum(self.lengths + 3) - (self.lengths + 3)
+        gram_terms = np.repeat(np.arange(count), gram_counts)
+        firsts = np.repeat(term_starts - (np.cumsum(gram_counts) - gram_counts), gram_counts) + np.arange(gram_terms.size)
+        keys = (padded[firsts] << 42) | (padded[firsts + 1] << 21) | padded[firsts + 2]
+
+        order = np.lexsort((gram_terms, keys))
+        keys, gram_terms = keys[order], gram_terms[order]
+        # A trigram repeated within a term is posted once
+        distinct = np.ones(keys.size, dtype=bool)
+        distinct[1:] = (keys[1:] != keys[:-1]) | (gram_terms[1:] != gram_terms[:-1])
+        keys, self.postings = keys[distinct], gram_terms[distinct].astype(np.int32)
+        self.keys, starts = np.unique(keys, return_index=True)
+        self.offsets = np.append(starts, keys.size)
+
+    def __len__(self):
+        return len(self.terms)
+
+    def lookup(self, token: str, limit: int = None) -> List[Tuple[str, int]]:
+        """Terms within `limit` edits of the token (by default what its length allows), closest first"""
+        limit = max_edits(token) if limit is None else limit
+        if limit == 0 or not self.terms:
+            return []
+        token_keys = np.fromiter((trigram_key(gram) for gram in trigrams(token)), dtype=np.int64)
+        slots = np.searchsorted(self.keys, token_keys)
+        slots = slots[(slots < self.keys.size) & (self.keys[np.minimum(slots, self.keys.size - 1)] == token_keys)]
+        if not slots.size:
+            return []
+
+        postings = np.concatenate([self.postings[self.offsets[slot]:self.offsets[slot + 1]] for slot in slots])
+        positions, shared = np.unique(postings, return_counts=True)
+        candidates = positions[
+            (shared >= max(1, token_keys.size - 4 * limit))
+            & (np.abs(self.lengths[positions] - len(token)) <= limit)
+        ]
+        # Bag distance (letters to add or drop, ignoring order) never exceeds the edit distance
+        difference = self.letters[candidates] - letter_counts(token)
+        bag_distance = np.maximum(np.clip(difference, 0, None).sum(axis=1), np.clip(-difference, 0, None).sum(axis=1))
+        candidates = candidates[bag_distance <= limit]
+
+        matches = []
+        for position in candidates.tolist():
+            term = self.terms[position]
+            distance = edit_distance(token, term, limit)
+            if distance <= limit:
+                matches.append((term, distance))
+        matches.sort(key=lambda match: match[1])
+        return matches
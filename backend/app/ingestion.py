@@ -0,0 +1,498 @@
+import asyncio
+import copy
+import hashlib
+import json
+import multiprocessing
+import os
+from collections import Counter
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import datetime
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+
+from pydantic import ValidationError
+from sqlalchemy import bindparam, delete, insert, inspect, or_, select, update
+
+from .dedup import band_keys, canonicalize_url, find_duplicates, minhash
+from .models import Course, CourseAlias, CourseSignatureBand, CourseSource, SourceSyncState
+from .resilience import SourceGuard
+from .schemas import CourseCreate
+
+if TYPE_CHECKING:
+    import aiohttp
+
+# Columns an ingested course may set; everything else is managed by the database
+COURSE_FIELDS = (
+    "title", "description", "instructor", "duration", "level", "category", "source",
+    "url", "thumbnail", "rating", "students", "tags", "lessons",
+)
+
+
+SYNC_STATE_FIELDS = ("etag", "last_modified", "content_hash", "item_count", "checked_at", "changed_at")
+
+
+def chunked(items: List, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def request_key(url: str, params: Dict = None) -> str:
+    """Stable key for a fetched page: the URL plus its sorted query parameters"""
+    if not params:
+        return url
+    separator = "&" if "?" in url else "?"
+    return url + separator + urlencode(sorted((str(k), str(v)) for k, v in params.items()))
+
+
+def worker_context():
+    """Start method for the parse workers.
+
+    The pool is created lazily inside a server already running threads
+    (the event loop's executor, database drivers), and forking a
+    multithreaded process can deadlock the child on a lock some other
+    thread held. A forkserver forks from a clean single-threaded process;
+    spawn is the fallback where it isn't available.
+    """
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return multiprocessing.get_context(method)
+
+
+def course_fingerprint(course: Dict) -> str:
+    """Hash of the ingested fields, so unchanged courses can be skipped on upsert"""
+    values = [course.get(field) for field in COURSE_FIELDS]
+    return hashlib.sha256(json.dumps(values, default=str).encode("utf-8")).hexdigest()
+
+
+def validate_courses(courses: Iterable[Dict]) -> List[Dict]:
+    """Courses coerced to the CourseCreate schema, dropping invalid ones.
+
+    This is the only validation course data gets: the catalog and the API
+    serve stored courses as trusted from here on.
+    """
+    valid = []
+    for course in courses:
+        try:
+            valid.append(CourseCreate.model_validate(course).model_dump(exclude_unset=True))
+        except ValidationError as e:
+            print(f"Skipping invalid course {course.get('url')}: {e.error_count()} validation errors")
+    return valid
+
+
+def transient_error(error: BaseException) -> bool:
+    """Failures worth retrying: connection errors, timeouts, 429 and 5xx responses"""
+    import aiohttp
+
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status == 429 or error.status >= 500
+    return isinstance(error, (aiohttp.ClientError, asyncio.TimeoutError, OSError))
+
+
+class IngestionPipeline:
+    """Shared HTTP + parsing machinery for the source aggregators.
+
+    One pooled `aiohttp.ClientSession` is shared by every source, with a
+    global connection cap and a per-host limit. Page fetches are bounded by
+    a semaphore, and HTML/RSS parsing is handed to a worker pool so the event
+    loop keeps serving requests while a refresh is running.
+
+    When given the stored `sync_state` (ETag, Last-Modified and content hash
+    per page URL) fetches become conditional: a 304, or a 200 whose body
+    hashes the same as last time, is reported as unchanged and not parsed.
+    """
+
+    def __init__(self, max_connections: int = None, per_host: int = None,
+                 page_concurrency: int = None, parse_workers: int = None,
+                 timeout: float = None, executor: Optional[Executor] = None,
+                 sync_state: Dict[str, Dict] = None):
+        self.max_connections = max_connections or int(os.getenv("INGEST_MAX_CONNECTIONS", 64))
+        self.per_host = per_host or int(os.getenv("INGEST_PER_HOST", 4))
+        self.page_concurrency = page_concurrency or int(os.getenv("INGEST_PAGE_CONCURRENCY", 8))
+        self.parse_workers = parse_workers or int(os.getenv("INGEST_PARSE_WORKERS", os.cpu_count() or 2))
+        self.timeout = timeout or float(os.getenv("INGEST_TIMEOUT", 30))
+        self.session: Optional["aiohttp.ClientSession"] = None
+        self.executor = executor
+        self._owns_executor = executor is None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.sync_state = sync_state if sync_state is not None else {}
+        # Entries touched during this run, to be persisted together with the courses
+        self.updated_state: Dict[str, Dict] = {}
+        self.stats = Counter()
+        self.source: Optional[str] = None
+        self.guard: Optional[SourceGuard] = None
+
+    def for_source(self, name: str, sync_state: Dict[str, Dict] = None,
+                   guard: SourceGuard = None) -> "IngestionPipeline":
+        """View sharing this pipeline's session and workers but tracking its own sync state.
+
+        Lets the caller persist sync state only for sources whose fetch
+        succeeded, so a failed source is re-fetched in full next time. With
+        a guard, every request of the view is rate limited, retried and
+        subject to the source's circuit breaker.
+        """
+        view = copy.copy(self)
+        view.source = name
+        view.guard = guard
+        view.sync_state = sync_state if sync_state is not None else {}
+        view.updated_state = {}
+        view.stats = Counter()
+        view._owns_executor = False
+        return view
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def start(self):
+        if self.session is not None:
+            return
+        # Imported here so that serving the API never loads the HTTP client
+        import aiohttp
+        connector = aiohttp.TCPConnector(limit=self.max_connections, limit_per_host=self.per_host)
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            headers={"User-Agent": "FreeCourseHub/1.0 (+course aggregator)"},
+        )
+        self._semaphore = asyncio.Semaphore(self.page_concurrency)
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.parse_workers, mp_context=worker_context())
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+        if self.executor is not None and self._owns_executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    async def fetch_text(self, url: str, params: Dict = None, headers: Dict = None) -> Optional[str]:
+        """GET a page body, or None if it has not changed since the last sync.
+
+        Holds a slot of the page-concurrency semaphore while the request is
+        in flight, and goes through the source guard if the view has one.
+        """
+        key = request_key(url, params)
+        state = self.sync_state.get(key) or {}
+        headers = dict(headers or {})
+        if state.get("etag"):
+            headers["If-None-Match"] = state["etag"]
+        if state.get("last_modified"):
+            headers["If-Modified-Since"] = state["last_modified"]
+
+        if self.guard is None:
+            response = await self._get(url, params, headers)
+        else:
+            response = await self.guard.call(
+                urlsplit(url).hostname or url, lambda: self._get(url, params, headers), transient_error
+            )
+        now = datetime.utcnow()
+        if response is None:
+            self.stats["not_modified"] += 1
+            self._record(key, {**state, "checked_at": now})
+            return None
+        body, encoding, validators = response
+
+        self.stats["bytes"] += len(body)
+        digest = hashlib.sha256(body).hexdigest()
+        unchanged = state.get("content_hash") == digest
+        self._record(key, {
+            **state,
+            **validators,
+            "content_hash": digest,
+            "checked_at": now,
+            "changed_at": state.get("changed_at") if unchanged else now,
+        })
+        if unchanged:
+            self.stats["unchanged"] += 1
+            return None
+        self.stats["changed"] += 1
+        return body.decode(encoding, errors="replace")
+
+    async def _get(self, url: str, params: Dict, headers: Dict) -> Optional[Tuple[bytes, str, Dict]]:
+        """Body, encoding and cache validators of a page, or None on 304 Not Modified"""
+        async with self._semaphore:
+            async with self.session.get(url, params=params, headers=headers) as response:
+                if response.status == 304:
+                    return None
+                response.raise_for_status()
+                return await response.read(), response.get_encoding(), {
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                }
+
+    def _record(self, key: str, state: Dict):
+        self.sync_state[key] = state
+        self.updated_state[key] = state
+
+    async def parse(self, parser: Callable, payload: str, base_url: str) -> List[Dict]:
+        """Run a (module-level, picklable) parser in the worker pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, parser, payload, base_url)
+
+    async def fetch_and_parse(self, url: str, parser: Callable, params: Dict = None) -> Optional[List[Dict]]:
+        """Parsed courses of a page, or None if the page is unchanged"""
+        payload = await self.fetch_text(url, params=params)
+        if payload is None:
+            return None
+        courses = await self.parse(parser, payload, url)
+        self.sync_state[request_key(url, params)]["item_count"] = len(courses)
+        return courses
+
+    def was_empty(self, url: str, params: Dict = None) -> bool:
+        """Whether a page held no courses the last time its content changed"""
+        return (self.sync_state.get(request_key(url, params)) or {}).get("item_count") == 0
+
+    async def fetch_many(self, urls: Iterable[str], parser: Callable) -> List[Dict]:
+        """Fetch and parse independent pages concurrently"""
+        results = await asyncio.gather(*(self.fetch_and_parse(url, parser) for url in urls))
+        return [course for page in results if page for course in page]
+
+    async def fetch_paginated(self, url: str, parser: Callable, page_param: str = "page",
+                              first_page: int = 0, max_pages: int = 50,
+                              params: Dict = None) -> List[Dict]:
+        """Fetch numbered pages a window at a time until a page comes back empty.
+
+        Unchanged pages contribute nothing but do not end the walk, since a
+        later page may still have changed, unless they were empty last time.
+        """
+        courses = []
+        page = first_page
+        last_page = first_page + max_pages
+        while page < last_page:
+            window = range(page, min(page + self.page_concurrency, last_page))
+            page_params = [{**(params or {}), page_param: number} for number in window]
+            results = await asyncio.gather(*(
+                self.fetch_and_parse(url, parser, params=query) for query in page_params
+            ))
+            for result in results:
+                courses.extend(result or [])
+            if any(not result and (result is not None or self.was_empty(url, query))
+                   for result, query in zip(results, page_params)):
+                break
+            page = window.stop
+        return courses
+
+
+def upsert_courses(db, courses: List[Dict], batch_size: int = 500) -> Tuple[List[Dict], Counter, Counter]:
+    """Validate courses, insert new ones, update changed ones and merge cross-source duplicates, in batches.
+
+    Courses are keyed by canonical URL. Each batch costs one narrow SELECT of
+    the existing rows, one of known aliases and one LSH bucket lookup, then
+    executemany INSERT/UPDATEs. Unchanged courses are not written at all. A
+    course whose URL or text duplicates another source's course is recorded
+    as a `CourseAlias` of it instead of becoming a course of its own.
+    Returns the written courses in the shape the catalog expects, plus the
+    number of inserts and of merged duplicates per source. The caller owns
+    the transaction.
+    """
+    # Later duplicates of the same URL win
+    by_url = {canonicalize_url(course["url"]): course for course in validate_courses(courses) if course.get("url")}
+    written = []
+    inserted = Counter()
+    merged = Counter()
+    now = datetime.utcnow()
+
+    for batch in chunked(list(by_url.items()), batch_size):
+        canonical_urls = [canonical_url for canonical_url, _ in batch]
+        existing = {
+            row.canonical_url or canonicalize_url(row.url): row
+            for row in db.execute(
+                select(Course.id, Course.url, Course.canonical_url, Course.source,
+                       Course.content_hash, Course.created_at)
+                .where(or_(Course.canonical_url.in_(canonical_urls),
+                           Course.url.in_([course["url"] for _, course in batch])))
+            )
+        }
+        aliased = set(db.execute(
+            select(CourseAlias.canonical_url).where(CourseAlias.canonical_url.in_(canonical_urls))
+        ).scalars())
+
+        new_courses = []
+        changed_rows = []
+        aliases = []
+        for canonical_url, course in batch:
+            row = existing.get(canonical_url)
+            # A known duplicate, unless it is the course's own source listing it again: an
+            # identical-URL alias shares the course's canonical URL
+            if canonical_url in aliased and (row is None or row.source != course.get("source")):
+                continue
+            values = {field: course.get(field) for field in COURSE_FIELDS if field in course}
+            values["content_hash"] = course_fingerprint(course)
+            values["canonical_url"] = canonical_url
+            if row is None:
+                new_courses.append(values)
+            elif row.source != values.get("source"):
+                aliases.append(_alias(row.id, values, 1.0))
+            elif row.content_hash != values["content_hash"] or row.canonical_url is None:
+                changed_rows.append({**values, "id": row.id, "last_updated": now, "is_active": True})
+                written.append(_catalog_course(changed_rows[-1], row.created_at))
+
+        signatures = [minhash(values) for values in new_courses]
+        matches = find_duplicates(db, [
+            {"source": values.get("source"), "signature": signature}
+            for values, signature in zip(new_courses, signatures)
+        ])
+        new_rows = []
+        new_signatures = []
+        batch_aliases = []
+        for i, (values, signature) in enumerate(zip(new_courses, signatures)):
+            match = matches.get(i)
+            if match is None:
+                new_rows.append({**values, "minhash": _signature_bytes(signature),
+                                 "last_updated": now, "created_at": now, "is_active": True})
+                new_signatures.append(signature)
+            elif match[0] == "course":
+                aliases.append(_alias(match[1], values, match[2]))
+            else:
+                batch_aliases.append((values, new_courses[match[1]]["canonical_url"], match[2]))
+
+        bands = []
+        if changed_rows:
+            changed_signatures = [minhash(row) for row in changed_rows]
+            for row, signature in zip(changed_rows, changed_signatures):
+                row["minhash"] = _signature_bytes(signature)
+            db.execute(update(Course), changed_rows)
+            db.execute(delete(CourseSignatureBand).where(
+                CourseSignatureBand.course_id.in_([row["id"] for row in changed_rows])
+            ))
+            bands += _band_rows(zip((row["id"] for row in changed_rows), changed_signatures))
+        if new_rows:
+            db.execute(insert(Course), new_rows)
+            ids = dict(db.execute(
+                select(Course.canonical_url, Course.id)
+                .where(Course.canonical_url.in_([row["canonical_url"] for row in new_rows]))
+            ).all())
+            for row in new_rows:
+                written.append(_catalog_course({**row, "id": ids[row["canonical_url"]]}, now))
+                inserted[row.get("source")] += 1
+            bands += _band_rows((ids[row["canonical_url"]], signature) for row, signature in zip(new_rows, new_signatures))
+            aliases += [_alias(ids[primary_url], values, score) for values, primary_url, score in batch_aliases]
+        if bands:
+            # Plain executemany; these rows never need ORM bookkeeping
+            db.connection().execute(CourseSignatureBand.__table__.insert(), bands)
+        if aliases:
+            db.execute(insert(CourseAlias), aliases)
+            merged.update(alias["source"] for alias in aliases)
+
+    return written, inserted, merged
+
+
+def _signature_bytes(signature) -> Optional[bytes]:
+    return None if signature is None else signature.tobytes()
+
+
+def _band_rows(signatures: Iterable[Tuple[int, object]]) -> List[Dict]:
+    return [
+        {"band_key": key, "course_id": course_id}
+        for course_id, signature in signatures if signature is not None
+        for key in band_keys(signature)
+    ]
+
+
+def _alias(course_id: int, values: Dict, score: float) -> Dict:
+    return {
+        "course_id": course_id,
+        "source": values.get("source"),
+        "url": values["url"],
+        "canonical_url": values["canonical_url"],
+        "similarity": round(score, 3),
+        "created_at": datetime.utcnow(),
+    }
+
+
+def _catalog_course(values: Dict, created_at: datetime) -> Dict:
+    course = {field: values.get(field) for field in COURSE_FIELDS}
+    course.update(
+        id=values["id"],
+        last_updated=values["last_updated"],
+        created_at=created_at,
+        is_active=values["is_active"],
+    )
+    return course
+
+
+def load_sync_state(db, source: str = None) -> Dict[str, Dict]:
+    """Stored validators and content hashes for synced pages, keyed by URL"""
+    query = select(SourceSyncState)
+    if source is not None:
+        query = query.where(SourceSyncState.source == source)
+    return {
+        row.url: {field: getattr(row, field) for field in SYNC_STATE_FIELDS}
+        for row in db.execute(query).scalars()
+    }
+
+
+def save_sync_state(db, states: Dict[str, Dict], source: str = None, batch_size: int = 500):
+    """Upsert the sync state of the pages touched during a refresh"""
+    for batch in chunked(list(states.items()), batch_size):
+        urls = [url for url, _ in batch]
+        ids = dict(db.execute(
+            select(SourceSyncState.url, SourceSyncState.id).where(SourceSyncState.url.in_(urls))
+        ).all())
+        updates = []
+        inserts = []
+        for url, state in batch:
+            values = {field: state.get(field) for field in SYNC_STATE_FIELDS}
+            if url in ids:
+                updates.append({**values, "id": ids[url]})
+            else:
+                inserts.append({**values, "url": url, "source": source})
+        if updates:
+            db.execute(update(SourceSyncState), updates)
+        if inserts:
+            db.execute(insert(SourceSyncState), inserts)
+
+
+def record_source_sync(db, aggregator, inserted: int, synced_at: datetime) -> int:
+    """Stamp `CourseSource.last_sync` and bump `total_courses` for a refreshed source.
+
+    Returns the source's course total before this sync.
+    """
+    source = db.execute(select(CourseSource).where(CourseSource.name == aggregator.name)).scalar_one_or_none()
+    if source is None:
+        source = CourseSource(name=aggregator.name, type=aggregator.type, total_courses=0)
+        db.add(source)
+    previous = source.total_courses or 0
+    source.base_url = aggregator.base_url
+    source.last_sync = synced_at
+    source.total_courses = previous + inserted
+    return previous
+
+
+def backfill_canonical_urls(connection, batch_size: int = 500):
+    """Key courses stored before canonical URLs existed, so ingestion matches them by canonical URL"""
+    courses = Course.__table__
+    rows = connection.execute(select(courses.c.id, courses.c.url).where(courses.c.canonical_url.is_(None))).all()
+    statement = (
+        update(courses)
+        .where(courses.c.id == bindparam("course_id"))
+        .values(canonical_url=bindparam("canonical"))
+    )
+    for batch in chunked(rows, batch_size):
+        connection.execute(statement, [{"course_id": row.id, "canonical": canonicalize_url(row.url)} for row in batch])
+
+
+def load_stored_courses(db) -> List[Dict]:
+    """Active courses as `load_active_courses` returns them, or none if the database is uninitialized"""
+    if not inspect(db.connection()).has_table(Course.__tablename__):
+        return []
+    return load_active_courses(db)
+
+
+def load_active_courses(db) -> List[Dict]:
+    """Every active course, in id order, in the shape the catalog expects"""
+    rows = db.execute(select(Course).where(Course.is_active.is_(True)).order_by(Course.id))
+    return [course_to_dict(row) for row in rows.scalars()]
+
+
+def course_to_dict(row: Course) -> Dict:
+    return {
+        "id": row.id,
+        **{field: getattr(row, field) for field in COURSE_FIELDS},
+        "last_updated": row.last_updated,
+        "created_at": row.created_at,
+        "is_active": row.is_active,
+    }
@@ -1,21 +1,76 @@
-from fastapi import FastAPI, HTTPException, Depends, Query
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Depends, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse, PlainTextResponse, StreamingResponse
 from typing import List, Optional
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
 import uvicorn
 from datetime import datetime
+import asyncio
 import json
 import os
+import time
 
 from .models import Course, User, UserProgress, QuizResult
-from .database import get_db, SessionLocal
+from .database import SessionLocal, engine, get_db, pool_status
 from .course_aggregator import CourseAggregator
+from .catalog_snapshot import SnapshotLock, SnapshotWatcher
+from .catalog_io import export_courses
+from .cache import MISSING, create_response_cache, user_version
+from .scheduler import RefreshScheduler
+from .progress_buffer import ProgressWriteBuffer, load_progress_rows, summarize_progress
+from .platform_stats import StatsReconciler, increment_stats, read_stats
+from .badges import QUIZ_EVENT, BadgeEngine, load_user_badges
+from .metrics import (
+    METRICS_ENABLED, Counter, Gauge, MetricsMiddleware, SamplingProfiler, instrument_engine, registry,
+)
+from .serialization import CourseFragmentCache, json_response, with_facets
+from .thumbnails import ThumbnailCache, ThumbnailError, thumbnail_response
 from .schemas import CourseResponse, UserProfileResponse, ProgressUpdate
 
+# Most ids or progress updates accepted by one batch request
+MAX_BATCH_SIZE = 200
+
+# Seconds spent in each startup phase, reported on /metrics
+startup_seconds = {}
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Load the catalog (from the prebuilt snapshot when configured) and run the background tasks"""
+    started = time.perf_counter()
+    if request_profiler is not None:
+        request_profiler.start()
+    await course_aggregator.load_catalog()
+    await load_badge_rules()
+    periodic = os.getenv("REFRESH_SCHEDULE_ENABLED", "true").lower() == "true"
+    if snapshot_watcher is not None:
+        # The watcher starts the periodic refreshes once this worker holds the leader lock
+        snapshot_watcher.start(lead=periodic)
+        periodic = False
+    refresh_scheduler.start(periodic=periodic)
+    progress_buffer.start()
+    stats_reconciler.start()
+    startup_seconds["lifespan"] = time.perf_counter() - started
+    yield
+    await refresh_scheduler.stop()
+    if snapshot_watcher is not None:
+        await snapshot_watcher.stop()
+    await progress_buffer.stop()
+    await stats_reconciler.stop()
+    await course_aggregator.close()
+    await thumbnail_cache.close()
+    await engine.dispose()
+    if request_profiler is not None:
+        request_profiler.stop()
+
 app = FastAPI(
     title="FreeCourseHub API",
     description="API for aggregating and managing free courses",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -25,10 +80,112 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Did-You-Mean"],
 )
 
+# Request latency, DB statement and cache metrics on /metrics; METRICS_ENABLED=false removes all hooks
+request_profiler = SamplingProfiler() if os.getenv("PROFILE_SLOW_REQUESTS", "false").lower() == "true" else None
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware, profiler=request_profiler)
+    instrument_engine(engine)
+
 # Initialize course aggregator
 course_aggregator = CourseAggregator()
+refresh_scheduler = RefreshScheduler(course_aggregator)
+
+# Serving from a shared catalog snapshot: every worker follows newly published snapshots,
+# and only the worker holding the leader lock runs the periodic refreshes; the others keep
+# trying for it, so one of them takes over when the leader exits
+refresh_leader = SnapshotLock(course_aggregator.snapshot_path, "leader") if course_aggregator.snapshot_path else None
+snapshot_watcher = SnapshotWatcher(
+    course_aggregator, leader=refresh_leader, on_leader=refresh_scheduler.start
+) if course_aggregator.snapshot_path else None
+
+# Result cache, per-route TTLs in seconds; emptied whenever a refresh ingests new data
+response_cache = create_response_cache(ttls={
+    "courses": 60,
+    "facets": 60,
+    "course": 300,
+    "recommendations": 300,
+    "categories": 3600,
+})
+course_aggregator.change_listeners.append(response_cache.invalidate)
+
+# Encoded JSON per course, spliced into list responses; courses were validated at ingestion
+course_fragments = CourseFragmentCache()
+course_aggregator.change_listeners.append(course_fragments.clear)
+
+# Thumbnails proxied through a disk cache shared by the workers, so course cards only load from our origin
+thumbnail_cache = ThumbnailCache()
+if thumbnail_cache.prefetch_enabled:
+    course_aggregator.ingest_listeners.append(thumbnail_cache.schedule_prefetch)
+
+def collect_runtime_metrics():
+    cache_lookups = Counter("response_cache_lookups_total", "Response cache lookups by result", ("result",))
+    cache_lookups.inc("hit", amount=response_cache.hits)
+    cache_lookups.inc("miss", amount=response_cache.misses)
+    cache_ratio = Gauge("response_cache_hit_ratio", "Share of response cache lookups that hit")
+    cache_ratio.set(value=response_cache.hit_ratio)
+    pool = Gauge("db_pool_connections", "Database pool connections by state", ("state",))
+    status = pool_status()
+    for state in ("checked_out", "checked_in", "overflow"):
+        if state in status:
+            pool.set(state, value=status[state])
+    pool_wait = Gauge("db_pool_checkout_wait_seconds", "Connection checkout wait", ("stat",))
+    pool_wait.set("avg", value=status["avg_wait_ms"] / 1000)
+    pool_wait.set("max", value=status["max_wait_ms"] / 1000)
+    source_requests = Counter("source_requests_total", "Upstream requests per source by outcome", ("source", "result"))
+    source_throttled = Counter("source_throttled_seconds_total", "Time upstream requests waited for rate limit tokens",
+                               ("source",))
+    source_open = Gauge("source_circuit_open", "1 while a source's circuit breaker rejects requests", ("source",))
+    for name, guard in course_aggregator.guards.items():
+        for result, count in guard.stats.items():
+            source_requests.inc(name, result, amount=count)
+        source_throttled.inc(name, amount=guard.throttled_seconds)
+        source_open.set(name, value=int(not guard.active))
+    thumbnails = Counter("thumbnail_cache_events_total", "Thumbnail cache hits, misses, fetch errors and evictions",
+                         ("event",))
+    for event, count in thumbnail_cache.stats.items():
+        thumbnails.inc(event, amount=count)
+    progress = Gauge("progress_buffer_updates", "Progress updates waiting to be written, and given up on",
+                     ("state",))
+    progress.set("pending", value=len(progress_buffer.pending))
+    progress.set("dropped", value=progress_buffer.dropped)
+    startup = Gauge("app_startup_seconds", "Time spent in each startup phase", ("phase",))
+    for phase, seconds in startup_seconds.items():
+        startup.set(phase, value=seconds)
+    return [
+        cache_lookups, cache_ratio, pool, pool_wait,
+        source_requests, source_throttled, source_open, thumbnails, progress, startup,
+    ]
+
+registry.add_collector(collect_runtime_metrics)
+
+# Progress pings are coalesced in memory and written in batches
+progress_buffer = ProgressWriteBuffer()
+
+async def invalidate_recommendations(user_ids):
+    # Shared versions, so every worker recomputes these users' recommendations
+    await asyncio.gather(*(response_cache.invalidate(user_version(user_id)) for user_id in user_ids))
+
+progress_buffer.flush_listeners.append(invalidate_recommendations)
+
+# Badges are awarded in the same transaction as the progress or quiz write that earns them
+badge_engine = BadgeEngine()
+progress_buffer.write_hooks.append(badge_engine.process)
+progress_buffer.write_lock = badge_engine.lock
+
+# Platform counters are maintained incrementally by the write paths and recounted periodically
+stats_reconciler = StatsReconciler()
+
+async def load_badge_rules():
+    try:
+        async with SessionLocal() as db, db.begin():
+            await db.run_sync(badge_engine.load_rules)
+    except IntegrityError:
+        # Another worker process seeded the default badges first; load theirs
+        async with SessionLocal() as db, db.begin():
+            await db.run_sync(badge_engine.load_rules)
 
 @app.get("/")
 async def root():
@@ -40,104 +197,249 @@ async def get_courses(
     level: Optional[str] = Query(None),
     source: Optional[str] = Query(None),
     search: Optional[str] = Query(None),
-    limit: int = Query(50, le=100)
+    limit: int = Query(50, le=100),
+    cursor: Optional[str] = Query(None),
+    include: Optional[List[str]] = Query(None),
+    facets: bool = Query(False),
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get courses with optional filtering"""
+    """Get courses with optional filtering.
+    
+    Results are ordered by rating; pass the `X-Next-Cursor` response header
+    back as `cursor` to fetch the next page. `include=description` and
+    `include=tags` add those fields to the list view. With `facets=true`
+    the body is `{"courses": [...], "facets": {...}}`, adding match counts
+    per category, level, source and tag and rating/duration histograms.
+    
+    A search that matches nothing is retried with its misspelled words
+    corrected; the corrected query is returned in `X-Did-You-Mean`, and
+    the cursor and facets belong to it.
+    """
+    params = {"category": category, "level": level, "source": source, "search": search,
+              "limit": limit, "cursor": cursor, "include": include}
     try:
-        courses = await course_aggregator.get_courses(
-            category=category,
-            level=level,
-            source=source,
-            search=search,
-            limit=limit
-        )
-        return courses
+        cached = await response_cache.get("courses", params)
+        if cached.value is MISSING:
+            async def page(text):
+                return await course_aggregator.get_courses_page(
+                    category=category,
+                    level=level,
+                    source=source,
+                    search=text,
+                    limit=limit,
+                    cursor=cursor,
+                    include=include or (),
+                    db=db
+                )
+            courses, next_cursor = await page(search)
+            suggestion = None
+            if not courses and search:
+                suggestion = await course_aggregator.suggest_query(search)
+                if suggestion:
+                    courses, next_cursor = await page(suggestion)
+            cached.value = (courses, next_cursor, suggestion)
+            await response_cache.set(cached, cached.value)
+        courses, next_cursor, suggestion = cached.value
+        body = course_fragments.encode_list(courses)
+        if facets:
+            # Independent of the page, so every page of a query shares one entry
+            facet_params = {"category": category, "level": level, "source": source, "search": suggestion or search}
+            counts = await response_cache.get("facets", facet_params, current=cached.versions)
+            if counts.value is MISSING:
+                counts.value = await course_aggregator.get_facets(
+                    category=category, level=level, source=source, search=suggestion or search, db=db
+                )
+                await response_cache.set(counts, counts.value)
+            body = with_facets(body, counts.value)
+        headers = {}
+        if next_cursor:
+            headers["X-Next-Cursor"] = next_cursor
+        if suggestion:
+            headers["X-Did-You-Mean"] = suggestion
+        return json_response(body, headers=headers)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/courses/export")
+async def export_catalog():
+    """Every active course as NDJSON, streamed from the database without holding the catalog in memory"""
+    return StreamingResponse(export_courses(), media_type="application/x-ndjson")
+
+@app.get("/api/courses/batch", response_model=List[Optional[CourseResponse]])
+async def get_courses_batch(ids: List[int] = Query([])):
+    """Get many courses in one request (`?ids=1&ids=2...`), in input order; unknown ids are null"""
+    if len(ids) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_SIZE} ids per request")
+    try:
+        courses = await course_aggregator.get_courses_by_ids(ids)
+        return json_response(course_fragments.encode_list(courses))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/courses/autocomplete")
+async def autocomplete_courses(q: str = Query(..., max_length=100), limit: int = Query(8, ge=1, le=10)):
+    """Completions for a partly typed search, most popular first.
+    
+    Each suggestion is `{"text", "type", "course_id"}`, where type is
+    course, category, tag or instructor and course_id is set for courses.
+    """
+    return {"query": q, "suggestions": await course_aggregator.autocomplete(q, limit)}
+
 @app.get("/api/courses/{course_id}", response_model=CourseResponse)
 async def get_course(course_id: int):
     """Get a specific course by ID"""
     try:
-        course = await course_aggregator.get_course_by_id(course_id)
+        cached = await response_cache.get("course", {"id": course_id})
+        course = cached.value
+        if course is MISSING:
+            course = await course_aggregator.get_course_by_id(course_id)
+            await response_cache.set(cached, course)
         if not course:
             raise HTTPException(status_code=404, detail="Course not found")
-        return course
+        return json_response(course_fragments.fragment(course))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/courses/{course_id}/thumbnail")
+async def get_course_thumbnail(course_id: int, request: Request):
+    """The course's thumbnail, fetched from upstream once and then served from the disk cache"""
+    course = await course_aggregator.get_course_by_id(course_id)
+    if not course or not course.get("thumbnail"):
+        raise HTTPException(status_code=404, detail="Thumbnail not found")
+    try:
+        image = await thumbnail_cache.get(course["thumbnail"])
+    except ThumbnailError as e:
+        raise HTTPException(status_code=502, detail=str(e))
+    return thumbnail_response(image, request.headers)
+
 @app.get("/api/courses/recommended/{user_id}")
-async def get_recommended_courses(user_id: str, limit: int = Query(6, le=20)):
+async def get_recommended_courses(user_id: str, limit: int = Query(6, le=20), db: AsyncSession = Depends(get_db)):
     """Get personalized course recommendations"""
     try:
-        # In a real implementation, this would use ML algorithms
-        # For now, return courses based on user profile
-        recommendations = await course_aggregator.get_recommendations(user_id, limit)
-        return recommendations
+        # The user's shared version changes with their progress/quiz data, so cached entries never go stale
+        scope = user_version(user_id)
+        cached = await response_cache.get("recommendations", {"user_id": user_id, "limit": limit}, versions=(scope,))
+        recommendations = cached.value
+        if recommendations is MISSING:
+            recommendations = await course_aggregator.get_recommendations(
+                user_id, limit, db=db, version=cached.versions[scope]
+            )
+            await response_cache.set(cached, recommendations)
+        return json_response(course_fragments.encode_list(recommendations))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/courses/search")
-async def search_courses(query: dict):
-    """Advanced course search with multiple criteria"""
+async def search_courses(query: dict, db: AsyncSession = Depends(get_db)):
+    """Advanced course search with multiple criteria, best matches first.
+    
+    `"facets": true` in the query returns `{"courses": [...], "facets": {...}}`.
+    A text query that matches nothing is retried with its misspelled words
+    corrected, and the corrected query is returned in `X-Did-You-Mean`.
+    Full-text results come `"limit"` at a time; pass `X-Next-Cursor` back
+    as `"cursor"` for the next page.
+    """
     try:
-        results = await course_aggregator.advanced_search(query)
-        return results
+        results, next_cursor = await course_aggregator.advanced_search(query, db=db)
+        suggestion = None
+        if not results and query.get('query') and not query.get('cursor'):
+            suggestion = await course_aggregator.suggest_query(query['query'])
+            if suggestion:
+                query = {**query, 'query': suggestion}
+                results, next_cursor = await course_aggregator.advanced_search(query, db=db)
+        body = course_fragments.encode_list(results)
+        if query.get('facets'):
+            counts = await course_aggregator.get_facets(
+                tags=query.get('tags'),
+                min_rating=query.get('min_rating'),
+                max_duration=query.get('max_duration'),
+                search=query.get('query'),
+                fields=('title', 'description'),
+                db=db
+            )
+            body = with_facets(body, counts)
+        headers = {}
+        if next_cursor:
+            headers["X-Next-Cursor"] = next_cursor
+        if suggestion:
+            headers["X-Did-You-Mean"] = suggestion
+        return json_response(body, headers=headers)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/sources")
 async def get_available_sources():
-    """Get list of available course sources"""
-    return {
-        "sources": [
-            {"name": "YouTube", "type": "video", "active": True},
-            {"name": "OpenCourseWare", "type": "academic", "active": True},
-            {"name": "Telegram", "type": "community", "active": True},
-            {"name": "Saylor", "type": "academic", "active": True},
-            {"name": "SWAYAM", "type": "academic", "active": True}
-        ]
-    }
+    """Get list of available course sources; `active` is false while a source's circuit breaker is open"""
+    # Not cached: breaker state and request counters are live
+    return {"sources": course_aggregator.source_status()}
 
 @app.get("/api/categories")
 async def get_categories():
     """Get available course categories"""
-    return {
-        "categories": [
-            "Programming", "Data Science", "Marketing", "Design", 
-            "Business", "Languages", "Science", "Mathematics",
-            "Personal Development", "Arts", "Health", "Technology"
-        ]
-    }
+    cached = await response_cache.get("categories")
+    categories = cached.value
+    if categories is MISSING:
+        categories = {
+            "categories": [
+                "Programming", "Data Science", "Marketing", "Design", 
+                "Business", "Languages", "Science", "Mathematics",
+                "Personal Development", "Arts", "Health", "Technology"
+            ]
+        }
+        await response_cache.set(cached, categories)
+    return categories
 
 @app.post("/api/user/progress")
 async def update_user_progress(progress: ProgressUpdate):
-    """Update user's course progress"""
+    """Update user's course progress; written to the database in the next batch"""
+    if progress.course_id not in course_aggregator.catalog:
+        raise HTTPException(status_code=404, detail="Course not found")
     try:
-        # Store progress in database or local storage
-        # For now, return success response
+        progress_buffer.add(
+            progress.user_id, progress.course_id, progress.status, progress.progress, progress.time_spent
+        )
         return {"success": True, "message": "Progress updated successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/user/progress/batch")
+async def update_user_progress_batch(updates: List[ProgressUpdate]):
+    """Apply many progress updates in order, e.g. a page load or an offline sync, in one request"""
+    if len(updates) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_SIZE} updates per request")
+    unknown = sorted({progress.course_id for progress in updates if progress.course_id not in course_aggregator.catalog})
+    if unknown:
+        raise HTTPException(status_code=404, detail=f"Courses not found: {', '.join(map(str, unknown))}")
+    try:
+        for progress in updates:
+            progress_buffer.add(
+                progress.user_id, progress.course_id, progress.status, progress.progress, progress.time_spent
+            )
+        return {"success": True, "message": "Progress updated successfully", "updated": len(updates)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/api/user/{user_id}/progress")
-async def get_user_progress(user_id: str):
-    """Get user's learning progress"""
+async def get_user_progress(user_id: str, db: AsyncSession = Depends(get_db)):
+    """Get user's learning progress, including updates not yet flushed"""
     try:
-        # In a real implementation, fetch from database
-        # For now, return mock data
+        rows = await db.run_sync(load_progress_rows, user_id)
+        summary = summarize_progress(rows, progress_buffer.pending_for_user(user_id))
+        badges = await db.run_sync(load_user_badges, user_id)
         return {
             "user_id": user_id,
-            "completed_courses": [],
-            "in_progress_courses": [],
-            "total_hours": 0,
-            "badges": []
+            **summary,
+            "badges": badges
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/quiz/submit")
-async def submit_quiz(quiz_result: dict):
+async def submit_quiz(quiz_result: dict, db: AsyncSession = Depends(get_db)):
     """Submit quiz results and get recommendations"""
     try:
         # Process quiz results and generate recommendations
@@ -147,6 +449,14 @@ async def submit_quiz(quiz_result: dict):
         # Generate recommendations based on quiz answers
         recommendations = await course_aggregator.get_quiz_recommendations(answers)
         
+        # Persist the answers so the user's precomputed recommendations reflect them
+        if user_id != "anonymous":
+            async with badge_engine.lock:
+                await db.run_sync(save_quiz_result, user_id, answers, [course["id"] for course in recommendations])
+                await db.commit()
+            version = await response_cache.invalidate(user_version(user_id))
+            await course_aggregator.refresh_user_recommendations(user_id, db, version=version)
+        
         return {
             "success": True,
             "recommendations": recommendations,
@@ -155,25 +465,64 @@ async def submit_quiz(quiz_result: dict):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/db/pool")
+async def get_pool_status():
+    """Database connection pool usage and checkout wait times"""
+    return pool_status()
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Prometheus text exposition of request, span, database and cache metrics"""
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/api/stats")
-async def get_platform_stats():
+async def get_platform_stats(db: AsyncSession = Depends(get_db)):
     """Get platform statistics"""
-    return {
-        "total_courses": 10000,
-        "active_learners": 50000,
-        "course_platforms": 15,
-        "certificates_issued": 5000,
-        "last_updated": datetime.now().isoformat()
-    }
-
-@app.post("/api/courses/refresh")
-async def refresh_courses():
-    """Trigger course data refresh from all sources"""
     try:
-        await course_aggregator.refresh_all_sources()
-        return {"success": True, "message": "Course refresh initiated"}
+        stats = await db.run_sync(read_stats)
+        last_updated = stats["last_updated"] or datetime.utcnow()
+        return {**stats, "last_updated": last_updated.isoformat()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/courses/refresh", status_code=202)
+async def refresh_courses(
+    source: Optional[List[str]] = Query(None),
+    full: bool = Query(False)
+):
+    """Trigger course data refresh in the background and return the job id"""
+    unknown = [name for name in source or [] if name not in course_aggregator.source_names]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown sources: {', '.join(unknown)}")
+    try:
+        job = await refresh_scheduler.trigger(sources=source, full=full)
+        return {"success": True, "message": "Course refresh initiated", "job_id": job.id, "status": job.status}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/courses/refresh/{job_id}")
+async def get_refresh_status(job_id: str):
+    """Get progress of a course refresh job"""
+    job = await refresh_scheduler.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Refresh job not found")
+    return job
+
+def save_quiz_result(db: Session, user_id: str, answers: dict, recommendation_ids: List[int]):
+    user = db.get(User, user_id)
+    if user is None:
+        user = User(id=user_id)
+        db.add(user)
+        increment_stats(db, active_learners=1)
+    user.interests = answers.get("interests", user.interests)
+    user.level = answers.get("level", user.level)
+    user.quiz_completed = True
+    user.quiz_completed_at = datetime.utcnow()
+    db.add(QuizResult(user_id=user_id, answers=answers, recommendations=recommendation_ids))
+    db.flush()
+    badge_engine.process(db, [{"type": QUIZ_EVENT, "user_id": user_id}])
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -0,0 +1,295 @@
+import functools
+import heapq
+import os
+import re
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter as TallyCounter
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Off means no middleware, no engine listeners and undecorated functions
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = ['{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+             for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, description: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.type}"]
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name, description, labels=()):
+        super().__init__(name, description, labels)
+        self.values: Dict[Tuple, float] = {}
+
+    def inc(self, *label_values, amount: float = 1):
+        with self._lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(self.values.items())
+        return self.header() + [f"{self.name}{_format_labels(self.labels, key)} {value}" for key, value in values]
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, *label_values, amount: float = 1):
+        self.inc(*label_values, amount=-amount)
+
+    def set(self, *label_values, value: float):
+        with self._lock:
+            self.values[label_values] = value
+
+
+class Histogram(Metric):
+    """Bucketed observations; buckets are stored per bucket and made cumulative when rendered"""
+
+    type = "histogram"
+
+    def __init__(self, name, description, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, description, labels)
+        self.buckets = tuple(buckets)
+        self.series: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self.series.get(label_values)
+            if series is None:
+                series = self.series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        with self._lock:
+            series = sorted((key, (list(counts), total)) for key, (counts, total) in self.series.items())
+        for key, (counts, total) in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="{}"'.format("+Inf" if bound == float("inf") else repr(bound))
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Holds metrics plus collectors that compute gauge values at scrape time"""
+
+    def __init__(self):
+        self.metrics: List[Metric] = []
+        self.collectors: List[Callable[[], Iterable[Metric]]] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], Iterable[Metric]]):
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines += metric.render()
+        for collector in self.collectors:
+            for metric in collector():
+                lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+request_latency = registry.register(Histogram(
+    "http_request_duration_seconds", "Request latency by route template", ("method", "route", "status")))
+requests_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "Requests currently being handled"))
+span_latency = registry.register(Histogram(
+    "span_duration_seconds", "Duration of instrumented aggregator and source calls", ("span",)))
+span_errors = registry.register(Counter(
+    "span_errors_total", "Instrumented calls that raised", ("span",)))
+db_query_latency = registry.register(Histogram(
+    "db_query_duration_seconds", "Database statement duration by statement type", ("statement",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)))
+
+
+def traced(function=None, *, name: str = None):
+    """Time an async function into span_duration_seconds; a no-op when metrics are disabled"""
+    def decorate(function):
+        if not METRICS_ENABLED:
+            return function
+        span = name or function.__qualname__
+
+        @functools.wraps(function)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await function(*args, **kwargs)
+            except Exception:
+                span_errors.inc(span)
+                raise
+            finally:
+                span_latency.observe(time.perf_counter() - started, span)
+        return wrapper
+    return decorate(function) if function is not None else decorate
+
+
+STATEMENT_TYPE = re.compile(r"\s*(\w+)")
+
+
+def instrument_engine(engine):
+    """Count and time every statement through cursor-execute events on the (sync core of the) engine"""
+    from sqlalchemy import event
+
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def start_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def stop_timer(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        match = STATEMENT_TYPE.match(statement)
+        db_query_latency.observe(time.perf_counter() - started, match.group(1).upper() if match else "OTHER")
+
+    @event.listens_for(sync_engine, "handle_error")
+    def discard_timer(context):
+        started = context.connection.info.get("query_started") if context.connection is not None else None
+        if started:
+            started.pop()
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency per route template and in-flight requests"""
+
+    def __init__(self, app, profiler: "SamplingProfiler" = None):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        requests_in_flight.inc()
+        token = self.profiler.begin() if self.profiler else None
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - started
+            requests_in_flight.dec()
+            # The router records the matched route on the scope, which keeps label cardinality bounded
+            route = getattr(scope.get("route"), "path", "unmatched")
+            request_latency.observe(duration, scope["method"], route, str(status[0]))
+            if token is not None:
+                self.profiler.end(token, f"{scope['method']} {route}", duration)
+
+
+class SamplingProfiler:
+    """Opt-in sampler that keeps folded stacks of the slowest requests.
+
+    A daemon thread samples the event loop thread's stack every `interval`
+    seconds and attributes each sample to the requests in flight at that
+    moment. When a request finishes among the `keep` slowest seen so far,
+    its samples are written to `output_dir` in the folded format read by
+    flamegraph.pl and speedscope; files that drop out of the top are
+    deleted. Requests overlapping on the loop share samples.
+    """
+
+    def __init__(self, output_dir: str = None, interval: float = None, keep: int = None):
+        self.output_dir = output_dir or os.getenv("PROFILE_OUTPUT_DIR", "profiles")
+        self.interval = interval or float(os.getenv("PROFILE_SAMPLE_INTERVAL_SECONDS", 0.005))
+        self.keep = keep or int(os.getenv("PROFILE_KEEP_SLOWEST", 10))
+        self.active: Dict[int, TallyCounter] = {}
+        self.slowest: List[Tuple[float, str]] = []
+        self._next_token = 0
+        self._thread_id: Optional[int] = None
+        self._running = False
+
+    def start(self):
+        """Start sampling the calling thread, which should be the one running the event loop"""
+        if self._running:
+            return
+        os.makedirs(self.output_dir, exist_ok=True)
+        self._thread_id = threading.get_ident()
+        self._running = True
+        threading.Thread(target=self._sample, name="request-sampler", daemon=True).start()
+
+    def stop(self):
+        self._running = False
+
+    def begin(self) -> int:
+        self._next_token += 1
+        self.active[self._next_token] = TallyCounter()
+        return self._next_token
+
+    def end(self, token: int, label: str, duration: float):
+        samples = self.active.pop(token, None)
+        if not samples or (len(self.slowest) >= self.keep and duration <= self.slowest[0][0]):
+            return
+        path = os.path.join(
+            self.output_dir, "{:08.0f}ms_{}_{}.folded".format(duration * 1000, re.sub(r"\W+", "_", label).strip("_"), token)
+        )
+        with open(path, "w") as output:
+            output.writelines(f"{stack} {count}\n" for stack, count in samples.most_common())
+        heapq.heappush(self.slowest, (duration, path))
+        if len(self.slowest) > self.keep:
+            _, evicted = heapq.heappop(self.slowest)
+            try:
+                os.remove(evicted)
+            except OSError:
+                pass
+
+    def _sample(self):
+        while self._running:
+            time.sleep(self.interval)
+            if not self.active:
+                continue
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            folded = ";".join(reversed(stack))
+            try:
+                in_flight = list(self.active.values())
+            except RuntimeError:
+                # Resized by the loop thread mid-copy; skip this sample
+                continue
+            for samples in in_flight:
+                samples[folded] += 1
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Float, Boolean, ForeignKey, JSON
+from sqlalchemy import Column, Integer, BigInteger, String, Text, DateTime, Float, Boolean, ForeignKey, JSON, Index, LargeBinary, func, literal_column
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -16,7 +16,7 @@ class Course(Base):
     level = Column(String(50))  # beginner, intermediate, advanced
     category = Column(String(100), index=True)
     source = Column(String(100), index=True)  # YouTube, OpenCourseWare, etc.
-    url = Column(String(500), nullable=False)
+    url = Column(String(500), nullable=False, index=True)
     thumbnail = Column(String(500))
     rating = Column(Float, default=0.0)
     students = Column(Integer, default=0)
@@ -25,9 +25,50 @@ class Course(Base):
     last_updated = Column(DateTime, default=datetime.utcnow)
     created_at = Column(DateTime, default=datetime.utcnow)
     is_active = Column(Boolean, default=True)
+    content_hash = Column(String(64))  # Fingerprint of the ingested fields, used to skip no-op updates
+    canonical_url = Column(String(500), index=True)  # Normalized URL, the ingestion key
+    minhash = Column(LargeBinary)  # MinHash signature of title + description for near-duplicate detection
     
     # Relationships
     user_progress = relationship("UserProgress", back_populates="course")
+    aliases = relationship("CourseAlias", back_populates="course")
+    
+    # Composite indexes for the list view's filter combinations, each ending in the
+    # (rating, id) keyset order, with a missing rating sorting as 0; filters compare
+    # case-insensitively on lower()
+    __table_args__ = (
+        Index("ix_courses_active_rated", is_active, func.coalesce(rating, literal_column("0")), id),
+        Index("ix_courses_category_level_rated", func.lower(category), func.lower(level), is_active,
+              func.coalesce(rating, literal_column("0")), id),
+        Index("ix_courses_level_rated", func.lower(level), is_active, func.coalesce(rating, literal_column("0")), id),
+        Index("ix_courses_source_rated", func.lower(source), is_active, func.coalesce(rating, literal_column("0")), id),
+        # The same indexes over the raw rating, as earlier versions created them
+        {"info": {"retired_indexes": [
+            "ix_courses_active_rating", "ix_courses_category_level_rating",
+            "ix_courses_level_rating", "ix_courses_source_rating",
+        ]}},
+    )
+
+class CourseAlias(Base):
+    __tablename__ = "course_aliases"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    course_id = Column(Integer, ForeignKey("courses.id"), nullable=False, index=True)
+    source = Column(String(100))  # Source that listed the duplicate
+    url = Column(String(500), nullable=False)
+    canonical_url = Column(String(500), unique=True, nullable=False)
+    similarity = Column(Float)  # Estimated Jaccard similarity; 1.0 for identical URLs
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    # Relationships
+    course = relationship("Course", back_populates="aliases")
+
+class CourseSignatureBand(Base):
+    __tablename__ = "course_signature_bands"
+    
+    id = Column(Integer, primary_key=True)
+    band_key = Column(BigInteger, nullable=False, index=True)  # Hash of one LSH band of Course.minhash
+    course_id = Column(Integer, ForeignKey("courses.id"), nullable=False, index=True)
 
 class User(Base):
     __tablename__ = "users"
@@ -63,6 +104,15 @@ class UserProgress(Base):
     # Relationships
     user = relationship("User", back_populates="progress")
     course = relationship("Course", back_populates="user_progress")
+    
+    # One row per user and course; also serves the per-user progress lookups
+    __table_args__ = (
+        Index("ix_user_progress_user_course", user_id, course_id, unique=True),
+        # How duplicates from before the unique index are folded into the row that is kept
+        {"info": {"merge_duplicates": {
+            "time_spent": "sum", "started_at": "min", "completed_at": "min", "progress": "max",
+        }}},
+    )
 
 class QuizResult(Base):
     __tablename__ = "quiz_results"
@@ -89,6 +139,35 @@ class CourseSource(Base):
     total_courses = Column(Integer, default=0)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+class SourceSyncState(Base):
+    __tablename__ = "source_sync_state"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    source = Column(String(100), index=True)
+    url = Column(String(1000), unique=True, nullable=False)  # Feed or page URL including query string
+    etag = Column(String(255))
+    last_modified = Column(String(100))  # Raw Last-Modified header, echoed back as If-Modified-Since
+    content_hash = Column(String(64))  # SHA-256 of the last payload
+    item_count = Column(Integer)  # Courses parsed from the last payload
+    checked_at = Column(DateTime)
+    changed_at = Column(DateTime)
+
+class RefreshJobRecord(Base):
+    __tablename__ = "refresh_jobs"
+    
+    id = Column(String(32), primary_key=True)  # RefreshJob.id
+    status = Column(String(20), nullable=False)  # queued, running, completed, failed
+    state = Column(JSON, nullable=False)  # RefreshJob.to_dict(), as the status endpoint returns it
+    created_at = Column(DateTime, nullable=False, index=True)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class PlatformStat(Base):
+    __tablename__ = "platform_stats"
+    
+    name = Column(String(50), primary_key=True)  # total_courses, active_learners, ...
+    value = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)  # Last time the value changed
+
 class Badge(Base):
     __tablename__ = "badges"
     
@@ -106,3 +185,19 @@ class UserBadge(Base):
     user_id = Column(String(100), ForeignKey("users.id"), nullable=False)
     badge_id = Column(Integer, ForeignKey("badges.id"), nullable=False)
     earned_at = Column(DateTime, default=datetime.utcnow)
+    
+    # A badge is awarded at most once per user
+    __table_args__ = (
+        Index("ix_user_badges_user_badge", user_id, badge_id, unique=True),
+    )
+
+class UserStats(Base):
+    __tablename__ = "user_stats"
+
+    # Per-user totals the badge criteria test, kept up to date by the badge engine
+    user_id = Column(String(100), ForeignKey("users.id"), primary_key=True)
+    courses_completed = Column(Integer, nullable=False, default=0)
+    minutes_spent = Column(Integer, nullable=False, default=0)
+    categories = Column(JSON, nullable=False)  # Categories of started or completed courses
+    quizzes_completed = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
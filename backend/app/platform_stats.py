@@ -0,0 +1,89 @@
+import asyncio
+import os
+from datetime import datetime
+from typing import Dict, Optional
+
+from sqlalchemy import bindparam, func, select, update
+
+from .database import SessionLocal
+from .models import Course, CourseSource, PlatformStat, User, UserBadge, UserProgress
+
+# Source-of-truth query behind each maintained counter
+STAT_QUERIES = {
+    "total_courses": select(func.count()).select_from(Course).where(Course.is_active.is_(True)),
+    "active_learners": select(func.count()).select_from(User),
+    "course_platforms": select(func.count()).select_from(CourseSource).where(CourseSource.total_courses > 0),
+    "certificates_issued": select(func.count()).select_from(UserProgress).where(UserProgress.completed_at.isnot(None)),
+    "badges_awarded": select(func.count()).select_from(UserBadge),
+}
+
+
+def increment_stats(db, **deltas: int):
+    """Add to counters inside the caller's transaction, e.g. increment_stats(db, total_courses=3)"""
+    changes = [{"stat_name": name, "delta": delta} for name, delta in deltas.items() if delta]
+    if not changes:
+        return
+    statement = (
+        update(PlatformStat)
+        .where(PlatformStat.name == bindparam("stat_name"))
+        .values(value=PlatformStat.value + bindparam("delta"), updated_at=datetime.utcnow())
+    )
+    db.connection().execute(statement, changes)
+
+
+def reconcile_stats(db) -> Dict[str, int]:
+    """Recount every counter from the source tables, correcting any drift"""
+    counts = db.execute(select(*(query.scalar_subquery().label(name) for name, query in STAT_QUERIES.items()))).one()
+    stored = {stat.name: stat for stat in db.execute(select(PlatformStat)).scalars()}
+    now = datetime.utcnow()
+    for name, value in counts._mapping.items():
+        stat = stored.get(name)
+        if stat is None:
+            db.add(PlatformStat(name=name, value=value, updated_at=now))
+        elif stat.value != value:
+            stat.value = value
+            stat.updated_at = now
+    return dict(counts._mapping)
+
+
+def read_stats(db) -> Dict:
+    """Current counters and when any of them last changed"""
+    stats = {name: 0 for name in STAT_QUERIES}
+    last_updated: Optional[datetime] = None
+    for name, value, updated_at in db.execute(select(PlatformStat.name, PlatformStat.value, PlatformStat.updated_at)):
+        stats[name] = value
+        if updated_at and (last_updated is None or updated_at > last_updated):
+            last_updated = updated_at
+    stats["last_updated"] = last_updated
+    return stats
+
+
+class StatsReconciler:
+    """Recounts the platform statistics at startup and every `interval` seconds"""
+
+    def __init__(self, interval: float = None, session_factory=SessionLocal):
+        self.interval = interval or float(os.getenv("STATS_RECONCILE_INTERVAL_SECONDS", 3600))
+        self.session_factory = session_factory
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def reconcile(self) -> Dict[str, int]:
+        async with self.session_factory() as db, db.begin():
+            return await db.run_sync(reconcile_stats)
+
+    async def _run(self):
+        while True:
+            try:
+                await self.reconcile()
+            except Exception as e:
+                print(f"Stats reconciliation failed: {e}")
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,268 @@
+import asyncio
+import inspect
+import os
+from collections import deque
+from contextlib import nullcontext
+from datetime import datetime
+from typing import Awaitable, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select, tuple_, update, insert
+
+from .database import SessionLocal
+from .models import User, UserProgress
+from .badges import PROGRESS_EVENT
+from .platform_stats import increment_stats
+
+ProgressKey = Tuple[str, int]
+
+
+class ProgressWriteBuffer:
+    """Write-behind buffer for progress pings.
+
+    Updates for the same (user_id, course_id) are coalesced in memory: the
+    latest status/progress wins and time spent accumulates. Pending updates
+    are written as one batched upsert when the buffer reaches `max_pending`
+    keys or every `flush_interval` seconds, and once more on shutdown.
+    `write_hooks` run inside the flush transaction with the session and the
+    batch's progress events; `flush_listeners` and `failure_listeners` are
+    called with the set of user ids after a batch committed or failed, and
+    awaited if they are coroutine functions.
+    `write_lock`, if set, is held for the whole flush transaction, for other
+    writers whose transactions must not interleave with it.
+
+    When a batch fails, its updates are retried one per transaction so a bad
+    row can't hold back the rest. An update that fails on its own is queued
+    again, and after `max_attempts` failures is dropped into `dead_letters`.
+    """
+
+    def __init__(self, flush_interval: float = None, max_pending: int = None,
+                 max_attempts: int = None, session_factory=SessionLocal):
+        self.flush_interval = flush_interval or float(os.getenv("PROGRESS_FLUSH_INTERVAL_SECONDS", 2))
+        self.max_pending = max_pending or int(os.getenv("PROGRESS_FLUSH_MAX_PENDING", 500))
+        self.max_attempts = max_attempts or int(os.getenv("PROGRESS_FLUSH_MAX_ATTEMPTS", 10))
+        self.session_factory = session_factory
+        self.pending: Dict[ProgressKey, Dict] = {}
+        self.write_hooks: List[Callable[[object, List[Dict]], None]] = []
+        self.flush_listeners: List[Callable[[set], Optional[Awaitable]]] = []
+        self.failure_listeners: List[Callable[[set], Optional[Awaitable]]] = []
+        self.write_lock: Optional[asyncio.Lock] = None
+        # Most recent updates given up on, with the error of their last attempt
+        self.dead_letters: Deque[Tuple[ProgressKey, Dict, str]] = deque(maxlen=1000)
+        self.dropped = 0
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._size_flush: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the timer and write out everything still pending"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._size_flush is not None:
+            await asyncio.gather(self._size_flush, return_exceptions=True)
+        await self._flush_logged()
+        if self.pending:
+            print(f"Discarding {len(self.pending)} unwritten progress updates at shutdown")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self._flush_logged()
+
+    async def _flush_logged(self):
+        """Flush from a background task or shutdown, where there is no caller to raise to"""
+        try:
+            await self.flush()
+        except Exception as e:
+            print(f"Progress flush failed, will retry: {e}")
+
+    def add(self, user_id: str, course_id: int, status: str, progress: int, time_spent: int = 0):
+        """Queue an update, merging it into any pending one for the same course"""
+        now = datetime.utcnow()
+        key = (user_id, course_id)
+        entry = self.pending.get(key)
+        if entry is None:
+            entry = self.pending[key] = {"time_spent": 0, "first_seen": now}
+        entry.update(status=status, progress=progress, last_accessed=now)
+        entry["time_spent"] += time_spent or 0
+        if status == "completed" and "completed_at" not in entry:
+            entry["completed_at"] = now
+
+        if len(self.pending) >= self.max_pending and (self._size_flush is None or self._size_flush.done()):
+            self._size_flush = asyncio.create_task(self._flush_logged())
+
+    def pending_for_user(self, user_id: str) -> Dict[int, Dict]:
+        """Not-yet-written updates of a user, keyed by course id"""
+        return {course_id: entry for (uid, course_id), entry in self.pending.items() if uid == user_id}
+
+    async def flush(self):
+        async with self._lock:
+            if not self.pending:
+                return
+            batch, self.pending = self.pending, {}
+            try:
+                await self._write(batch)
+                failed = {}
+            except Exception as e:
+                # Find the updates that fail on their own; the rest are written now
+                failed = {key: e for key in batch} if len(batch) == 1 else await self._write_each(batch)
+                dropped = self._requeue(batch, failed)
+                print(f"Progress flush failed for {len(failed)} of {len(batch)} updates, "
+                      f"{dropped} given up on: {e}")
+                if failed:
+                    await notify(self.failure_listeners, {user_id for user_id, _ in failed})
+        written = {user_id for user_id, course_id in batch if (user_id, course_id) not in failed}
+        if written:
+            await notify(self.flush_listeners, written)
+
+    async def _write_each(self, batch: Dict[ProgressKey, Dict]) -> Dict[ProgressKey, Exception]:
+        """Write updates one per transaction; returns those that failed, with their errors"""
+        failed = {}
+        for key, entry in batch.items():
+            try:
+                await self._write({key: entry})
+            except Exception as e:
+                failed[key] = e
+        return failed
+
+    def _requeue(self, batch: Dict[ProgressKey, Dict], failed: Dict[ProgressKey, Exception]) -> int:
+        """Put failed updates back, letting newer updates of the same key take precedence.
+
+        Returns how many reached `max_attempts` and were moved to `dead_letters` instead.
+        """
+        dropped = 0
+        for key, error in failed.items():
+            entry = batch[key]
+            attempts = entry.get("attempts", 0) + 1
+            newer = self.pending.get(key)
+            if newer is not None:
+                newer["time_spent"] += entry["time_spent"]
+                newer["first_seen"] = entry["first_seen"]
+                newer.setdefault("completed_at", entry.get("completed_at"))
+                entry = newer
+            entry["attempts"] = attempts
+            if attempts >= self.max_attempts:
+                self.pending.pop(key, None)
+                self.dead_letters.append((key, entry, str(error)))
+                dropped += 1
+            else:
+                self.pending[key] = entry
+        self.dropped += dropped
+        return dropped
+
+    async def _write(self, batch: Dict[ProgressKey, Dict]):
+        async with self.write_lock or nullcontext(), self.session_factory() as db, db.begin():
+            await db.run_sync(self._write_batch, batch)
+
+    def _write_batch(self, db, batch: Dict[ProgressKey, Dict]):
+        events = write_progress(db, batch)
+        for hook in self.write_hooks:
+            hook(db, events)
+
+
+async def notify(listeners: List[Callable], user_ids: set):
+    for listener in listeners:
+        result = listener(user_ids)
+        if inspect.isawaitable(result):
+            await result
+
+
+def write_progress(db, batch: Dict[ProgressKey, Dict]) -> List[Dict]:
+    """Batched upsert of coalesced progress updates into `user_progress`.
+
+    Returns one progress event per written (user_id, course_id) for the badge engine.
+    """
+    user_ids = {user_id for user_id, _ in batch}
+    known_users = set(db.execute(select(User.id).where(User.id.in_(user_ids))).scalars())
+    missing_users = [{"id": user_id} for user_id in user_ids - known_users]
+    if missing_users:
+        db.execute(insert(User), missing_users)
+
+    existing = {
+        (row.user_id, row.course_id): row
+        for row in db.execute(
+            select(UserProgress.id, UserProgress.user_id, UserProgress.course_id,
+                   UserProgress.started_at, UserProgress.completed_at, UserProgress.time_spent)
+            .where(tuple_(UserProgress.user_id, UserProgress.course_id).in_(list(batch)))
+        )
+    }
+
+    updates, inserts, events = [], [], []
+    completions = 0
+    for (user_id, course_id), entry in batch.items():
+        started = entry["first_seen"] if entry["status"] != "not_started" else None
+        row = existing.get((user_id, course_id))
+        completed = bool(entry.get("completed_at")) and (row is None or row.completed_at is None)
+        # Deltas against the stored row, applied to the user's badge aggregates
+        events.append({
+            "type": PROGRESS_EVENT,
+            "user_id": user_id,
+            "course_id": course_id,
+            "started": started is not None,
+            "completed": completed,
+            "minutes": entry["time_spent"],
+        })
+        values = {
+            "status": entry["status"],
+            "progress": entry["progress"],
+            "last_accessed": entry["last_accessed"],
+        }
+        if completed:
+            completions += 1
+        if row is None:
+            inserts.append({
+                **values,
+                "user_id": user_id,
+                "course_id": course_id,
+                "started_at": started,
+                "completed_at": entry.get("completed_at"),
+                "time_spent": entry["time_spent"],
+            })
+        else:
+            updates.append({
+                **values,
+                "id": row.id,
+                "started_at": row.started_at or started,
+                "completed_at": row.completed_at or entry.get("completed_at"),
+                "time_spent": (row.time_spent or 0) + entry["time_spent"],
+            })
+
+    if updates:
+        db.execute(update(UserProgress), updates)
+    if inserts:
+        db.execute(insert(UserProgress), inserts)
+    increment_stats(db, active_learners=len(missing_users), certificates_issued=completions)
+    return events
+
+
+def summarize_progress(rows: Iterable[Dict], pending: Dict[int, Dict]) -> Dict:
+    """Completed/in-progress course ids and total hours, overlaying unflushed updates"""
+    courses = {row["course_id"]: dict(row) for row in rows}
+    for course_id, entry in pending.items():
+        course = courses.setdefault(course_id, {"course_id": course_id, "time_spent": 0})
+        course["status"] = entry["status"]
+        course["time_spent"] = (course.get("time_spent") or 0) + entry["time_spent"]
+
+    completed = sorted(cid for cid, course in courses.items() if course["status"] == "completed")
+    in_progress = sorted(cid for cid, course in courses.items() if course["status"] == "in_progress")
+    minutes = sum(course.get("time_spent") or 0 for course in courses.values())
+    return {
+        "completed_courses": completed,
+        "in_progress_courses": in_progress,
+        "total_hours": round(minutes / 60, 1),
+    }
+
+
+def load_progress_rows(db, user_id: str) -> List[Dict]:
+    """A user's progress rows; served by the (user_id, course_id) index"""
+    return [
+        dict(row) for row in db.execute(
+            select(UserProgress.course_id, UserProgress.status, UserProgress.time_spent)
+            .where(UserProgress.user_id == user_id)
+        ).mappings()
+    ]
@@ -0,0 +1,268 @@
+import asyncio
+import math
+import os
+from collections import Counter, OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+from sqlalchemy import select
+
+from .models import QuizResult, User, UserProgress
+from .search_index import normalize, tokenize
+
+# Relative weight of each feature family in a course vector
+TAG_WEIGHT = 3.0
+CATEGORY_WEIGHT = 2.0
+DESCRIPTION_WEIGHT = 1.0
+
+# How much a course the user engaged with pulls their profile towards it
+PROGRESS_WEIGHTS = {"completed": 1.0, "in_progress": 0.6, "not_started": 0.2}
+LEVEL_BOOST = 1.2
+MAX_RECOMMENDATIONS = 20
+
+
+def course_features(tags: Iterable[str], category: Optional[str], description: Optional[str]) -> Counter:
+    """Weighted term frequencies of a course over tags, category and description"""
+    counts = Counter()
+    for tag in tags:
+        counts["tag:" + normalize(tag)] += TAG_WEIGHT
+        for token in tokenize(tag):
+            counts["word:" + token] += DESCRIPTION_WEIGHT
+    if category:
+        counts["cat:" + normalize(category)] += CATEGORY_WEIGHT
+    for token in tokenize(description):
+        counts["word:" + token] += DESCRIPTION_WEIGHT
+    return counts
+
+
+def interest_terms(interest: str) -> List[str]:
+    """Feature terms an interest like "Data Science" can match"""
+    folded = normalize(interest)
+    return ["tag:" + folded, "cat:" + folded] + ["word:" + token for token in tokenize(interest)]
+
+
+def load_user_profile(db, user_id: str) -> Dict:
+    """Interests, level and course engagement of a user from the profile tables"""
+    user = db.get(User, user_id)
+    interests = list(user.interests or []) if user else []
+    level = user.level if user else None
+
+    latest_quiz = db.execute(
+        select(QuizResult.answers)
+        .where(QuizResult.user_id == user_id)
+        .order_by(QuizResult.completed_at.desc())
+        .limit(1)
+    ).scalar_one_or_none()
+    if latest_quiz:
+        interests += latest_quiz.get("interests", [])
+        level = latest_quiz.get("level", level)
+
+    progress = db.execute(
+        select(UserProgress.course_id, UserProgress.status).where(UserProgress.user_id == user_id)
+    ).all()
+    return {"interests": interests, "level": level, "progress": [tuple(row) for row in progress]}
+
+
+def catalog_features(catalog) -> Tuple[List[Tuple], np.ndarray, np.ndarray]:
+    """Inputs of build_vectors(): (tags, category, description) per row, students and ratings"""
+    categories = catalog.dictionaries['category']
+    category_column = catalog.column('category')
+    descriptions = catalog.text['description']
+    features = [
+        (catalog.tag_names(row), categories.decode(category_column[row]), descriptions[row])
+        for row in range(catalog.size)
+    ]
+    return features, catalog.column('students').copy(), catalog.column('rating').copy()
+
+
+def build_vectors(features: List[Tuple], students: np.ndarray, ratings: np.ndarray):
+    """Normalized TF-IDF course matrix, vocabulary, idf and rows by popularity"""
+    rows, columns, values = [], [], []
+    vocabulary = {}
+    for row, (tags, category, description) in enumerate(features):
+        for term, weight in course_features(tags, category, description).items():
+            rows.append(row)
+            columns.append(vocabulary.setdefault(term, len(vocabulary)))
+            # Sublinear tf keeps long descriptions from drowning out tags
+            values.append(1.0 + math.log(weight))
+
+    shape = (len(features), max(len(vocabulary), 1))
+    matrix = sparse.csr_matrix((values, (rows, columns)), shape=shape, dtype=np.float32)
+    document_frequency = np.bincount(matrix.indices, minlength=shape[1])
+    idf = (np.log((1.0 + shape[0]) / (1.0 + document_frequency)) + 1.0).astype(np.float32)
+    matrix = matrix @ sparse.diags(idf)
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    matrix = sparse.csr_matrix(sparse.diags(1.0 / norms) @ matrix)
+
+    popularity = np.log1p(np.maximum(students, 0)) * np.nan_to_num(ratings)
+    popular = [int(row) for row in np.argsort(-popularity, kind='stable')]
+    return matrix, vocabulary, idf, popular
+
+
+def _log_build_failure(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        print(f"Recommendation vectors rebuild failed: {task.exception()}")
+
+
+class RecommendationEngine:
+    """Content-based recommender over sparse TF-IDF course vectors.
+
+    Course vectors are built once per catalog version, in a worker thread
+    while the previous vectors keep being served. A user vector mixes the
+    terms of their interests with the vectors of courses they engaged with,
+    and candidates are scored with one sparse matrix-vector product.
+    Each user's top results are precomputed and kept, tagged with the
+    user's version (shared through the response cache, and changed whenever
+    their progress or quiz data changes), so reads are a slice of a cached
+    list. Results are kept for the `max_users` most recently seen users.
+    """
+
+    def __init__(self, max_users: int = None):
+        self.max_users = max_users or int(os.getenv("RECOMMENDATION_CACHE_MAX_USERS", 10000))
+        self.catalog = None
+        self.matrix: Optional[sparse.csr_matrix] = None
+        self.vocabulary: Dict[str, int] = {}
+        self.idf: Optional[np.ndarray] = None
+        self.popular: List[int] = []
+        self._stale = True
+        self._build: Optional[asyncio.Task] = None
+        # user_id -> (version computed at, course ids)
+        self._top: "OrderedDict[str, Tuple[int, List[int]]]" = OrderedDict()
+
+    def mark_stale(self):
+        """Catalog changed: rebuild vectors and recompute users on next use"""
+        self._stale = True
+
+    def rebuild(self, catalog) -> asyncio.Task:
+        """Rebuild the vectors for `catalog` in a worker thread, unless a build is already running.
+
+        The previous vectors keep being served until the new ones are swapped in.
+        """
+        if self._build is None or self._build.done():
+            self._build = asyncio.create_task(self._rebuild(catalog))
+            self._build.add_done_callback(_log_build_failure)
+        return self._build
+
+    async def ensure_built(self, catalog):
+        """Start a rebuild if the vectors are stale; waits only while there are none to serve yet"""
+        if self._stale or catalog is not self.catalog:
+            build = self.rebuild(catalog)
+            if self.matrix is None:
+                await asyncio.wait([build])
+                if self.matrix is None:
+                    build.result()
+
+    async def _rebuild(self, catalog):
+        # Changes from here on mark the new vectors stale again
+        self._stale = False
+        try:
+            # Copied on the event loop, so refreshes can't change the catalog under the worker thread
+            features = catalog_features(catalog)
+            vectors = await asyncio.to_thread(build_vectors, *features)
+        except Exception:
+            self._stale = True
+            raise
+        self._install(catalog, *vectors)
+
+    def build(self, catalog):
+        self._install(catalog, *build_vectors(*catalog_features(catalog)))
+        self._stale = False
+
+    def adopt(self, catalog, matrix: sparse.csr_matrix, vocabulary: Dict[str, int], idf: np.ndarray, popular):
+        """Use vectors built elsewhere for `catalog`, e.g. mapped from a catalog snapshot"""
+        if self._build is not None:
+            self._build.cancel()
+        self._install(catalog, matrix, vocabulary, idf, popular)
+        self._stale = False
+
+    def _install(self, catalog, matrix: sparse.csr_matrix, vocabulary: Dict[str, int], idf: np.ndarray, popular):
+        self.catalog = catalog
+        self.matrix = matrix
+        self.vocabulary = vocabulary
+        self.idf = idf
+        self.popular = popular
+        self._top.clear()
+
+    def _has_vector(self, row: Optional[int]) -> bool:
+        """Whether a catalog row has a vector; rows added since the last build don't yet"""
+        return row is not None and row < self.matrix.shape[0]
+
+    def _levels(self) -> np.ndarray:
+        return self.catalog.column('level')[:self.matrix.shape[0]]
+
+    def user_vector(self, interests: Iterable[str], progress: Iterable[Tuple[int, str]]) -> np.ndarray:
+        vector = np.zeros(self.matrix.shape[1], dtype=np.float32)
+        for interest in interests:
+            for term in interest_terms(interest):
+                column = self.vocabulary.get(term)
+                if column is not None:
+                    vector[column] += self.idf[column]
+        for course_id, status in progress:
+            row = self.catalog.row_of.get(course_id)
+            if self._has_vector(row):
+                start, end = self.matrix.indptr[row], self.matrix.indptr[row + 1]
+                vector[self.matrix.indices[start:end]] += (
+                    PROGRESS_WEIGHTS.get(status, 0.0) * self.matrix.data[start:end]
+                )
+        return vector
+
+    def score(self, vector: np.ndarray, level: Optional[str] = None) -> np.ndarray:
+        scores = self.matrix @ vector
+        if level:
+            levels = self.catalog.dictionaries['level'].codes_for(level)
+            scores[np.isin(self._levels(), levels)] *= LEVEL_BOOST
+        return scores
+
+    def top_rows(self, scores: np.ndarray, k: int, exclude: Iterable[int] = (), min_score: float = 0.0) -> List[int]:
+        scores = scores.copy()
+        scores[list(exclude)] = -np.inf
+        candidates = np.flatnonzero(scores > min_score)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        return [int(row) for row in candidates[np.argsort(-scores[candidates], kind='stable')]]
+
+    def cached(self, user_id: str, limit: int, version: int = 0) -> Optional[List[int]]:
+        """Precomputed course ids for a user at `version`, or None if they need computing"""
+        entry = self._top.get(user_id)
+        if entry is None or entry[0] != version:
+            return None
+        self._top.move_to_end(user_id)
+        return entry[1][:limit]
+
+    def precompute(self, user_id: str, profile: Dict, version: int = 0) -> List[int]:
+        """Score the whole catalog for a user and keep their top results as of `version`"""
+        top = self._compute(profile)
+        self._top[user_id] = (version, top)
+        self._top.move_to_end(user_id)
+        while len(self._top) > self.max_users:
+            self._top.popitem(last=False)
+        return top
+
+    def _compute(self, profile: Dict) -> List[int]:
+        row_of = self.catalog.row_of
+        engaged = [row_of[course_id] for course_id, _ in profile["progress"] if self._has_vector(row_of.get(course_id))]
+        rows = []
+        if profile["interests"] or engaged:
+            vector = self.user_vector(profile["interests"], profile["progress"])
+            rows = self.top_rows(self.score(vector, profile["level"]), MAX_RECOMMENDATIONS, exclude=engaged)
+        # Pad with popular courses for new or sparse profiles
+        seen = set(rows) | set(engaged)
+        for row in self.popular:
+            if len(rows) >= MAX_RECOMMENDATIONS:
+                break
+            if row not in seen:
+                rows.append(row)
+                seen.add(row)
+        return [int(self.catalog.column('id')[row]) for row in rows]
+
+    def recommend_for_answers(self, interests: List[str], level: Optional[str], limit: int = 6) -> List[int]:
+        """Quiz recommendations: courses at the chosen level matching the stated interests"""
+        if not interests:
+            return []
+        scores = self.matrix @ self.user_vector(interests, ())
+        if level:
+            scores[~np.isin(self._levels(), self.catalog.dictionaries['level'].codes_for(level))] = 0.0
+        rows = self.top_rows(scores, limit)
+        return [int(self.catalog.column('id')[row]) for row in rows]
@@ -0,0 +1,283 @@
+"""
+Per-source protection for upstream fetches.
+
+Every request a source aggregator makes goes through the source's
+`SourceGuard`:
+
+- a token bucket per upstream host paces requests (shared by every source
+  hitting that host)
+- each attempt is bounded by a timeout and, if it is still outstanding
+  after `hedge_after` seconds, raced against a second identical request
+- transient failures (network errors, timeouts, 429 and 5xx) are retried
+  with exponentially growing, jittered delays
+- a circuit breaker over the recent attempts opens when too many fail or
+  are slow, rejecting requests outright until a cool-down has passed, then
+  lets a few probes through (half-open) and closes again if they succeed
+"""
+import asyncio
+import os
+import random
+import time
+from collections import Counter, deque
+from typing import Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of contacting a source whose breaker is open"""
+
+    def __init__(self, source: str, retry_in: float):
+        super().__init__(f"Circuit for {source} is open, retry in {retry_in:.0f}s")
+        self.source = source
+        self.retry_in = retry_in
+
+
+class TokenBucket:
+    """`rate` requests per second on average, with bursts of up to `burst`"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self) -> bool:
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    async def acquire(self) -> float:
+        """Take a token, waiting for one if the bucket is empty; returns the seconds waited"""
+        waited = 0.0
+        while not self.try_acquire():
+            delay = (1 - self.tokens) / self.rate
+            await asyncio.sleep(delay)
+            waited += delay
+        return waited
+
+    def to_dict(self) -> Dict:
+        self._refill()
+        return {"rate": self.rate, "burst": self.burst, "tokens": round(self.tokens, 2)}
+
+
+class HostRateLimits:
+    """Token buckets keyed by host, created on first request to the host"""
+
+    def __init__(self, rate: float = None, burst: float = None):
+        self.rate = rate or float(os.getenv("SOURCE_HOST_RATE", 5))
+        self.burst = burst or float(os.getenv("SOURCE_HOST_BURST", 10))
+        self.buckets: Dict[str, TokenBucket] = {}
+
+    def bucket(self, host: str) -> TokenBucket:
+        bucket = self.buckets.get(host)
+        if bucket is None:
+            bucket = self.buckets[host] = TokenBucket(self.rate, self.burst)
+        return bucket
+
+
+class CircuitBreaker:
+    """Trips on the failure or slow-call ratio of the last `window` calls.
+
+    Open, it rejects calls for `open_seconds`; after that up to
+    `half_open_calls` probes are let through, and the breaker closes once
+    that many succeed or opens again on the first failure.
+    """
+
+    def __init__(self, window: int = None, min_calls: int = None, failure_ratio: float = None,
+                 slow_call_seconds: float = None, slow_call_ratio: float = None,
+                 open_seconds: float = None, half_open_calls: int = None):
+        self.window = window or int(os.getenv("SOURCE_BREAKER_WINDOW", 20))
+        self.min_calls = min_calls or int(os.getenv("SOURCE_BREAKER_MIN_CALLS", 10))
+        self.failure_ratio = failure_ratio or float(os.getenv("SOURCE_BREAKER_FAILURE_RATIO", 0.5))
+        self.slow_call_seconds = slow_call_seconds or float(os.getenv("SOURCE_SLOW_CALL_SECONDS", 5))
+        self.slow_call_ratio = slow_call_ratio or float(os.getenv("SOURCE_BREAKER_SLOW_RATIO", 0.8))
+        self.open_seconds = open_seconds or float(os.getenv("SOURCE_BREAKER_OPEN_SECONDS", 60))
+        self.half_open_calls = half_open_calls or int(os.getenv("SOURCE_BREAKER_HALF_OPEN_CALLS", 2))
+        # (failed, slow) per call, most recent last
+        self.calls: Deque[Tuple[bool, bool]] = deque(maxlen=self.window)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        self._probe_successes = 0
+        self.trips = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._probes = self._probe_successes = 0
+        return self._state
+
+    def retry_in(self) -> float:
+        return max(0.0, self._opened_at + self.open_seconds - time.monotonic())
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead now; a half-open breaker counts it as a probe"""
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and self._probes < self.half_open_calls:
+            self._probes += 1
+            return True
+        return False
+
+    def record(self, failed: bool, seconds: float):
+        slow = seconds >= self.slow_call_seconds
+        if self._state == HALF_OPEN:
+            if failed or slow:
+                self._open()
+                return
+            self._probe_successes += 1
+            if self._probe_successes >= self.half_open_calls:
+                self._state = CLOSED
+                self.calls.clear()
+            return
+        if self._state == OPEN:
+            # A call let through before the breaker opened; its outcome no longer matters
+            return
+        self.calls.append((failed, slow))
+        if len(self.calls) >= self.min_calls and (
+            self.failure_rate >= self.failure_ratio or self.slow_rate >= self.slow_call_ratio
+        ):
+            self._open()
+
+    def _open(self):
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self.calls.clear()
+        self.trips += 1
+
+    @property
+    def failure_rate(self) -> float:
+        return sum(failed for failed, _ in self.calls) / len(self.calls) if self.calls else 0.0
+
+    @property
+    def slow_rate(self) -> float:
+        return sum(slow for _, slow in self.calls) / len(self.calls) if self.calls else 0.0
+
+    def to_dict(self) -> Dict:
+        state = self.state
+        return {
+            "state": state,
+            "failure_rate": round(self.failure_rate, 3),
+            "slow_rate": round(self.slow_rate, 3),
+            "trips": self.trips,
+            "retry_in": round(self.retry_in(), 1) if state == OPEN else None,
+        }
+
+
+class SourceGuard:
+    """Rate limiting, hedged and timeout-bounded attempts, retries and a circuit breaker for one source"""
+
+    def __init__(self, source: str, rate_limits: HostRateLimits, breaker: CircuitBreaker = None,
+                 retries: int = None, backoff: float = None, max_backoff: float = None,
+                 timeout: float = None, hedge_after: float = None):
+        self.source = source
+        self.rate_limits = rate_limits
+        self.breaker = breaker or CircuitBreaker()
+        self.retries = retries if retries is not None else int(os.getenv("SOURCE_RETRIES", 3))
+        self.backoff = backoff or float(os.getenv("SOURCE_RETRY_BACKOFF_SECONDS", 0.5))
+        self.max_backoff = max_backoff or float(os.getenv("SOURCE_RETRY_MAX_BACKOFF_SECONDS", 8))
+        self.timeout = timeout or float(os.getenv("SOURCE_REQUEST_TIMEOUT", 15))
+        # 0 disables hedging
+        self.hedge_after = hedge_after if hedge_after is not None else float(os.getenv("SOURCE_HEDGE_AFTER", 3))
+        self.hosts = set()
+        # Attempts by outcome, and how long requests waited for rate limit tokens
+        self.stats = Counter()
+        self.throttled_seconds = 0.0
+
+    @property
+    def active(self) -> bool:
+        """False while the breaker is open and requests are being rejected"""
+        return self.breaker.state != OPEN
+
+    def retry_delay(self, attempt: int) -> float:
+        """Full-jitter exponential backoff before retry number `attempt` (from 0)"""
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    async def call(self, host: str, request: Callable[[], Awaitable], transient: Callable[[BaseException], bool]):
+        """Run `request` against `host` under the guard's limits.
+
+        `transient` decides which errors are worth retrying; those count as
+        failures for the breaker, while others (a 404, say) are passed on
+        as they are and count as the upstream having answered.
+        """
+        self.hosts.add(host)
+        bucket = self.rate_limits.bucket(host)
+        for attempt in range(self.retries + 1):
+            if not self.breaker.allow():
+                self.stats["rejected"] += 1
+                raise CircuitOpenError(self.source, self.breaker.retry_in())
+            waited = await bucket.acquire()
+            if waited:
+                self.stats["throttled"] += 1
+                self.throttled_seconds += waited
+
+            self.stats["requests"] += 1
+            started = time.monotonic()
+            try:
+                result = await self._attempt(bucket, request)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                failed = isinstance(e, asyncio.TimeoutError) or transient(e)
+                self.breaker.record(failed, time.monotonic() - started)
+                if not failed:
+                    raise
+                self.stats["failed"] += 1
+                if attempt == self.retries:
+                    raise
+                self.stats["retried"] += 1
+                await asyncio.sleep(self.retry_delay(attempt))
+            else:
+                self.breaker.record(False, time.monotonic() - started)
+                self.stats["succeeded"] += 1
+                return result
+
+    async def _attempt(self, bucket: TokenBucket, request: Callable[[], Awaitable]):
+        """The request, raced against a hedge if it is slow, within the timeout"""
+        deadline = time.monotonic() + self.timeout
+        pending = {asyncio.ensure_future(request())}
+        try:
+            if 0 < self.hedge_after < self.timeout:
+                done, _ = await asyncio.wait(pending, timeout=self.hedge_after)
+                # Only hedge with a spare token, never by waiting for one
+                if not done and bucket.try_acquire():
+                    self.stats["hedged"] += 1
+                    pending.add(asyncio.ensure_future(request()))
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, timeout=max(0.0, deadline - time.monotonic()), return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    self.stats["timed_out"] += 1
+                    raise asyncio.TimeoutError(f"{self.source} request timed out after {self.timeout:.0f}s")
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    def to_dict(self) -> Dict:
+        return {
+            "breaker": self.breaker.to_dict(),
+            "rate_limits": {host: self.rate_limits.bucket(host).to_dict() for host in sorted(self.hosts)},
+            "requests": dict(sorted(self.stats.items())),
+            "throttled_seconds": round(self.throttled_seconds, 3),
+        }
@@ -0,0 +1,234 @@
+import asyncio
+import os
+import random
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, select
+
+from .database import SessionLocal
+from .models import RefreshJobRecord
+
+
+class RefreshJob:
+    """A triggered refresh of one or more sources and its per-source progress"""
+
+    def __init__(self, sources: List[str], full: bool = False):
+        self.id = uuid.uuid4().hex
+        self.sources = sources
+        self.full = full
+        self.status = "queued"
+        self.created_at = datetime.utcnow()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.progress: Dict[str, Dict] = {name: {"status": "queued"} for name in sources}
+
+    @property
+    def active(self):
+        return self.status in ("queued", "running")
+
+    def to_dict(self):
+        completed = sum(1 for item in self.progress.values() if item["status"] in ("completed", "failed"))
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "full": self.full,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "sources_completed": completed,
+            "sources_total": len(self.sources),
+            "items_ingested": sum(item.get("items_fetched", 0) for item in self.progress.values()),
+            "sources": self.progress,
+        }
+
+
+def save_job(db, job: RefreshJob, history: int):
+    """Record a job's current state, keeping the `history` most recent jobs"""
+    record = db.get(RefreshJobRecord, job.id)
+    created = record is None
+    if created:
+        record = RefreshJobRecord(id=job.id, created_at=job.created_at)
+        db.add(record)
+    record.status = job.status
+    record.state = job.to_dict()
+    record.updated_at = datetime.utcnow()
+    if created:
+        db.flush()
+        newest = select(RefreshJobRecord.id).order_by(RefreshJobRecord.created_at.desc()).limit(history)
+        db.execute(delete(RefreshJobRecord).where(RefreshJobRecord.id.not_in(newest.scalar_subquery())))
+
+
+def load_job(db, job_id: str) -> Optional[Dict]:
+    return db.execute(select(RefreshJobRecord.state).where(RefreshJobRecord.id == job_id)).scalar()
+
+
+class RefreshScheduler:
+    """Runs source refreshes in the background.
+
+    Every source gets a periodic job (interval plus random jitter, with
+    exponential backoff after failures). Triggered and periodic refreshes of
+    the same source are single-flight: a second trigger joins the refresh
+    already in progress instead of starting another, except that a full
+    refresh requested during an incremental one is queued to run after it.
+    A global semaphore caps how many sources refresh at once. Triggered
+    jobs are recorded in the database, so any worker can report on them.
+    """
+
+    def __init__(self, aggregator, interval: float = None, jitter: float = None,
+                 max_concurrency: int = None, max_backoff: float = None,
+                 history: int = 100, session_factory=SessionLocal):
+        self.aggregator = aggregator
+        self.interval = interval or float(os.getenv("REFRESH_INTERVAL_SECONDS", 6 * 3600))
+        self.jitter = jitter if jitter is not None else float(os.getenv("REFRESH_JITTER_SECONDS", 300))
+        self.max_concurrency = max_concurrency or int(os.getenv("REFRESH_MAX_CONCURRENCY", 2))
+        self.max_backoff = max_backoff or float(os.getenv("REFRESH_MAX_BACKOFF_SECONDS", 24 * 3600))
+        self.history = history
+        self.session_factory = session_factory
+        self.jobs: "OrderedDict[str, RefreshJob]" = OrderedDict()
+        self.failures: Dict[str, int] = {name: 0 for name in aggregator.source_names}
+        self.last_result: Dict[str, Dict] = {}
+        # source name -> (refresh task, whether it is a full refresh)
+        self._inflight: Dict[str, Tuple[asyncio.Task, bool]] = {}
+        self._periodic: List[asyncio.Task] = []
+        self._background: set = set()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    def start(self, periodic: bool = True):
+        """Start the per-source periodic jobs"""
+        if periodic and not self._periodic:
+            self._periodic = [
+                asyncio.create_task(self._run_periodic(name)) for name in self.aggregator.source_names
+            ]
+
+    async def stop(self):
+        tasks = self._periodic + [task for task, _ in self._inflight.values()] + list(self._background)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._periodic = []
+
+    def next_delay(self, source_name: str) -> float:
+        """Interval (or backoff after failures) plus jitter before the next periodic run"""
+        failures = self.failures[source_name]
+        if failures:
+            delay = min(self.interval * 0.05 * 2 ** failures, self.max_backoff)
+        else:
+            delay = self.interval
+        return delay + random.uniform(0, self.jitter)
+
+    async def _run_periodic(self, source_name: str):
+        while True:
+            await asyncio.sleep(self.next_delay(source_name))
+            try:
+                await asyncio.shield(self.refresh(source_name))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Scheduled refresh of {source_name} failed: {e}")
+
+    def refresh(self, source_name: str, full: bool = False) -> asyncio.Task:
+        """Refresh a source, or join the refresh of it that is already running.
+
+        A full refresh only joins another full one; requested during an
+        incremental refresh, it starts once that one has finished.
+        """
+        running, running_full = self._inflight.get(source_name, (None, False))
+        if running is not None and not running.done():
+            if running_full or not full:
+                return running
+        else:
+            running = None
+        task = asyncio.create_task(self._refresh_source(source_name, full, after=running))
+        self._inflight[source_name] = (task, full)
+        task.add_done_callback(lambda done: self._forget(source_name, done))
+        return task
+
+    def _forget(self, source_name: str, task: asyncio.Task):
+        if self._inflight.get(source_name, (None,))[0] is task:
+            del self._inflight[source_name]
+
+    async def _refresh_source(self, source_name: str, full: bool, after: asyncio.Task = None):
+        if after is not None:
+            # asyncio.wait, unlike awaiting the task, doesn't cancel it if this refresh is cancelled
+            await asyncio.wait([after])
+        async with self.semaphore:
+            try:
+                result = await self.aggregator.refresh_source(source_name, full=full)
+            except Exception:
+                self.failures[source_name] += 1
+                raise
+            self.failures[source_name] = 0
+            self.last_result[source_name] = result
+            return result
+
+    async def trigger(self, sources: List[str] = None, full: bool = False) -> RefreshJob:
+        """Record and start a refresh job, returning without waiting for it.
+
+        If an active job of this process already covers the same sources it
+        is returned instead of creating a new one.
+        """
+        sources = sources or list(self.aggregator.source_names)
+        for job in self.jobs.values():
+            if job.active and job.full == full and set(job.sources) == set(sources):
+                return job
+
+        job = RefreshJob(sources, full=full)
+        self.jobs[job.id] = job
+        while len(self.jobs) > self.history:
+            self.jobs.popitem(last=False)
+        await self._save(job)
+
+        task = asyncio.create_task(self._run_job(job))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        return job
+
+    async def _run_job(self, job: RefreshJob):
+        job.status = "running"
+        job.started_at = datetime.utcnow()
+        for name in job.sources:
+            job.progress[name] = {"status": "running"}
+        await self._save(job)
+        await asyncio.gather(*(self._track(job, name) for name in job.sources))
+        failed = sum(1 for item in job.progress.values() if item["status"] == "failed")
+        job.status = "failed" if failed == len(job.sources) else "completed"
+        job.finished_at = datetime.utcnow()
+        await self._save(job)
+
+    async def _track(self, job: RefreshJob, source_name: str):
+        try:
+            # Shielded so one waiter going away doesn't cancel a refresh others joined
+            result = await asyncio.shield(self.refresh(source_name, full=job.full))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            job.progress[source_name] = {"status": "failed", "error": str(e)}
+        else:
+            job.progress[source_name] = {"status": "completed", **result}
+        if job.active:
+            await self._save(job)
+
+    async def _save(self, job: RefreshJob):
+        try:
+            async with self.session_factory() as db, db.begin():
+                await db.run_sync(save_job, job, self.history)
+        except Exception as e:
+            # Only other workers' view of the job suffers; the refresh itself goes on
+            print(f"Could not record refresh job {job.id}: {e}")
+
+    async def get_job(self, job_id: str) -> Optional[Dict]:
+        """A job's state, from this process if it runs the job, else as its worker last recorded it"""
+        job = self.jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        async with self.session_factory() as db:
+            return await db.run_sync(load_job, job_id)
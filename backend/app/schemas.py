@@ -54,6 +54,7 @@ class ProgressUpdate(BaseModel):
     course_id: int
     status: str  # not_started, in_progress, completed
     progress: int = 0  # 0-100 percentage
+    time_spent: int = 0  # minutes spent since the previous update
 
 class UserProgressResponse(BaseModel):
     id: int
@@ -0,0 +1,239 @@
+import re
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Set
+
+from .fuzzy import TrigramIndex
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def normalize(value) -> str:
+    """Case-fold a value for exact (facet) matching"""
+    return str(value).strip().casefold() if value is not None else ""
+
+
+def tokenize(text) -> List[str]:
+    """Split text into case-folded word tokens"""
+    if not text:
+        return []
+    return TOKEN_PATTERN.findall(str(text).casefold())
+
+
+class CourseIndex:
+    """In-process inverted index over the course catalog.
+
+    Text fields (title, description, tags) are tokenized into per-field
+    postings, and exact-value fields (category, level, source and whole
+    tags) get their own posting lists so filters are answered by set
+    intersection instead of scanning every course.
+    """
+
+    TEXT_FIELDS = ('title', 'description', 'tags')
+    FACET_FIELDS = ('category', 'level', 'source', 'tags')
+    # Misspellings are corrected against title and tag words only
+    FUZZY_FIELDS = ('title', 'tags')
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[str, Set[int]]] = {f: {} for f in self.TEXT_FIELDS}
+        self.facets: Dict[str, Dict[str, Set[int]]] = {f: {} for f in self.FACET_FIELDS}
+        self.all_ids: Set[int] = set()
+        # Terms each document was indexed under, so it can be removed cleanly
+        self._documents: Dict[int, Dict[str, Dict[str, Set[str]]]] = {}
+        self._vocabulary: Optional[List[str]] = None
+        self._expansions: Dict[tuple, Set[str]] = {}
+        self._trigrams: Optional[TrigramIndex] = None
+
+    def __len__(self):
+        return len(self.all_ids)
+
+    def __contains__(self, course_id):
+        return course_id in self.all_ids
+
+    def add(self, course: Dict):
+        """Index a course, replacing any previous version with the same id"""
+        course_id = course['id']
+        if course_id in self.all_ids:
+            self.remove(course_id)
+
+        tags = course.get('tags') or []
+        text_terms = {
+            'title': set(tokenize(course.get('title'))),
+            'description': set(tokenize(course.get('description'))),
+            'tags': {token for tag in tags for token in tokenize(tag)},
+        }
+        facet_terms = {
+            'category': {normalize(course.get('category'))},
+            'level': {normalize(course.get('level'))},
+            'source': {normalize(course.get('source'))},
+            'tags': {normalize(tag) for tag in tags},
+        }
+
+        for field, terms in text_terms.items():
+            postings = self.postings[field]
+            for term in terms:
+                if term not in postings:
+                    self._vocabulary = None
+                postings.setdefault(term, set()).add(course_id)
+        for field, values in facet_terms.items():
+            postings = self.facets[field]
+            for value in values:
+                postings.setdefault(value, set()).add(course_id)
+
+        self._documents[course_id] = {'text': text_terms, 'facets': facet_terms}
+        self.all_ids.add(course_id)
+        if self._vocabulary is None:
+            self._expansions.clear()
+            self._trigrams = None
+
+    def add_many(self, courses: Iterable[Dict]):
+        for course in courses:
+            self.add(course)
+
+    def remove(self, course_id: int):
+        """Drop a course from every posting list it appears in"""
+        document = self._documents.pop(course_id, None)
+        if document is None:
+            return
+        for field, terms in document['text'].items():
+            postings = self.postings[field]
+            for term in terms:
+                ids = postings.get(term)
+                if ids is None:
+                    continue
+                ids.discard(course_id)
+                if not ids:
+                    del postings[term]
+                    self._vocabulary = None
+        for field, values in document['facets'].items():
+            postings = self.facets[field]
+            for value in values:
+                ids = postings.get(value)
+                if ids is None:
+                    continue
+                ids.discard(course_id)
+                if not ids:
+                    del postings[value]
+        self.all_ids.discard(course_id)
+        if self._vocabulary is None:
+            self._expansions.clear()
+            self._trigrams = None
+
+    @property
+    def vocabulary(self) -> List[str]:
+        """Sorted list of every token across the text fields"""
+        if self._vocabulary is None:
+            terms = set()
+            for postings in self.postings.values():
+                terms.update(postings)
+            self._vocabulary = sorted(terms)
+        return self._vocabulary
+
+    def expand(self, token: str, prefix: bool = False) -> Set[str]:
+        """Vocabulary terms that start with (or contain) the given token"""
+        key = (token, prefix)
+        cached = self._expansions.get(key)
+        if cached is not None:
+            return cached
+
+        vocabulary = self.vocabulary
+        if prefix:
+            matches = set()
+            position = bisect_left(vocabulary, token)
+            while position < len(vocabulary) and vocabulary[position].startswith(token):
+                matches.add(vocabulary[position])
+                position += 1
+        else:
+            matches = {term for term in vocabulary if token in term}
+
+        self._expansions[key] = matches
+        return matches
+
+    @property
+    def trigrams(self) -> TrigramIndex:
+        """Trigram index over the title and tag vocabulary, built on first use"""
+        if self._trigrams is None:
+            terms = set()
+            for field in self.FUZZY_FIELDS:
+                terms.update(self.postings[field])
+            self._trigrams = TrigramIndex(sorted(terms))
+        return self._trigrams
+
+    def term_count(self, term: str, fields=TEXT_FIELDS) -> int:
+        """Number of postings for the exact term, summed over the fields"""
+        return sum(len(self.postings[field].get(term, ())) for field in fields)
+
+    def corrections(self, token: str) -> List[str]:
+        """Title and tag terms a misspelled token may have meant, closest and most common first"""
+        matches = self.trigrams.lookup(token)
+        matches.sort(key=lambda match: (match[1], -self.term_count(match[0], self.FUZZY_FIELDS)))
+        return [term for term, _ in matches]
+
+    def suggest(self, text: str) -> Optional[str]:
+        """The query with every unknown word replaced by its best correction, or None if none was found"""
+        tokens = tokenize(text)
+        corrected = []
+        for token in tokens:
+            if any(token in self.postings[field] for field in self.TEXT_FIELDS):
+                corrected.append(token)
+                continue
+            corrections = self.corrections(token)
+            corrected.append(corrections[0] if corrections else token)
+        return " ".join(corrected) if corrected != tokens else None
+
+    def term_ids(self, token: str, fields=TEXT_FIELDS, prefix: bool = False) -> Set[int]:
+        """Ids of courses where a term matching the token occurs in any of the fields"""
+        ids = set()
+        for term in self.expand(token, prefix=prefix):
+            for field in fields:
+                posting = self.postings[field].get(term)
+                if posting:
+                    ids |= posting
+        return ids
+
+    def search(self, text: str, fields=TEXT_FIELDS, prefix: bool = False) -> Set[int]:
+        """Candidate ids for a free-text query.
+
+        Every query token must match some indexed term, so the result is a
+        superset of the courses containing the query as a substring. It is
+        exact for single-token queries; multi-token phrases should be
+        verified against the course text by the caller.
+        """
+        tokens = sorted(set(tokenize(text)), key=len, reverse=True)
+        if not tokens:
+            return set(self.all_ids)
+
+        result = None
+        for token in tokens:
+            ids = self.term_ids(token, fields=fields, prefix=prefix)
+            result = ids if result is None else result & ids
+            if not result:
+                return set()
+        return result
+
+    def facet_ids(self, field: str, value) -> Set[int]:
+        return self.facets[field].get(normalize(value), set())
+
+    def filter(self, category=None, level=None, source=None, tags=None) -> Set[int]:
+        """Intersect facet postings; tags match if any of them is present"""
+        selected = []
+        if category:
+            selected.append(self.facet_ids('category', category))
+        if level:
+            selected.append(self.facet_ids('level', level))
+        if source:
+            selected.append(self.facet_ids('source', source))
+        if tags:
+            any_tag = set()
+            for tag in tags:
+                any_tag |= self.facet_ids('tags', tag)
+            selected.append(any_tag)
+
+        if not selected:
+            return set(self.all_ids)
+        selected.sort(key=len)
+        result = set(selected[0])
+        for ids in selected[1:]:
+            result &= ids
+            if not result:
+                break
+        return result
@@ -0,0 +1,84 @@
+"""
+Fast JSON encoding for course responses.
+
+Courses are validated against the schema when they are ingested, so the
+catalog and the keyset queries hand out trusted dicts. Instead of running
+every course of a page back through `response_model` validation and the
+generic encoder, each course is projected onto the `CourseResponse` fields
+(leaving out the heavy ones a list query didn't load), encoded once with orjson and kept as a JSON fragment; pages are spliced
+together from the cached fragments. Routes keep their `response_model`, so
+the OpenAPI schema does not change.
+"""
+import os
+from collections import OrderedDict
+from typing import Dict, Iterable, Tuple
+
+import orjson
+from fastapi.responses import Response
+
+from .schemas import CourseResponse
+
+# Output fields in CourseResponse order, and the defaults it fills in for absent keys
+COURSE_FIELDS = tuple(CourseResponse.model_fields)
+COURSE_DEFAULTS = {
+    name: field.get_default(call_default_factory=True)
+    for name, field in CourseResponse.model_fields.items() if not field.is_required()
+}
+# Fields list views only load on request; a course without them was not asked for them
+PROJECTED_FIELDS = ("description", "tags")
+
+
+def course_json(course: Dict) -> bytes:
+    """A course encoded as CourseResponse would serialize it, minus the fields projected out of it"""
+    return orjson.dumps({
+        name: course.get(name, COURSE_DEFAULTS.get(name))
+        for name in COURSE_FIELDS if name in course or name not in PROJECTED_FIELDS
+    })
+
+
+class CourseFragmentCache:
+    """LRU of encoded courses, keyed by id and by which optional list fields the dict carries.
+
+    List views leave out description and tags unless asked for, so the same
+    course has up to four encodings. Clear it whenever the catalog changes.
+    """
+
+    def __init__(self, max_entries: int = None):
+        self.max_entries = max_entries or int(os.getenv("COURSE_JSON_CACHE_MAX_ENTRIES", 100000))
+        self._fragments: "OrderedDict[Tuple[int, bool, bool], bytes]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._fragments)
+
+    def fragment(self, course: Dict) -> bytes:
+        if course is None:
+            return b"null"
+        key = (course["id"], "description" in course, "tags" in course)
+        fragment = self._fragments.get(key)
+        if fragment is not None:
+            self._fragments.move_to_end(key)
+            self.hits += 1
+            return fragment
+        self.misses += 1
+        fragment = self._fragments[key] = course_json(course)
+        if len(self._fragments) > self.max_entries:
+            self._fragments.popitem(last=False)
+        return fragment
+
+    def encode_list(self, courses: Iterable[Dict]) -> bytes:
+        return b"[" + b",".join(self.fragment(course) for course in courses) + b"]"
+
+    def clear(self):
+        self._fragments.clear()
+
+
+def with_facets(courses: bytes, facets: Dict) -> bytes:
+    """Envelope for list responses that also carry facet counts"""
+    return b'{"courses":' + courses + b',"facets":' + orjson.dumps(facets) + b"}"
+
+
+def json_response(content: bytes, headers: Dict[str, str] = None) -> Response:
+    """Already encoded JSON, returned as is; FastAPI skips response_model handling for Response objects"""
+    return Response(content=content, media_type="application/json", headers=headers)
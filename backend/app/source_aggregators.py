@@ -0,0 +1,149 @@
+"""
+Course source aggregators: one per platform, each turning its feeds or
+listings into course dicts through the shared ingestion pipeline.
+
+Only the refresh path needs these and their scraping dependencies, so the
+CourseAggregator imports this module on first use.
+
+Every aggregator takes the `base_url` of its upstream, under which its
+endpoints' usual paths are resolved, so a source can be pointed at a mirror
+or a stub server. Explicit endpoint URLs win over it, and it over the
+environment variables.
+"""
+import asyncio
+import os
+
+from .ingestion import IngestionPipeline
+from .metrics import traced
+from .source_parsers import (
+    parse_ocw_feed, parse_saylor_catalog, parse_swayam_listing,
+    parse_telegram_channel, parse_youtube_playlist,
+)
+
+
+def endpoint_url(base_url, path, env, default):
+    """`path` under an explicit upstream base URL, else the URL from the environment or the default"""
+    if base_url:
+        return base_url.rstrip("/") + path
+    return os.getenv(env, default)
+
+
+class YouTubeAggregator:
+    """Each configured playlist feed is ingested as one course"""
+    
+    name = "YouTube"
+    type = "video"
+    
+    def __init__(self, feed_url=None, playlist_ids=None, base_url=None):
+        self.feed_url = feed_url or endpoint_url(
+            base_url, "/feeds/videos.xml", "YOUTUBE_FEED_URL", "https://www.youtube.com/feeds/videos.xml")
+        if playlist_ids is None:
+            playlist_ids = [p for p in os.getenv("YOUTUBE_PLAYLIST_IDS", "").split(",") if p]
+        self.playlist_ids = playlist_ids
+        self.base_url = self.feed_url
+    
+    @traced
+    async def fetch_courses(self, pipeline: IngestionPipeline):
+        """Fetch courses from YouTube playlist feeds"""
+        pages = await asyncio.gather(*(
+            pipeline.fetch_and_parse(self.feed_url, parse_youtube_playlist, params={"playlist_id": playlist_id})
+            for playlist_id in self.playlist_ids
+        ))
+        return [course for page in pages if page for course in page]
+
+class OpenCourseWareAggregator:
+    name = "OpenCourseWare"
+    type = "academic"
+    
+    def __init__(self, feed_urls=None, base_url=None):
+        if feed_urls is None:
+            feed_urls = endpoint_url(
+                base_url, "/rss/all/mit-allcourses.xml", "OCW_FEED_URLS", "https://ocw.mit.edu/rss/all/mit-allcourses.xml"
+            ).split(",")
+        self.feed_urls = [url for url in feed_urls if url]
+        self.base_url = self.feed_urls[0] if self.feed_urls else None
+    
+    @traced
+    async def fetch_courses(self, pipeline: IngestionPipeline):
+        """Fetch courses from OpenCourseWare RSS feeds"""
+        return await pipeline.fetch_many(self.feed_urls, parse_ocw_feed)
+
+class TelegramAggregator:
+    name = "Telegram"
+    type = "community"
+    
+    def __init__(self, preview_url=None, channels=None, max_pages=5, base_url=None):
+        self.base_url = preview_url or endpoint_url(base_url, "/s/", "TELEGRAM_BASE_URL", "https://t.me/s/")
+        if channels is None:
+            channels = [c for c in os.getenv("TELEGRAM_CHANNELS", "").split(",") if c]
+        self.channels = channels
+        self.max_pages = max_pages
+    
+    @traced
+    async def fetch_courses(self, pipeline: IngestionPipeline):
+        """Fetch course posts from public Telegram channel previews"""
+        pages = await asyncio.gather(*(self._fetch_channel(pipeline, channel) for channel in self.channels))
+        return [course for page in pages for course in page]
+    
+    async def _fetch_channel(self, pipeline, channel):
+        # Preview pages are cursor-paginated with ?before=<post id>, so pages of
+        # one channel are sequential while channels run concurrently
+        url = self.base_url.rstrip("/") + "/" + channel
+        courses = []
+        params = None
+        for _ in range(self.max_pages):
+            page = await pipeline.fetch_and_parse(url, parse_telegram_channel, params=params)
+            if not page:
+                # Empty, or unchanged since the last sync (older posts then are too)
+                break
+            courses.extend(page)
+            oldest = min(course["post_id"] for course in page)
+            if oldest <= 1:
+                break
+            params = {"before": oldest}
+        return courses
+
+class SaylorAggregator:
+    name = "Saylor"
+    type = "academic"
+    
+    def __init__(self, catalog_url=None, category_ids=None, base_url=None):
+        self.catalog_url = catalog_url or endpoint_url(
+            base_url, "/course/index.php", "SAYLOR_CATALOG_URL", "https://learn.saylor.org/course/index.php")
+        if category_ids is None:
+            category_ids = [c for c in os.getenv("SAYLOR_CATEGORY_IDS", "").split(",") if c]
+        self.category_ids = category_ids
+        self.base_url = self.catalog_url
+    
+    @traced
+    async def fetch_courses(self, pipeline: IngestionPipeline):
+        """Fetch courses from Saylor Academy category listings"""
+        pages = await asyncio.gather(*(
+            pipeline.fetch_paginated(self.catalog_url, parse_saylor_catalog, params={"categoryid": category_id})
+            for category_id in self.category_ids
+        ))
+        return [course for page in pages for course in page]
+
+class SwayamAggregator:
+    name = "SWAYAM"
+    type = "academic"
+    
+    def __init__(self, api_url=None, base_url=None):
+        self.api_url = api_url or endpoint_url(base_url, "/api/courses", "SWAYAM_API_URL", "https://swayam.gov.in/api/courses")
+        self.base_url = self.api_url
+    
+    @traced
+    async def fetch_courses(self, pipeline: IngestionPipeline):
+        """Fetch courses from the SWAYAM catalogue API"""
+        return await pipeline.fetch_paginated(self.api_url, parse_swayam_listing, first_page=1)
+
+
+def create_sources(base_url=None):
+    """Aggregators keyed by source name, in SOURCE_NAMES order; `base_url` points all of them at one host"""
+    return {
+        'youtube': YouTubeAggregator(base_url=base_url),
+        'opencourseware': OpenCourseWareAggregator(base_url=base_url),
+        'telegram': TelegramAggregator(base_url=base_url),
+        'saylor': SaylorAggregator(base_url=base_url),
+        'swayam': SwayamAggregator(base_url=base_url)
+    }
@@ -0,0 +1,169 @@
+"""
+Parsers turning raw source payloads (RSS, HTML, JSON) into course dicts.
+
+These run inside the ingestion worker pool, so they are plain module-level
+functions that only take and return picklable values.
+"""
+import json
+import re
+from typing import Dict, List, Optional
+from urllib.parse import urljoin
+
+import feedparser
+from bs4 import BeautifulSoup
+
+HASHTAG_PATTERN = re.compile(r"#(\w+)", re.UNICODE)
+# Post id at the end of a post URL's path (t.me/<channel>/<id>), before any slash, query or fragment
+TELEGRAM_POST_PATTERN = re.compile(r"/(\d+)/?(?:[?#]|$)")
+DURATION_PATTERN = re.compile(r"(\d+)\s*(hours?|hrs?|weeks?|minutes?|mins?)", re.IGNORECASE)
+MINUTES_PER_UNIT = {'h': 60, 'w': 60 * 4, 'm': 1}
+
+
+def make_course(source: str, title: str, url: str, **fields) -> Dict:
+    """Build a course dict in the `Course` schema with defaults filled in"""
+    course = {
+        "title": (title or "").strip()[:255],
+        "description": None,
+        "instructor": None,
+        "duration": None,
+        "level": None,
+        "category": None,
+        "source": source,
+        "url": url,
+        "thumbnail": None,
+        "rating": 0.0,
+        "students": 0,
+        "tags": [],
+        "lessons": 0,
+    }
+    course.update({key: value for key, value in fields.items() if value is not None})
+    return course
+
+
+def parse_duration(text: Optional[str]) -> Optional[int]:
+    """Best-effort conversion of '6 weeks' / '12 hours' style text to minutes"""
+    if not text:
+        return None
+    match = DURATION_PATTERN.search(text)
+    if not match:
+        return None
+    return int(match.group(1)) * MINUTES_PER_UNIT[match.group(2)[0].lower()]
+
+
+def _clean_text(html: Optional[str]) -> Optional[str]:
+    if not html:
+        return None
+    return BeautifulSoup(html, "html.parser").get_text(" ", strip=True) or None
+
+
+def parse_youtube_playlist(payload: str, base_url: str) -> List[Dict]:
+    """A playlist RSS feed becomes one course whose entries are its lessons"""
+    feed = feedparser.parse(payload)
+    if not feed.entries:
+        return []
+    first = feed.entries[0]
+    thumbnails = first.get("media_thumbnail") or []
+    return [make_course(
+        "YouTube",
+        feed.feed.get("title", first.get("title")),
+        feed.feed.get("link") or base_url,
+        description=_clean_text(feed.feed.get("subtitle") or first.get("summary")),
+        instructor=feed.feed.get("author"),
+        thumbnail=thumbnails[0].get("url") if thumbnails else None,
+        lessons=len(feed.entries),
+        tags=[tag.term for tag in feed.feed.get("tags", []) if tag.get("term")],
+    )]
+
+
+def parse_ocw_feed(payload: str, base_url: str) -> List[Dict]:
+    """Each RSS/Atom entry of an OpenCourseWare feed is one course"""
+    feed = feedparser.parse(payload)
+    courses = []
+    for entry in feed.entries:
+        tags = [tag.term for tag in entry.get("tags", []) if tag.get("term")]
+        courses.append(make_course(
+            "OpenCourseWare",
+            entry.get("title"),
+            urljoin(base_url, entry.get("link", "")),
+            description=_clean_text(entry.get("summary")),
+            instructor=entry.get("author"),
+            category=tags[0] if tags else None,
+            tags=tags,
+        ))
+    return courses
+
+
+def parse_telegram_channel(payload: str, base_url: str) -> List[Dict]:
+    """Posts of a public channel preview page (t.me/s/<channel>) that link to a course.
+
+    Each record keeps its numeric `post_id`, which validation drops before storage.
+    """
+    soup = BeautifulSoup(payload, "html.parser")
+    courses = []
+    for message in soup.select(".tgme_widget_message"):
+        text_node = message.select_one(".tgme_widget_message_text")
+        link = message.select_one(".tgme_widget_message_date")
+        if text_node is None or link is None:
+            continue
+        # Needed to page further back, so posts without one are skipped
+        match = TELEGRAM_POST_PATTERN.search(link.get("href") or "")
+        if match is None:
+            continue
+        text = text_node.get_text("\n", strip=True)
+        title = text.split("\n", 1)[0]
+        courses.append(make_course(
+            "Telegram",
+            title,
+            link.get("href"),
+            description=text,
+            instructor=message.get("data-post", "").split("/", 1)[0] or None,
+            tags=[tag.lower() for tag in HASHTAG_PATTERN.findall(text)],
+            post_id=int(match.group(1)),
+        ))
+    return courses
+
+
+def parse_saylor_catalog(payload: str, base_url: str) -> List[Dict]:
+    """Course boxes from a Saylor Academy (Moodle) category listing page"""
+    soup = BeautifulSoup(payload, "html.parser")
+    courses = []
+    for box in soup.select(".coursebox"):
+        link = box.select_one(".coursename a")
+        if link is None:
+            continue
+        summary = box.select_one(".summary")
+        image = box.select_one(".courseimage img")
+        category = box.select_one(".coursecat a")
+        courses.append(make_course(
+            "Saylor",
+            link.get_text(strip=True),
+            urljoin(base_url, link.get("href")),
+            description=summary.get_text(" ", strip=True) if summary else None,
+            thumbnail=urljoin(base_url, image.get("src")) if image else None,
+            category=category.get_text(strip=True) if category else None,
+        ))
+    return courses
+
+
+def parse_swayam_listing(payload: str, base_url: str) -> List[Dict]:
+    """Course records from a page of the SWAYAM catalogue JSON API"""
+    data = json.loads(payload)
+    records = data.get("courses", data.get("data", [])) if isinstance(data, dict) else data
+    courses = []
+    for record in records:
+        url = record.get("url") or record.get("courseUrl")
+        if not url:
+            continue
+        courses.append(make_course(
+            "SWAYAM",
+            record.get("title") or record.get("name"),
+            urljoin(base_url, url),
+            description=record.get("description") or record.get("summary"),
+            instructor=record.get("instructor") or record.get("professor"),
+            duration=parse_duration(record.get("duration")),
+            level=(record.get("level") or "").lower() or None,
+            category=record.get("category") or record.get("discipline"),
+            thumbnail=record.get("image") or record.get("thumbnail"),
+            students=record.get("enrolled") or 0,
+        ))
+    return courses
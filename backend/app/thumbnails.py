@@ -0,0 +1,433 @@
+"""
+Course thumbnails served from our own origin.
+
+The first request for a thumbnail fetches the upstream image once (one
+fetch per URL however many requests are waiting for it), and stores its
+bytes in a content-addressed disk cache shared by every worker process:
+
+    <cache dir>/blobs/ab/<sha256 of the image>
+    <cache dir>/refs/cd/<sha256 of the upstream URL>.json -> digest, content type
+
+Serving a blob touches its mtime, and when the blobs outgrow the size cap
+the least recently used are deleted; a ref whose blob is gone is a miss.
+A failed fetch is stored as a ref too, and answers requests for the URL
+with the same error until THUMBNAIL_FAILURE_TTL has passed.
+
+Only http(s) URLs are fetched, only from hosts that resolve to public
+addresses, and redirects are followed by hand so every hop is checked.
+With THUMBNAIL_CARD_SIZE set (and Pillow installed) images are shrunk to
+card dimensions before they are stored, and THUMBNAIL_PREFETCH warms the
+cache for courses as a refresh ingests them.
+
+Responses carry the digest as a strong ETag and honour If-None-Match and
+single byte ranges. Files are sent with the ASGI zero-copy extension when
+the server offers it, and in chunks read off the event loop otherwise.
+"""
+import asyncio
+import hashlib
+import io
+import ipaddress
+import json
+import os
+import socket
+import tempfile
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+
+import anyio
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+CACHE_CONTROL = "public, max-age=86400"
+CHUNK_SIZE = 64 * 1024
+# Eviction frees space down to this share of the cap, so it doesn't run on every store
+EVICT_TO = 0.9
+MAX_REDIRECTS = 3
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+
+
+class ThumbnailError(Exception):
+    """The upstream image could not be fetched or is not a usable image"""
+
+
+class CachedImage:
+    def __init__(self, path: str, digest: str, content_type: str, size: int):
+        self.path = path
+        self.digest = digest
+        self.content_type = content_type
+        self.size = size
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.digest}"'
+
+
+def public_address(address: str) -> bool:
+    """Whether an IP address is on the public internet (not loopback, private, link-local, ...)"""
+    ip = ipaddress.ip_address(address.split("%")[0])
+    return ip.is_global and not ip.is_multicast
+
+
+def check_url(url: str):
+    """Raise ThumbnailError unless `url` is http(s) with a host that isn't a non-public IP literal.
+
+    Host names are checked when they are resolved, by PublicResolver.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise ThumbnailError(f"Refusing to fetch {url}: not an http(s) URL")
+    try:
+        public = public_address(parts.hostname)
+    except ValueError:
+        return
+    if not public:
+        raise ThumbnailError(f"Refusing to fetch {url}: not a public address")
+
+
+class PublicResolver:
+    """aiohttp resolver that drops non-public addresses, failing for hosts that have no other"""
+
+    def __init__(self, resolver):
+        self.resolver = resolver
+
+    async def resolve(self, host: str, port: int = 0, family: int = socket.AF_INET):
+        addresses = [
+            address for address in await self.resolver.resolve(host, port, family=family)
+            if public_address(address["host"])
+        ]
+        if not addresses:
+            raise OSError(f"{host} does not resolve to a public address")
+        return addresses
+
+    async def close(self):
+        await self.resolver.close()
+
+
+def parse_card_size(value: Optional[str]) -> Optional[Tuple[int, int]]:
+    """Card dimensions from e.g. "600x400"; None (keep images as they are) if unset"""
+    if not value:
+        return None
+    width, height = value.lower().split("x")
+    return int(width), int(height)
+
+
+def resize_image(data: bytes, size: Tuple[int, int]) -> Optional[Tuple[bytes, str]]:
+    """The image scaled down to fit `size` as JPEG, or None if it already fits or Pillow is unavailable"""
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    try:
+        image = Image.open(io.BytesIO(data))
+    except (OSError, ValueError):
+        # Not something Pillow can decode; keep it as it came
+        return None
+    if image.width <= size[0] and image.height <= size[1]:
+        return None
+    image.thumbnail(size)
+    output = io.BytesIO()
+    image.convert("RGB").save(output, format="JPEG", quality=85, optimize=True)
+    return output.getvalue(), "image/jpeg"
+
+
+class ThumbnailCache:
+    """Disk cache of upstream images keyed by content, with a size cap and LRU eviction"""
+
+    def __init__(self, directory: str = None, max_bytes: int = None, max_image_bytes: int = None,
+                 card_size: Tuple[int, int] = None, timeout: float = None, prefetch_concurrency: int = None,
+                 failure_ttl: float = None):
+        self.directory = os.path.abspath(directory or os.getenv("THUMBNAIL_CACHE_DIR", "thumbnail_cache"))
+        self.max_bytes = max_bytes or int(os.getenv("THUMBNAIL_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+        self.max_image_bytes = max_image_bytes or int(os.getenv("THUMBNAIL_MAX_IMAGE_BYTES", 5 * 1024 * 1024))
+        self.card_size = card_size or parse_card_size(os.getenv("THUMBNAIL_CARD_SIZE"))
+        self.timeout = timeout or float(os.getenv("THUMBNAIL_FETCH_TIMEOUT", 10))
+        # Seconds a failed fetch is remembered for; 0 retries on every request
+        self.failure_ttl = failure_ttl if failure_ttl is not None else float(os.getenv("THUMBNAIL_FAILURE_TTL", 300))
+        self.prefetch_enabled = os.getenv("THUMBNAIL_PREFETCH", "false").lower() == "true"
+        self.prefetch_concurrency = prefetch_concurrency or int(os.getenv("THUMBNAIL_PREFETCH_CONCURRENCY", 4))
+        self.session = None
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._background: set = set()
+        # Bytes in blobs/, counted on first store; other workers' stores are picked up by eviction rescans
+        self._total_bytes: Optional[int] = None
+        self.stats = Counter()
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.directory, "blobs", digest[:2], digest)
+
+    def _ref_path(self, url: str) -> str:
+        key = hashlib.sha256(url.encode()).hexdigest()
+        return os.path.join(self.directory, "refs", key[:2], key + ".json")
+
+    def lookup(self, url: str) -> Optional[CachedImage]:
+        """The cached image for an upstream URL, marked as recently used, or None.
+
+        Raises ThumbnailError if fetching the URL failed within the failure TTL.
+        """
+        ref_path = self._ref_path(url)
+        try:
+            with open(ref_path) as f:
+                ref = json.load(f)
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            # Torn or foreign file; fetch again and overwrite it
+            return None
+        if "error" in ref:
+            if ref["expires"] > time.time():
+                raise ThumbnailError(ref["error"])
+            return None
+        path = self._blob_path(ref["digest"])
+        try:
+            size = os.stat(path).st_size
+            os.utime(path)
+        except FileNotFoundError:
+            # Blobs are written before their refs, so the blob was evicted; drop the ref with it
+            try:
+                os.unlink(ref_path)
+            except FileNotFoundError:
+                pass
+            return None
+        return CachedImage(path, ref["digest"], ref["content_type"], size)
+
+    async def get(self, url: str) -> CachedImage:
+        """The image for an upstream URL, fetching and storing it on a miss"""
+        try:
+            image = self.lookup(url)
+        except ThumbnailError:
+            self.stats["failure_hits"] += 1
+            raise
+        if image is not None:
+            self.stats["hits"] += 1
+            return image
+        self.stats["misses"] += 1
+        task = self._inflight.get(url)
+        if task is None:
+            task = self._inflight[url] = asyncio.create_task(self._fetch_and_store(url))
+            task.add_done_callback(lambda done: self._inflight.pop(url, None))
+        # Shielded so one client going away doesn't cancel the fetch others are waiting on
+        return await asyncio.shield(task)
+
+    async def _fetch_and_store(self, url: str) -> CachedImage:
+        try:
+            data, content_type = await self._fetch(url)
+        except ThumbnailError as e:
+            if self.failure_ttl > 0:
+                await asyncio.to_thread(self._write_atomic, self._ref_path(url), json.dumps({
+                    "error": str(e), "expires": time.time() + self.failure_ttl, "url": url,
+                }).encode())
+            raise
+        if self.card_size is not None:
+            resized = await asyncio.to_thread(resize_image, data, self.card_size)
+            if resized is not None:
+                data, content_type = resized
+        return await asyncio.to_thread(self._store, url, data, content_type)
+
+    async def _fetch(self, url: str) -> Tuple[bytes, str]:
+        # Imported here so that serving cached thumbnails never loads the HTTP client
+        import aiohttp
+
+        if self.session is None:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(resolver=PublicResolver(aiohttp.DefaultResolver())),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={"User-Agent": "FreeCourseHub/1.0 (+thumbnail cache)"},
+            )
+        try:
+            return await self._download(url)
+        except ThumbnailError:
+            self.stats["fetch_errors"] += 1
+            raise
+        except (aiohttp.ClientError, OSError, asyncio.TimeoutError, ValueError) as e:
+            self.stats["fetch_errors"] += 1
+            raise ThumbnailError(f"Could not fetch image: {e}") from e
+
+    async def _download(self, url: str) -> Tuple[bytes, str]:
+        for _ in range(MAX_REDIRECTS + 1):
+            check_url(url)
+            async with self.session.get(url, allow_redirects=False) as response:
+                location = response.headers.get("Location")
+                if response.status in REDIRECT_STATUSES and location:
+                    url = urljoin(str(response.url), location)
+                    continue
+                content_type = response.headers.get("Content-Type", "").split(";")[0].strip()
+                if response.status != 200 or not content_type.startswith("image/"):
+                    raise ThumbnailError(f"Upstream returned {response.status} {content_type or 'no content type'}")
+                if (response.content_length or 0) > self.max_image_bytes:
+                    raise ThumbnailError(f"Image is larger than {self.max_image_bytes} bytes")
+                chunks, received = [], 0
+                async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                    received += len(chunk)
+                    if received > self.max_image_bytes:
+                        raise ThumbnailError(f"Image is larger than {self.max_image_bytes} bytes")
+                    chunks.append(chunk)
+                return b"".join(chunks), content_type
+        raise ThumbnailError(f"More than {MAX_REDIRECTS} redirects")
+
+    def _store(self, url: str, data: bytes, content_type: str) -> CachedImage:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(digest)
+        if self._total_bytes is None:
+            self._total_bytes = self._disk_usage()
+        if not os.path.exists(path):
+            self._write_atomic(path, data)
+            self._total_bytes += len(data)
+        self._write_atomic(self._ref_path(url), json.dumps({
+            "digest": digest, "content_type": content_type, "url": url,
+        }).encode())
+        if self._total_bytes > self.max_bytes:
+            self._evict(keep=path)
+        return CachedImage(path, digest, content_type, len(data))
+
+    @staticmethod
+    def _write_atomic(path: str, data: bytes):
+        """Write to a temporary file and rename it into place, so readers never see a partial file"""
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        descriptor, temporary = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with os.fdopen(descriptor, "wb") as f:
+                f.write(data)
+            os.replace(temporary, path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+
+    def _blobs(self) -> List[os.DirEntry]:
+        root = os.path.join(self.directory, "blobs")
+        if not os.path.isdir(root):
+            return []
+        return [
+            entry
+            for shard in os.scandir(root) if shard.is_dir()
+            for entry in os.scandir(shard.path) if entry.is_file() and not entry.name.startswith(".tmp-")
+        ]
+
+    def _disk_usage(self) -> int:
+        return sum(entry.stat().st_size for entry in self._blobs())
+
+    def _evict(self, keep: str = None):
+        """Delete the least recently served blobs until the cache is back under the cap"""
+        blobs = sorted((entry.stat().st_mtime, entry.stat().st_size, entry.path) for entry in self._blobs())
+        total = sum(size for _, size, _ in blobs)
+        target = self.max_bytes * EVICT_TO
+        for _, size, path in blobs:
+            if total <= target:
+                break
+            if path == keep:
+                continue
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                # Another worker evicted it first
+                pass
+            total -= size
+            self.stats["evictions"] += 1
+        self._total_bytes = total
+
+    def schedule_prefetch(self, courses: Iterable[Dict]):
+        """Warm the cache for the courses a refresh wrote, in the background"""
+        urls = list(dict.fromkeys(course["thumbnail"] for course in courses if course.get("thumbnail")))
+        if urls:
+            task = asyncio.create_task(self.prefetch(urls))
+            self._background.add(task)
+            task.add_done_callback(self._background.discard)
+
+    async def prefetch(self, urls: List[str]):
+        semaphore = asyncio.Semaphore(self.prefetch_concurrency)
+
+        async def fetch(url):
+            async with semaphore:
+                try:
+                    await self.get(url)
+                except ThumbnailError:
+                    pass
+
+        await asyncio.gather(*(fetch(url) for url in urls))
+
+    async def close(self):
+        for task in self._background:
+            task.cancel()
+        await asyncio.gather(*self._background, return_exceptions=True)
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """(first, last) byte of a single `bytes=` range; None to send the whole file.
+
+    Raises ValueError for a range that lies outside the file.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        # Multiple ranges are allowed to be answered with the full content
+        return None
+    first, _, last = header[len("bytes="):].strip().partition("-")
+    try:
+        if not first:
+            first, last = max(0, size - int(last)), size - 1
+        else:
+            first, last = int(first), min(int(last), size - 1) if last else size - 1
+    except ValueError:
+        return None
+    if first > last or first >= size:
+        raise ValueError("Range not satisfiable")
+    return first, last
+
+
+def etag_matches(header: str, etag: str) -> bool:
+    """If-None-Match comparison, which is weak: W/"x" matches "x" """
+    return any(candidate.strip().removeprefix("W/") in (etag, "*") for candidate in header.split(","))
+
+
+def thumbnail_response(image: CachedImage, headers) -> Response:
+    """200, 206, 304 or 416 for a cached image, depending on the request's conditional and range headers"""
+    response_headers = {"ETag": image.etag, "Cache-Control": CACHE_CONTROL, "Accept-Ranges": "bytes"}
+    if_none_match = headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match, image.etag):
+        return Response(status_code=304, headers=response_headers)
+
+    byte_range = None
+    if_range = headers.get("if-range")
+    if if_range is None or if_range == image.etag:
+        try:
+            byte_range = parse_range(headers.get("range"), image.size)
+        except ValueError:
+            return Response(status_code=416, headers={**response_headers, "Content-Range": f"bytes */{image.size}"})
+    return ImageFileResponse(image, byte_range, response_headers)
+
+
+class ImageFileResponse(Response):
+    """A cached image file, whole or a single byte range"""
+
+    def __init__(self, image: CachedImage, byte_range: Optional[Tuple[int, int]], headers: Dict[str, str]):
+        self.path = image.path
+        self.offset, last = byte_range or (0, image.size - 1)
+        self.count = last - self.offset + 1
+        super().__init__(status_code=206 if byte_range else 200, headers=headers, media_type=image.content_type)
+        self.headers["content-length"] = str(self.count)
+        if byte_range:
+            self.headers["content-range"] = f"bytes {self.offset}-{last}/{image.size}"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if "http.response.zerocopysend" in scope.get("extensions", {}):
+            with open(self.path, "rb") as f:
+                await send({
+                    "type": "http.response.zerocopysend", "file": f.fileno(),
+                    "offset": self.offset, "count": self.count, "more_body": False,
+                })
+            return
+        async with await anyio.open_file(self.path, "rb") as f:
+            await f.seek(self.offset)
+            remaining = self.count
+            while True:
+                # An empty read (the file shrank underneath us) also ends the body
+                chunk = await f.read(min(CHUNK_SIZE, remaining)) if remaining else b""
+                remaining -= len(chunk)
+                more_body = bool(chunk) and remaining > 0
+                await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+                if not more_body:
+                    break
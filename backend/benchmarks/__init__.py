@@ -0,0 +1,3 @@
+"""
+Benchmarks and load tests for the course API, run with `python -m benchmarks.run`
+"""
@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+"""
+Benchmark the course API against a synthetic catalog.
+
+    python -m benchmarks.run --size 10k
+    python -m benchmarks.run --size 100k --baseline benchmarks/results/baseline-100k.json
+    python -m benchmarks.run --size 100k --save-baseline
+
+Seeds (once per size) a SQLite database under benchmarks/data with
+courses, users and progress in the app's own tables, resetting the users
+and progress the previous run's write requests changed, then times each
+CourseAggregator method directly and drives the ASGI app in-process
+with concurrent requests per endpoint, after timing the app's cold
+import (see benchmarks.startup) and lifespan startup. Results are
+written as JSON; with --baseline, timings that got worse by more than
+--threshold are reported as regressions and the exit status is 1.
+
+Seeding deletes what the tables held, so a --database-url holding courses
+or users the benchmark didn't create is refused unless --force is given.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Compared against the baseline; for each, whether a larger value is worse
+COMPARED_STATS = {"p50_ms": True, "p99_ms": True, "throughput_rps": False}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the FreeCourseHub API on synthetic data")
+    parser.add_argument("--size", default="10k", help="catalog size, e.g. 10k, 100k, 1m")
+    parser.add_argument("--users", type=int, help="synthetic users (default: one per 10 courses)")
+    parser.add_argument("--database-url", help="database to seed and benchmark (default: SQLite under benchmarks/data)")
+    parser.add_argument("--regenerate", action="store_true", help="reseed the database even if it matches the size")
+    parser.add_argument("--force", action="store_true",
+                        help="seed and benchmark the database even if it holds data the benchmark didn't create")
+    parser.add_argument("--repeat", type=int, default=50, help="timed calls per aggregator method")
+    parser.add_argument("--requests", type=int, default=500, help="requests per HTTP endpoint")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent HTTP clients")
+    parser.add_argument("--cache", action="store_true", help="keep the response cache on (off by default)")
+    parser.add_argument("--skip-http", action="store_true", help="only run the aggregator microbenchmarks")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/latest-<size>.json)")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown before flagging, 0.2 = 20%%")
+    parser.add_argument("--save-baseline", action="store_true", help="also write results to the --baseline path "
+                                                                    "(default: benchmarks/results/baseline-<size>.json)")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args(argv)
+
+
+def parse_size(size: str) -> int:
+    """'10k' -> 10000, '1m' -> 1000000"""
+    size = size.strip().lower()
+    multiplier = {"k": 1000, "m": 1000000}.get(size[-1:], 1)
+    return int(float(size.rstrip("km")) * multiplier)
+
+
+def configure_environment(args, courses: int):
+    """Point the app at the benchmark database; must run before anything under app/ is imported"""
+    os.makedirs(os.path.join(BENCH_DIR, "data"), exist_ok=True)
+    os.environ["DATABASE_URL"] = args.database_url or "sqlite:///{}".format(
+        os.path.join(BENCH_DIR, "data", f"catalog-{courses}.db"))
+    os.environ["RESPONSE_CACHE_ENABLED"] = "true" if args.cache else "false"
+    os.environ["REFRESH_SCHEDULE_ENABLED"] = "false"
+    os.environ.setdefault("PROFILE_SLOW_REQUESTS", "false")
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def summarize(latencies: List[float], elapsed: float = None) -> Dict:
+    ordered = sorted(latencies)
+    summary = {
+        "count": len(ordered),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3),
+        "p50_ms": round(percentile(ordered, 50) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+    if elapsed:
+        summary["throughput_rps"] = round(len(ordered) / elapsed, 1)
+    return summary
+
+
+async def time_calls(call: Callable[[int], Awaitable], repeat: int, warmup: int = 3) -> Dict:
+    for i in range(warmup):
+        await call(i)
+    latencies = []
+    started = time.perf_counter()
+    for i in range(repeat):
+        call_started = time.perf_counter()
+        await call(i)
+        latencies.append(time.perf_counter() - call_started)
+    return summarize(latencies, time.perf_counter() - started)
+
+
+async def prepare_database(args, courses: int, users: int) -> Dict[str, int]:
+    from app.database import SessionLocal, init_db
+    from .synthetic import foreign_counts, seed_database, seed_users, seeded_counts
+
+    await init_db()
+    async with SessionLocal() as db:
+        counts = await db.run_sync(seeded_counts)
+        foreign = await db.run_sync(foreign_counts)
+    if any(foreign.values()) and not args.force:
+        raise SystemExit(
+            f"{os.environ['DATABASE_URL']} holds {foreign['courses']} courses and {foreign['users']} users "
+            "the benchmark didn't create, which seeding would delete; pass --force to use it anyway"
+        )
+    expected = {"courses": courses, "users": users}
+    started = time.perf_counter()
+    if args.regenerate or any(counts[name] != value for name, value in expected.items()):
+        print(f"Seeding {courses} courses and {users} users...")
+        async with SessionLocal() as db, db.begin():
+            counts = await db.run_sync(seed_database, courses, users, seed=args.seed)
+        print(f"Seeded in {time.perf_counter() - started:.1f}s")
+    else:
+        # Undo the previous run's progress updates, quiz submissions and badges
+        async with SessionLocal() as db, db.begin():
+            counts = {"courses": counts["courses"], **await db.run_sync(seed_users, courses, users, seed=args.seed)}
+        print(f"Reset {users} users in {time.perf_counter() - started:.1f}s")
+    return counts
+
+
+async def bench_aggregator(args, aggregator, courses: int, users: int) -> Dict[str, Dict]:
+    """Time each CourseAggregator read path with a fresh session per call, as the routes do"""
+    from app.database import SessionLocal
+    from .synthetic import CATEGORIES, user_id
+
+    rng = random.Random(args.seed)
+    categories = list(CATEGORIES)
+    topics = [topic for words in CATEGORIES.values() for topic in words]
+    repeat = args.repeat
+
+    async def with_session(method, *call_args, **kwargs):
+        async with SessionLocal() as db:
+            return await method(*call_args, db=db, **kwargs)
+
+    async def second_page(i):
+        async with SessionLocal() as db:
+            _, cursor = await aggregator.get_courses_page(category=categories[i % len(categories)], limit=50, db=db)
+            return await aggregator.get_courses_page(category=categories[i % len(categories)], limit=50,
+                                                     cursor=cursor, db=db)
+
+    cold_versions = itertools.count(1)
+
+    async def cold_recommendations(i):
+        # A version no earlier call used, as after the user's data changed
+        return await with_session(aggregator.get_recommendations, user_id(rng.randrange(users)),
+                                  version=next(cold_versions))
+
+    typos = [misspell(topic) for topic in topics if len(topic) >= 5]
+    keystrokes = [topic[:length] for topic in topics for length in range(1, len(topic) + 1)]
+    warm_user = user_id(0)
+    cases = {
+        "load_stored_courses": (lambda i: aggregator.load_stored_courses(), max(1, min(repeat, 3))),
+        "get_courses_page[first]": (lambda i: with_session(aggregator.get_courses_page, limit=50), repeat),
+        "get_courses_page[category]": (lambda i: with_session(
+            aggregator.get_courses_page, category=categories[i % len(categories)], limit=50), repeat),
+        "get_courses_page[cursor]": (second_page, repeat),
+        "get_courses_page[search]": (lambda i: with_session(
+            aggregator.get_courses_page, search=topics[i % len(topics)], limit=50), repeat),
+        "get_course_by_id": (lambda i: aggregator.get_course_by_id(rng.randrange(1, courses + 1)), repeat * 10),
+        "get_recommendations[cold]": (cold_recommendations, repeat),
+        "get_recommendations[warm]": (lambda i: with_session(aggregator.get_recommendations, warm_user), repeat * 10),
+        "get_quiz_recommendations": (lambda i: aggregator.get_quiz_recommendations(
+            {"interests": rng.sample(categories, 2), "level": "beginner"}), repeat),
+        "advanced_search[query]": (lambda i: with_session(
+            aggregator.advanced_search, {"query": topics[i % len(topics)], "min_rating": 4.0}), repeat),
+        "get_facets[category]": (lambda i: with_session(
+            aggregator.get_facets, category=categories[i % len(categories)]), repeat),
+        "get_facets[search]": (lambda i: with_session(
+            aggregator.get_facets, search=topics[i % len(topics)], level="beginner"), repeat),
+        "advanced_search[tags]": (lambda i: with_session(
+            aggregator.advanced_search, {"tags": rng.sample(topics, 2), "max_duration": 300}), repeat),
+        "suggest_query": (lambda i: aggregator.suggest_query(typos[i % len(typos)]), repeat * 10),
+        "autocomplete": (lambda i: aggregator.autocomplete(keystrokes[i % len(keystrokes)]), repeat * 10),
+    }
+    results = {}
+    for name, (call, count) in cases.items():
+        results[f"aggregator.{name}"] = result = await time_calls(call, count, warmup=0 if count < 5 else 3)
+        print(f"  {name:<32} p50 {result['p50_ms']:>9.3f} ms   p99 {result['p99_ms']:>9.3f} ms")
+    return results
+
+
+def misspell(word: str) -> str:
+    """The word with two letters in the middle transposed, as a fuzzy search query"""
+    middle = len(word) // 2
+    return word[:middle - 1] + word[middle] + word[middle - 1] + word[middle + 1:]
+
+
+def http_cases(courses: int, users: int, seed: int) -> Dict[str, Callable[[int], Dict]]:
+    """Request factories per endpoint: index -> {"method", "url", "json"}"""
+    from .synthetic import CATEGORIES, LEVELS, user_id
+
+    rng = random.Random(seed)
+    categories = list(CATEGORIES)
+    topics = [topic for words in CATEGORIES.values() for topic in words]
+    typos = [misspell(topic) for topic in topics if len(topic) >= 5]
+
+    def get(url):
+        return {"method": "GET", "url": url}
+
+    def post(url, body):
+        return {"method": "POST", "url": url, "json": body}
+
+    return {
+        "GET /api/courses": lambda i: get("/api/courses?limit=50"),
+        "GET /api/courses[category]": lambda i: get(f"/api/courses?category={categories[i % len(categories)]}"),
+        "GET /api/courses[search]": lambda i: get(f"/api/courses?search={topics[i % len(topics)]}"),
+        "GET /api/courses[typo]": lambda i: get(f"/api/courses?search={typos[i % len(typos)]}"),
+        "GET /api/courses[facets]": lambda i: get(
+            f"/api/courses?category={categories[i % len(categories)]}&facets=true"),
+        "GET /api/courses/autocomplete": lambda i: get(
+            f"/api/courses/autocomplete?q={topics[i % len(topics)][:1 + i % 4]}"),
+        "GET /api/courses/batch": lambda i: get("/api/courses/batch?" + "&".join(
+            f"ids={rng.randrange(1, courses + 1)}" for _ in range(24))),
+        "GET /api/courses/{course_id}": lambda i: get(f"/api/courses/{rng.randrange(1, courses + 1)}"),
+        "GET /api/courses/recommended/{user_id}": lambda i: get(
+            f"/api/courses/recommended/{user_id(rng.randrange(users))}"),
+        "POST /api/courses/search": lambda i: post(
+            "/api/courses/search", {"query": topics[i % len(topics)], "min_rating": 4.0}),
+        "GET /api/user/{user_id}/progress": lambda i: get(f"/api/user/{user_id(rng.randrange(users))}/progress"),
+        "POST /api/user/progress": lambda i: post("/api/user/progress", {
+            "user_id": user_id(rng.randrange(users)), "course_id": rng.randrange(1, courses + 1),
+            "status": "in_progress", "progress": rng.randrange(1, 100), "time_spent": 5}),
+        "POST /api/user/progress/batch": lambda i: post("/api/user/progress/batch", [{
+            "user_id": user_id(rng.randrange(users)), "course_id": rng.randrange(1, courses + 1),
+            "status": "in_progress", "progress": rng.randrange(1, 100), "time_spent": 5} for _ in range(24)]),
+        "POST /api/quiz/submit": lambda i: post("/api/quiz/submit", {
+            "user_id": user_id(rng.randrange(users)),
+            "answers": {"interests": rng.sample(categories, 2), "level": rng.choice(LEVELS)}}),
+        "GET /api/stats": lambda i: get("/api/stats"),
+    }
+
+
+async def bench_http(args, app, courses: int, users: int) -> Dict[str, Dict]:
+    """Throughput and latency per endpoint with `concurrency` clients sharing `requests` requests"""
+    import httpx
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name, make_request in http_cases(courses, users, args.seed).items():
+            for i in range(min(args.concurrency, args.requests)):
+                await client.request(**make_request(i))
+            latencies: List[float] = []
+            errors = 0
+            next_index = iter(range(args.requests))
+
+            async def worker():
+                nonlocal errors
+                for i in next_index:
+                    request = make_request(i)
+                    started = time.perf_counter()
+                    response = await client.request(**request)
+                    latencies.append(time.perf_counter() - started)
+                    if response.status_code >= 400:
+                        errors += 1
+
+            started = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+            results[f"http.{name}"] = result = {**summarize(latencies, time.perf_counter() - started), "errors": errors}
+            print(f"  {name:<40} {result['throughput_rps']:>8.1f} req/s   p99 {result['p99_ms']:>9.3f} ms"
+                  + (f"   {errors} errors" if errors else ""))
+    return results
+
+
+def bench_import() -> Dict:
+    """Cold import of the app in fresh interpreters, see benchmarks.startup"""
+    from .startup import measure
+
+    result = measure()
+    print(f"  {'import':<32} p50 {result['p50_ms']:>9.3f} ms   max {result['max_ms']:>9.3f} ms")
+    return {"p50_ms": result["p50_ms"], "max_ms": result["max_ms"]}
+
+
+def compare(results: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """Lines describing every compared stat that got worse than the baseline by more than `threshold`"""
+    regressions = []
+    for name, current in results["results"].items():
+        previous = baseline.get("results", {}).get(name)
+        if previous is None:
+            continue
+        for stat, larger_is_worse in COMPARED_STATS.items():
+            if not previous.get(stat) or stat not in current:
+                continue
+            change = current[stat] / previous[stat] - 1
+            if (change if larger_is_worse else -change) > threshold:
+                regressions.append(f"{name} {stat}: {previous[stat]} -> {current[stat]} ({change:+.0%})")
+    return regressions
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def run(args, courses: int, users: int) -> Dict:
+    from app.database import engine
+
+    try:
+        counts = await prepare_database(args, courses, users)
+
+        print("Startup:")
+        results = {"startup.import": bench_import()}
+        from app.main import app, course_aggregator
+
+        # The app's own lifespan: loads the stored catalog, badge rules, progress buffer and stats reconciler
+        started = time.perf_counter()
+        async with app.router.lifespan_context(app):
+            results["startup.lifespan"] = result = {"p50_ms": round((time.perf_counter() - started) * 1000, 3)}
+            print(f"  {'lifespan':<32} {result['p50_ms']:>13.3f} ms")
+            print("CourseAggregator:")
+            results.update(await bench_aggregator(args, course_aggregator, courses, users))
+            if not args.skip_http:
+                print(f"HTTP ({args.requests} requests per endpoint, concurrency {args.concurrency}):")
+                results.update(await bench_http(args, app, courses, users))
+    finally:
+        # Pooled aiosqlite connections hold threads that would keep the interpreter alive
+        await engine.dispose()
+    return {
+        "meta": {
+            "created_at": datetime.utcnow().isoformat(),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "database": os.environ["DATABASE_URL"].split(":", 1)[0],
+            "dataset": counts,
+            "repeat": args.repeat,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "response_cache": args.cache,
+        },
+        "results": results,
+    }
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    courses = parse_size(args.size)
+    users = args.users or max(1, courses // 10)
+    configure_environment(args, courses)
+    results = asyncio.run(run(args, courses, users))
+
+    output = args.output or os.path.join(BENCH_DIR, "results", f"latest-{args.size}.json")
+    paths = [output]
+    if args.save_baseline:
+        paths.append(args.baseline or os.path.join(BENCH_DIR, "results", f"baseline-{args.size}.json"))
+    for path in paths:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"Wrote {path}")
+
+    if args.baseline and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("meta", {}).get("dataset") != results["meta"]["dataset"]:
+            print("Warning: baseline was recorded on a different dataset")
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
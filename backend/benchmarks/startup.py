@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Measure how long the API takes to import, against a budget.
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --budget-ms 1500 --top 30
+
+Imports `app.main` in fresh interpreters with `-X importtime`, reports the
+median total and the modules that cost the most, and exits 1 when the
+import exceeds the budget (--budget-ms, or STARTUP_IMPORT_BUDGET_MS) or
+loads any of the scraping dependencies that only the refresh path needs.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_BUDGET_MS = 2000
+# Imported on the first source refresh, never while serving
+DEFERRED_MODULES = ("aiohttp", "bs4", "feedparser", "requests", "app.source_aggregators", "app.source_parsers")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Profile the import time of the FreeCourseHub API")
+    parser.add_argument("--module", default="app.main", help="module to import")
+    parser.add_argument("--runs", type=int, default=3, help="fresh interpreters to time; the median is reported")
+    parser.add_argument("--top", type=int, default=15, help="slowest modules to list")
+    parser.add_argument("--budget-ms", type=float,
+                        default=float(os.getenv("STARTUP_IMPORT_BUDGET_MS", DEFAULT_BUDGET_MS)),
+                        help=f"allowed import time (default {DEFAULT_BUDGET_MS} ms)")
+    return parser.parse_args(argv)
+
+
+def parse_importtime(output: str) -> List[Dict]:
+    """`-X importtime` lines as {"module", "depth", "self_ms", "cumulative_ms"}, in import order"""
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules.append({
+            "module": name.strip(),
+            "depth": (len(name) - len(name.lstrip()) - 1) // 2,
+            "self_ms": int(self_us) / 1000,
+            "cumulative_ms": int(cumulative_us) / 1000,
+        })
+    return modules
+
+
+def profile_imports(module: str = "app.main") -> Dict:
+    """Import `module` in a new interpreter: total import time, per-module costs and deferred modules it loaded"""
+    probe = f"import sys, {module}; print(','.join(m for m in {DEFERRED_MODULES!r} if m in sys.modules))"
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", probe],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+    )
+    modules = parse_importtime(completed.stderr)
+    return {
+        "total_ms": sum(entry["cumulative_ms"] for entry in modules if entry["depth"] == 0),
+        "modules": modules,
+        "deferred_loaded": [name for name in completed.stdout.strip().split(",") if name],
+    }
+
+
+def measure(module: str = "app.main", runs: int = 3) -> Dict:
+    """Median of `runs` cold imports, with the module breakdown of the median run"""
+    profiles = sorted((profile_imports(module) for _ in range(max(1, runs))), key=lambda p: p["total_ms"])
+    median = profiles[len(profiles) // 2]
+    return {
+        **median,
+        "p50_ms": round(statistics.median(p["total_ms"] for p in profiles), 3),
+        "max_ms": round(profiles[-1]["total_ms"], 3),
+        "deferred_loaded": sorted({name for p in profiles for name in p["deferred_loaded"]}),
+    }
+
+
+def report(result: Dict, top: int):
+    print(f"Import of the API: p50 {result['p50_ms']:.1f} ms   max {result['max_ms']:.1f} ms")
+    print("Slowest modules (self time):")
+    for entry in sorted(result["modules"], key=lambda e: e["self_ms"], reverse=True)[:top]:
+        print(f"  {entry['module']:<48} {entry['self_ms']:>8.1f} ms   cumulative {entry['cumulative_ms']:>8.1f} ms")
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    result = measure(args.module, args.runs)
+    report(result, args.top)
+    status = 0
+    if result["deferred_loaded"]:
+        print(f"Loaded at import, should be deferred: {', '.join(result['deferred_loaded'])}")
+        status = 1
+    if result["p50_ms"] > args.budget_ms:
+        print(f"Import time {result['p50_ms']:.1f} ms is over the {args.budget_ms:.0f} ms budget")
+        status = 1
+    else:
+        print(f"Within the {args.budget_ms:.0f} ms budget")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,182 @@
+import random
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List
+
+from sqlalchemy import delete, func, or_, select
+
+from app.models import (
+    Course, CourseAlias, CourseSignatureBand, QuizResult, User, UserBadge, UserProgress, UserStats,
+)
+from app.platform_stats import reconcile_stats
+
+CATEGORIES = {
+    "Programming": ["python", "javascript", "react", "algorithms", "databases", "testing", "rust", "web", "api", "git"],
+    "Data Science": ["pandas", "statistics", "regression", "visualization", "numpy", "clustering", "sql", "notebooks"],
+    "Marketing": ["seo", "branding", "campaigns", "analytics", "content", "social", "email", "funnels"],
+    "Design": ["typography", "figma", "color", "layout", "ux", "prototyping", "illustration", "accessibility"],
+    "Business": ["strategy", "finance", "accounting", "negotiation", "startups", "leadership", "operations"],
+    "Languages": ["spanish", "french", "grammar", "vocabulary", "pronunciation", "conversation", "japanese"],
+    "Science": ["physics", "chemistry", "biology", "astronomy", "genetics", "ecology", "experiments"],
+    "Mathematics": ["calculus", "algebra", "geometry", "probability", "proofs", "linear", "discrete"],
+    "Personal Development": ["productivity", "habits", "communication", "mindfulness", "writing", "focus"],
+    "Arts": ["drawing", "painting", "music", "photography", "film", "sculpture", "composition"],
+    "Health": ["nutrition", "fitness", "sleep", "anatomy", "yoga", "wellbeing", "firstaid"],
+    "Technology": ["cloud", "networking", "security", "linux", "docker", "kubernetes", "hardware", "ai"],
+}
+COMMON_WORDS = ["introduction", "complete", "guide", "fundamentals", "advanced", "practical", "beginners",
+                "masterclass", "projects", "course", "hands", "essentials", "theory", "applied", "modern"]
+LEVELS = ["beginner", "intermediate", "advanced"]
+SOURCE_HOSTS = {
+    "YouTube": "https://youtube.com/watch?v=",
+    "OpenCourseWare": "https://ocw.mit.edu/courses/",
+    "Telegram": "https://t.me/freecourses/",
+    "Saylor": "https://learn.saylor.org/course/view.php?id=",
+    "SWAYAM": "https://onlinecourses.swayam2.ac.in/",
+}
+STATUSES = ["not_started", "in_progress", "completed"]
+# Every synthetic course's thumbnail is on this host, which no real source uses
+THUMBNAIL_HOST = "https://img.example.com/"
+USER_PREFIX = "bench-user-"
+# Tables holding users and what they did, in deletion order
+USER_MODELS = (UserBadge, UserStats, QuizResult, UserProgress, User)
+
+
+def generate_courses(count: int, seed: int = 0) -> Iterator[Dict]:
+    """Courses in the Course table's shape, with vocabulary clustered by category so search and TF-IDF have signal"""
+    rng = random.Random(seed)
+    categories = list(CATEGORIES)
+    sources = list(SOURCE_HOSTS)
+    created = datetime(2024, 1, 1)
+    for course_id in range(1, count + 1):
+        category = rng.choice(categories)
+        topics = rng.sample(CATEGORIES[category], 3)
+        source = rng.choice(sources)
+        url = f"{SOURCE_HOSTS[source]}{course_id}"
+        yield {
+            "id": course_id,
+            "title": f"{rng.choice(COMMON_WORDS).title()} {topics[0].title()} and {topics[1].title()} {course_id}",
+            "description": " ".join(
+                [rng.choice(COMMON_WORDS) for _ in range(6)] + topics + rng.sample(CATEGORIES[rng.choice(categories)], 2)
+            ),
+            "instructor": f"Instructor {rng.randrange(count // 20 + 1)}",
+            "duration": rng.randrange(15, 1200),
+            "level": rng.choice(LEVELS),
+            "category": category,
+            "source": source,
+            "url": url,
+            "canonical_url": url,
+            "thumbnail": f"{THUMBNAIL_HOST}{course_id}.jpg",
+            "rating": round(rng.uniform(3.0, 5.0), 1),
+            "students": int(rng.paretovariate(1.2) * 100),
+            "tags": topics,
+            "lessons": rng.randrange(1, 80),
+            "last_updated": created,
+            "created_at": created,
+            "is_active": True,
+        }
+
+
+def generate_users(count: int, seed: int = 0) -> Iterator[Dict]:
+    rng = random.Random(seed + 1)
+    categories = list(CATEGORIES)
+    now = datetime(2024, 6, 1)
+    for index in range(count):
+        yield {
+            "id": user_id(index),
+            "interests": rng.sample(categories, rng.randrange(1, 4)),
+            "level": rng.choice(LEVELS),
+            "time_commitment": rng.choice(["light", "moderate", "intensive"]),
+            "preferred_formats": ["video"],
+            "goals": [],
+            "quiz_completed": False,
+            "created_at": now,
+            "last_active": now,
+        }
+
+
+def generate_progress(user_count: int, course_count: int, per_user: int = 5, seed: int = 0) -> Iterator[Dict]:
+    """Up to 2 * per_user distinct courses per user, in mixed states"""
+    rng = random.Random(seed + 2)
+    started = datetime(2024, 3, 1)
+    for index in range(user_count):
+        for course_id in rng.sample(range(1, course_count + 1), min(rng.randrange(2 * per_user + 1), course_count)):
+            status = rng.choice(STATUSES)
+            yield {
+                "user_id": user_id(index),
+                "course_id": course_id,
+                "status": status,
+                "progress": {"not_started": 0, "in_progress": rng.randrange(1, 100), "completed": 100}[status],
+                "started_at": started if status != "not_started" else None,
+                "completed_at": started + timedelta(days=rng.randrange(60)) if status == "completed" else None,
+                "last_accessed": started,
+                "time_spent": rng.randrange(0, 600) if status != "not_started" else 0,
+            }
+
+
+def user_id(index: int) -> str:
+    return f"{USER_PREFIX}{index}"
+
+
+def _insert_chunks(db, table, rows: Iterator[Dict], chunk_size: int = 5000) -> int:
+    written = 0
+    chunk: List[Dict] = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            db.connection().execute(table.insert(), chunk)
+            written += len(chunk)
+            chunk = []
+    if chunk:
+        db.connection().execute(table.insert(), chunk)
+        written += len(chunk)
+    return written
+
+
+def seed_database(db, courses: int, users: int, progress_per_user: int = 5, seed: int = 0) -> Dict[str, int]:
+    """Replace the catalog, users and progress with synthetic rows.
+
+    Rows are bulk inserted with Core executemany rather than through
+    upsert_courses, so seeding skips content hashing and near-duplicate
+    detection (none of the synthetic courses are duplicates). The platform
+    counters are recounted afterwards.
+    """
+    for model in (CourseSignatureBand, CourseAlias) + USER_MODELS + (Course,):
+        db.execute(delete(model))
+    written = _insert_chunks(db, Course.__table__, generate_courses(courses, seed))
+    return {"courses": written, **seed_users(db, courses, users, progress_per_user, seed)}
+
+
+def seed_users(db, courses: int, users: int, progress_per_user: int = 5, seed: int = 0) -> Dict[str, int]:
+    """Replace users, progress, quiz results and badges with synthetic rows, keeping the catalog.
+
+    Undoes what the write requests of a previous run changed, at a fraction
+    of the cost of reseeding the courses.
+    """
+    for model in USER_MODELS:
+        db.execute(delete(model))
+    counts = {
+        "users": _insert_chunks(db, User.__table__, generate_users(users, seed)),
+        "progress": _insert_chunks(db, UserProgress.__table__, generate_progress(users, courses, progress_per_user, seed)),
+    }
+    reconcile_stats(db)
+    return counts
+
+
+def foreign_counts(db) -> Dict[str, int]:
+    """Courses and users the benchmark did not create, which seeding would delete"""
+    return {
+        "courses": db.execute(select(func.count()).select_from(Course).where(
+            or_(Course.thumbnail.is_(None), ~Course.thumbnail.startswith(THUMBNAIL_HOST, autoescape=True))
+        )).scalar(),
+        "users": db.execute(select(func.count()).select_from(User).where(
+            ~User.id.startswith(USER_PREFIX, autoescape=True)
+        )).scalar(),
+    }
+
+
+def seeded_counts(db) -> Dict[str, int]:
+    return {
+        "courses": db.execute(select(func.count()).select_from(Course)).scalar(),
+        "users": db.execute(select(func.count()).select_from(User)).scalar(),
+        "progress": db.execute(select(func.count()).select_from(UserProgress)).scalar(),
+    }
@@ -2,16 +2,35 @@
 """
 FreeCourseHub Backend Startup Script
 """
+import asyncio
+import os
 import uvicorn
 from app.main import app
 from app.database import init_db
+from app.catalog_snapshot import build_snapshot
 
 def start_server():
     """Initialize database and start the server"""
     print("Initializing FreeCourseHub database...")
-    init_db()
+    asyncio.run(init_db())
     print("Database initialized successfully!")
     
+    workers = int(os.getenv("WEB_CONCURRENCY", 1))
+    if workers > 1:
+        # Workers map one read-only catalog snapshot instead of each building the catalog
+        snapshot_path = os.environ.setdefault("CATALOG_SNAPSHOT_PATH", os.path.abspath("catalog.snapshot"))
+        print("Building the shared catalog snapshot...")
+        asyncio.run(build_snapshot(snapshot_path))
+        print(f"Starting FreeCourseHub API server with {workers} workers...")
+        uvicorn.run(
+            "app.main:app",
+            host="0.0.0.0",
+            port=8000,
+            workers=workers,
+            log_level="info"
+        )
+        return
+    
     print("Starting FreeCourseHub API server...")
     uvicorn.run(
         "app.main:app",
@@ -0,0 +1,5 @@
+import os
+import tempfile
+
+# Before any app module reads it: tests never touch the configured database
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "test.db")
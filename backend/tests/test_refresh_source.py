@@ -0,0 +1,111 @@
+"""refresh_source end to end against a local stub serving recorded upstream payloads"""
+import asyncio
+from pathlib import Path
+
+import pytest
+from aiohttp import web
+
+from app.course_aggregator import CourseAggregator
+from app.database import engine, init_db
+from app.source_aggregators import (
+    OpenCourseWareAggregator, SaylorAggregator, SwayamAggregator, TelegramAggregator, YouTubeAggregator,
+)
+from app.source_parsers import parse_telegram_channel
+
+FIXTURES = Path(__file__).parent / "fixtures"
+EMPTY_PAGE = "<html><body></body></html>"
+
+
+def fixture(name: str) -> str:
+    return (FIXTURES / name).read_text(encoding="utf-8")
+
+
+def stub_app() -> web.Application:
+    """The upstream endpoints the aggregators use, under one host"""
+    async def youtube(request):
+        assert request.query["playlist_id"]
+        return web.Response(text=fixture("youtube_playlist.xml"), content_type="application/atom+xml")
+
+    async def ocw(request):
+        return web.Response(text=fixture("ocw_feed.xml"), content_type="application/rss+xml")
+
+    async def telegram(request):
+        # One page of posts; paging back past them finds nothing older
+        text = EMPTY_PAGE if "before" in request.query else fixture("telegram_channel.html")
+        return web.Response(text=text, content_type="text/html")
+
+    async def saylor(request):
+        text = fixture("saylor_catalog.html") if request.query.get("page", "0") == "0" else EMPTY_PAGE
+        return web.Response(text=text, content_type="text/html")
+
+    async def swayam(request):
+        if request.query.get("page") == "1":
+            return web.Response(text=fixture("swayam_courses.json"), content_type="application/json")
+        return web.json_response({"courses": []})
+
+    app = web.Application()
+    app.router.add_get("/feeds/videos.xml", youtube)
+    app.router.add_get("/rss/all/mit-allcourses.xml", ocw)
+    app.router.add_get("/s/{channel}", telegram)
+    app.router.add_get("/course/index.php", saylor)
+    app.router.add_get("/api/courses", swayam)
+    return app
+
+
+def stub_sources(base_url: str):
+    return {
+        'youtube': YouTubeAggregator(playlist_ids=["PLlrxD0HtieHhS8VzuMCfQD4uJ9yne1mE6"], base_url=base_url),
+        'opencourseware': OpenCourseWareAggregator(base_url=base_url),
+        'telegram': TelegramAggregator(channels=["freecourses"], base_url=base_url),
+        'saylor': SaylorAggregator(category_ids=["4"], base_url=base_url),
+        'swayam': SwayamAggregator(base_url=base_url),
+    }
+
+
+async def refresh_twice(source_name: str):
+    """Results of a first refresh of the source and of an incremental one straight after"""
+    runner = web.AppRunner(stub_app())
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    host, port = runner.addresses[0][:2]
+    aggregator = CourseAggregator()
+    aggregator._sources = stub_sources(f"http://{host}:{port}")
+    try:
+        await init_db()
+        first = await aggregator.refresh_source(source_name, full=True)
+        second = await aggregator.refresh_source(source_name)
+        return first, second, aggregator
+    finally:
+        await aggregator.close()
+        await runner.cleanup()
+        await engine.dispose()
+
+
+@pytest.mark.parametrize("source_name, count, title", [
+    ("youtube", 1, "Python for Beginners"),
+    ("opencourseware", 2, "18.06 Linear Algebra"),
+    ("telegram", 2, "Intro to Machine Learning"),
+    ("saylor", 2, "CS102: Introduction to Computer Science II"),
+    ("swayam", 2, "Introduction to Environmental Engineering"),
+])
+def test_refresh_source(source_name, count, title):
+    first, second, aggregator = asyncio.run(refresh_twice(source_name))
+
+    assert first["items_fetched"] == count
+    assert first["new_courses"] + first["updated_courses"] == count
+    titles = {course["title"] for course in aggregator.catalog.materialize_many(range(aggregator.catalog.size))}
+    assert title in titles
+    assert not aggregator.using_mock_courses
+
+    # Unchanged pages are recognized and nothing is written again
+    assert second["items_fetched"] == 0
+    assert second["new_courses"] == second["updated_courses"] == 0
+    assert second["pages_unchanged"] >= 1
+
+
+def test_telegram_records_keep_post_ids():
+    courses = parse_telegram_channel(fixture("telegram_channel.html"), "https://t.me/s/freecourses")
+
+    assert [course["post_id"] for course in courses] == [1041, 1042]
+    assert courses[0]["tags"] == ["git", "devops"]
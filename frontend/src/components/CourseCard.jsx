@@ -64,7 +64,7 @@ const CourseCard = ({ course }) => {
       {/* Course Thumbnail */}
       <div className="relative mb-4 overflow-hidden rounded-lg">
         <img
-          src={course.thumbnail}
+          src={`/api/courses/${course.id}/thumbnail`}
           alt={course.title}
           className="w-full h-48 object-cover group-hover:scale-105 transition-transform duration-300"
         />